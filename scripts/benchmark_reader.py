@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Measures remote metadata read throughput with fixed and adaptive per-host
+concurrency limits, against a local stand-in server that throttles requests
+beyond its capacity like an object store does."""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+root = Path(__file__).parents[1]
+sys.path.insert(0, str(root))
+
+from stactools.sentinel2.reader import HttpReader, HttpReaderError  # noqa: E402
+from stactools.sentinel2.throttle import CircuitOpenError  # noqa: E402
+from tests.http_server import serve_directory  # noqa: E402
+
+data_files = root / "tests" / "data-files"
+manifest = (
+    "S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE/manifest.safe"
+)
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--requests", type=int, default=2000)
+parser.add_argument("--threads", type=int, default=64)
+parser.add_argument("--capacity", type=int, default=8)
+parser.add_argument("--latency", type=float, default=0.01)
+parser.add_argument("--limits", type=int, nargs="+", default=[4, 8, 32])
+args = parser.parse_args()
+
+print("limit     adaptive  reads/s  failed  throttled  retries  final limit")
+for limit in args.limits:
+    for adaptive in (False, True):
+        with serve_directory(
+            str(data_files), latency=args.latency, capacity=args.capacity
+        ) as server:
+            with HttpReader(limit, adaptive=adaptive) as reader:
+
+                def read(_: int) -> bool:
+                    try:
+                        reader.read_bytes(f"{server.url}/{manifest}")
+                        return True
+                    except (HttpReaderError, CircuitOpenError):
+                        return False
+
+                start = time.monotonic()
+                with ThreadPoolExecutor(args.threads) as pool:
+                    succeeded = sum(pool.map(read, range(args.requests)))
+                elapsed = time.monotonic() - start
+                print(
+                    f"{limit:<9} {str(adaptive):<9} {succeeded / elapsed:>7.0f}  "
+                    f"{args.requests - succeeded:>6}  {server.throttled:>9}  "
+                    f"{reader.retries:>7}  {reader.concurrency(server.url):>11}"
+                )
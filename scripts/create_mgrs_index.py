@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Generates the Sentinel-2 tile index shipped in src/stactools/sentinel2.
+
+A tile exists for every MGRS 100 km grid square that overlaps its UTM zone and
+latitude band. Band C is taken to reach the southern edge of Sentinel-2
+coverage, rather than the -80 degrees where the UTM grid stops, as tiles such
+as 01CDL extend past it. Tile origins follow from MGRS arithmetic; WGS84 bounds come from
+projecting the densified tile outline.
+"""
+
+import math
+from pathlib import Path
+
+import numpy
+import shapely
+from pyproj import Transformer
+from shapely.geometry import box
+
+from stactools.sentinel2.mgrs import (
+    LATITUDE_BANDS,
+    TILE_INDEX_FIELDS,
+    TILE_INDEX_MAGIC,
+    TILE_INDEX_PATH,
+    TILE_SIZE,
+    UTM_ZONES,
+    tile_code,
+    tile_epsg,
+    tile_origin,
+)
+
+# Band X is 12 degrees tall, every other band 8
+BAND_SOUTH = {band: -80 + 8 * i for i, band in enumerate(sorted(LATITUDE_BANDS))}
+BAND_NORTH = {
+    band: 84 if band == "X" else south + 8 for band, south in BAND_SOUTH.items()
+}
+# Sentinel-2 tiles continue south of band C to the edge of the swath
+BAND_SOUTH["C"] = -84
+DENSIFY_DEGREES = 0.05
+DENSIFY_POINTS = 50
+
+
+def band_zone_tiles(utm_zone, latitude_band):
+    epsg = tile_epsg(utm_zone, latitude_band)
+    to_utm = Transformer.from_crs(4326, epsg, always_xy=True)
+    west = -180 + 6 * (utm_zone - 1)
+    cell = box(west, BAND_SOUTH[latitude_band], west + 6, BAND_NORTH[latitude_band])
+    cell = shapely.transform(
+        cell.segmentize(DENSIFY_DEGREES), to_utm.transform, interleaved=False
+    )
+    min_x, min_y, max_x, max_y = cell.bounds
+    for column in range(
+        max(1, math.floor(min_x / 1e5)), min(9, math.ceil(max_x / 1e5))
+    ):
+        for row in range(math.floor(min_y / 1e5), math.ceil(max_y / 1e5)):
+            easting, northing = column * 100_000, row * 100_000
+            square = box(easting, northing, easting + 100_000, northing + 100_000)
+            if cell.intersection(square).area > 1:
+                yield (
+                    tile_code(utm_zone, latitude_band, easting, northing),
+                    epsg,
+                    *tile_origin(easting, northing, epsg > 32700),
+                )
+
+
+def wgs84_bounds(epsg, ulx, uly):
+    to_wgs84 = Transformer.from_crs(epsg, 4326, always_xy=True, force_over=True)
+    outline = box(ulx, uly - TILE_SIZE, ulx + TILE_SIZE, uly)
+    outline = outline.segmentize(TILE_SIZE / DENSIFY_POINTS)
+    lons, lats = to_wgs84.transform(*numpy.array(outline.exterior.coords).T)
+    west, east = lons.min(), lons.max()
+    if east > 180:
+        east -= 360
+    elif west < -180:
+        west += 360
+    return (
+        math.floor(west * 100),
+        math.floor(lats.min() * 100),
+        math.ceil(east * 100),
+        math.ceil(lats.max() * 100),
+    )
+
+
+tiles = []
+for utm_zone in sorted(UTM_ZONES):
+    for latitude_band in sorted(LATITUDE_BANDS):
+        for code, epsg, ulx, uly in band_zone_tiles(utm_zone, latitude_band):
+            tiles.append(
+                (code.encode("ascii"), epsg, ulx, uly, *wgs84_bounds(epsg, ulx, uly))
+            )
+    print(f"zone {utm_zone}: {len(tiles)} tiles")
+
+index = numpy.array(sorted(tiles), dtype=numpy.dtype(TILE_INDEX_FIELDS))
+path = Path(TILE_INDEX_PATH)
+with open(path, "wb") as f:
+    f.write(TILE_INDEX_MAGIC)
+    f.write(index.tobytes())
+print(f"Wrote {len(index)} tiles to {path}")
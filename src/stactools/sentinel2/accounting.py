@@ -0,0 +1,228 @@
+"""Counts the requests, bytes and time that reading metadata costs.
+
+:class:`AccountingReader` wraps any :class:`~stactools.sentinel2.reader.MetadataReader`
+and records, per href, how many reads and existence probes were made, how
+many bytes were read and how long it took. Wrapping the reader of a single
+:func:`~stactools.sentinel2.stac.create_item` call gives the cost of a
+granule; :class:`BatchIoStats` adds those up per granule layout, to size
+egress and to check that caching changes really save reads.
+
+Reads are counted as the caller makes them: an answer from the wrapped
+reader's existence cache still counts as a probe, and for archives opened
+with :meth:`~stactools.sentinel2.reader.MetadataReader.open_seekable` the
+bytes are those read from the archive, not whole blocks fetched.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any, BinaryIO, Optional
+
+from stactools.core.io import ReadHrefModifier
+from stactools.sentinel2.bundle import BUNDLE_EXTENSION
+from stactools.sentinel2.reader import MetadataReader, get_reader
+
+
+@dataclass
+class IoCounts:
+    """Reads (opens included), existence probes, bytes read and seconds
+    spent reading."""
+
+    requests: int = 0
+    probes: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def add(self, other: "IoCounts") -> None:
+        self.requests += other.requests
+        self.probes += other.probes
+        self.bytes += other.bytes
+        self.seconds += other.seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        d = asdict(self)
+        d["seconds"] = round(self.seconds, 6)
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "IoCounts":
+        return cls(
+            requests=int(d.get("requests", 0)),
+            probes=int(d.get("probes", 0)),
+            bytes=int(d.get("bytes", 0)),
+            seconds=float(d.get("seconds", 0.0)),
+        )
+
+
+class IoStats:
+    """:class:`IoCounts` per href. Safe to update from several threads."""
+
+    def __init__(self) -> None:
+        self.hrefs: dict[str, IoCounts] = defaultdict(IoCounts)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        href: str,
+        seconds: float,
+        size: int = 0,
+        request: bool = False,
+        probe: bool = False,
+    ) -> None:
+        with self._lock:
+            counts = self.hrefs[href]
+            counts.requests += request
+            counts.probes += probe
+            counts.bytes += size
+            counts.seconds += seconds
+
+    def total(self) -> IoCounts:
+        total = IoCounts()
+        with self._lock:
+            for counts in self.hrefs.values():
+                total.add(counts)
+        return total
+
+
+class _CountingFile:
+    """A file whose reads are recorded against an href."""
+
+    def __init__(self, file: BinaryIO, href: str, stats: IoStats):
+        self._file = file
+        self._href = href
+        self._stats = stats
+
+    def read(self, size: int = -1) -> bytes:
+        start = time.perf_counter()
+        data = self._file.read(size)
+        self._stats.record(self._href, time.perf_counter() - start, len(data))
+        return data
+
+    def readinto(self, buffer: Any) -> int:
+        start = time.perf_counter()
+        size = self._file.readinto(buffer)  # type: ignore[attr-defined]
+        self._stats.record(self._href, time.perf_counter() - start, size or 0)
+        return size
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._file, name)
+
+    def __iter__(self) -> Any:
+        return iter(self.read, b"")
+
+    def __enter__(self) -> "_CountingFile":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self._file.close()
+
+
+class AccountingReader(MetadataReader):
+    """Passes reads through to ``reader``, recording their cost in
+    :attr:`stats` by the href as the caller gave it.
+
+    Use a new accounting reader per granule, wrapping a shared reader, to
+    keep the wrapped reader's connections and caches.
+    """
+
+    def __init__(self, reader: Optional[MetadataReader] = None):
+        super().__init__()
+        self.reader = get_reader(reader)
+        self.stats = IoStats()
+
+    def read_bytes(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bytes:
+        start = time.perf_counter()
+        data = self.reader.read_bytes(href, read_href_modifier)
+        self.stats.record(href, time.perf_counter() - start, len(data), request=True)
+        return data
+
+    def read_text(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> str:
+        start = time.perf_counter()
+        text = self.reader.read_text(href, read_href_modifier)
+        size = len(text.encode("utf-8"))
+        self.stats.record(href, time.perf_counter() - start, size, request=True)
+        return text
+
+    def exists(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bool:
+        start = time.perf_counter()
+        result = self.reader.exists(href, read_href_modifier)
+        self.stats.record(href, time.perf_counter() - start, probe=True)
+        return result
+
+    def open(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        start = time.perf_counter()
+        file = self.reader.open(href, read_href_modifier)
+        self.stats.record(href, time.perf_counter() - start, request=True)
+        return _CountingFile(file, href, self.stats)  # type: ignore[return-value]
+
+    def open_seekable(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        start = time.perf_counter()
+        file = self.reader.open_seekable(href, read_href_modifier)
+        self.stats.record(href, time.perf_counter() - start, request=True)
+        return _CountingFile(file, href, self.stats)  # type: ignore[return-value]
+
+
+def granule_layout(href: str) -> str:
+    """The layout of a granule href: ``"safe"``, ``"zip"``, ``"bundle"`` or
+    ``"granule"`` (a Sinergise-style granule directory)."""
+    lowered = href.lower().rstrip("/")
+    if lowered.endswith(".zip"):
+        return "zip"
+    elif lowered.endswith(BUNDLE_EXTENSION):
+        return "bundle"
+    elif lowered.endswith(".safe"):
+        return "safe"
+    return "granule"
+
+
+@dataclass
+class BatchIoStats:
+    """Adds up the I/O of granules per layout."""
+
+    granules: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    layouts: dict[str, IoCounts] = field(default_factory=lambda: defaultdict(IoCounts))
+
+    def add(self, href: str, counts: IoCounts) -> None:
+        layout = granule_layout(href)
+        self.granules[layout] += 1
+        self.layouts[layout].add(counts)
+
+    def total(self) -> IoCounts:
+        total = IoCounts()
+        for counts in self.layouts.values():
+            total.add(counts)
+        return total
+
+    def summary(self) -> list[str]:
+        """One line per layout, and a total line if there are several, with
+        the totals and the means per granule."""
+        lines = []
+        rows = sorted(self.layouts.items())
+        if len(rows) > 1:
+            rows.append(("total", self.total()))
+        for layout, counts in rows:
+            granules = (
+                sum(self.granules.values())
+                if layout == "total"
+                else self.granules[layout]
+            )
+            lines.append(
+                f"{layout}: {granules} granules, {counts.requests} reads "
+                f"({counts.requests / granules:.1f}/granule), {counts.probes} "
+                f"probes ({counts.probes / granules:.1f}/granule), "
+                f"{counts.bytes} bytes ({counts.bytes / granules:.0f}/granule), "
+                f"{counts.seconds:.2f}s reading ({counts.seconds / granules:.3f}s"
+                "/granule)"
+            )
+        return lines
@@ -0,0 +1,247 @@
+"""Creates STAC Items from asyncio code.
+
+:func:`create_item_async` awaits the reads of a granule's metadata files
+through an :class:`AsyncReader`, concurrently where the layout allows, and
+then runs :func:`~stactools.sentinel2.stac.create_item` on the files it read
+in a worker thread, so the event loop is never blocked on I/O or parsing.
+
+http(s) hrefs are read with aiohttp (install the ``async`` extra) over a
+shared connection pool; other hrefs, or http(s) hrefs if aiohttp is not
+installed, are read in worker threads.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Optional
+from urllib.parse import urlsplit
+
+from stactools.core.io import ReadHrefModifier
+from stactools.sentinel2.bundle import BUNDLE_EXTENSION
+from stactools.sentinel2.reader import (
+    DEFAULT_MAX_CONNECTIONS_PER_HOST,
+    DEFAULT_TIMEOUT,
+    HttpReader,
+    HttpReaderError,
+    MetadataReader,
+)
+
+if TYPE_CHECKING:
+    import pystac
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncReader:
+    """Reads metadata files without blocking the event loop.
+
+    At most ``max_connections_per_host`` requests are in flight to any one
+    host. A reader must only be used from one event loop; close it with
+    ``await reader.close()`` or use it as an async context manager.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._sync_reader = HttpReader(max_connections_per_host, timeout)
+        self._session: Any = None
+        try:
+            import aiohttp  # noqa: F401
+
+            self._aiohttp = True
+        except ImportError:
+            logger.debug("aiohttp is not installed; reading http(s) in threads")
+            self._aiohttp = False
+
+    def _uses_aiohttp(self, href: str) -> bool:
+        return self._aiohttp and urlsplit(href).scheme in ("http", "https")
+
+    def _get_session(self) -> Any:
+        import aiohttp
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=0, limit_per_host=self.max_connections_per_host
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _request(
+        self, method: str, href: str, headers: Optional[dict[str, str]] = None
+    ) -> tuple[int, bytes]:
+        async with self._get_session().request(method, href, headers=headers) as r:
+            return r.status, await r.read()
+
+    async def read_bytes(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bytes:
+        if read_href_modifier is not None:
+            href = read_href_modifier(href)
+        if not self._uses_aiohttp(href):
+            return await asyncio.to_thread(self._sync_reader.read_bytes, href)
+
+        status, body = await self._request("GET", href)
+        if status == 404:
+            raise FileNotFoundError(href)
+        elif status != 200:
+            raise HttpReaderError(f"GET {href} returned HTTP {status}")
+        return body
+
+    async def exists(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bool:
+        if read_href_modifier is not None:
+            href = read_href_modifier(href)
+        if not self._uses_aiohttp(href):
+            return await asyncio.to_thread(self._sync_reader.exists, href)
+
+        # the same probing as HttpReader
+        status, _ = await self._request("HEAD", href)
+        if status in (405, 501):
+            status, _ = await self._request("GET", href, {"Range": "bytes=0-0"})
+        if status in (200, 206):
+            return True
+        elif status in (403, 404, 410):
+            return False
+        raise HttpReaderError(f"Probing {href} returned HTTP {status}")
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._sync_reader.close()
+
+    async def __aenter__(self) -> "AsyncReader":
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.close()
+
+
+class PrefetchedReader(MetadataReader):
+    """Serves files that were read ahead of time, by their unmodified hrefs.
+
+    Files that were not prefetched are read with ``fallback``, which blocks,
+    so that an unexpected read costs time rather than failing.
+    """
+
+    def __init__(self, fallback: MetadataReader):
+        super().__init__()
+        self.fallback = fallback
+        self.files: dict[str, bytes] = {}
+        self.probes: dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def add(self, href: str, content: bytes) -> None:
+        with self._lock:
+            self.files[href] = content
+            self.probes[href] = True
+
+    def add_probe(self, href: str, exists: bool) -> None:
+        with self._lock:
+            self.probes[href] = exists
+
+    def read_bytes(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bytes:
+        with self._lock:
+            content = self.files.get(href)
+        if content is None:
+            logger.debug(f"{href} was not prefetched")
+            return self.fallback.read_bytes(href, read_href_modifier)
+        return content
+
+    def read_text(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> str:
+        return str(self.read_bytes(href, read_href_modifier), encoding="utf-8")
+
+    def exists(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bool:
+        with self._lock:
+            probe = self.probes.get(href)
+        if probe is None:
+            return self.fallback.exists(href, read_href_modifier)
+        return probe
+
+
+async def prefetch(
+    granule_href: str,
+    read_href_modifier: Optional[ReadHrefModifier],
+    reader: AsyncReader,
+) -> PrefetchedReader:
+    """Reads the metadata files of a SAFE product or granule directory that
+    :func:`~stactools.sentinel2.stac.create_item` needs."""
+    prefetched = PrefetchedReader(reader._sync_reader)
+
+    async def read(href: str) -> None:
+        prefetched.add(href, await reader.read_bytes(href, read_href_modifier))
+
+    async def read_if_exists(href: str) -> None:
+        exists = await reader.exists(href, read_href_modifier)
+        prefetched.add_probe(href, exists)
+        if exists:
+            await read(href)
+
+    if granule_href.lower().endswith(".safe"):
+        from stactools.sentinel2.safe_manifest import SafeManifest
+
+        await read(os.path.join(granule_href, "manifest.safe"))
+        manifest = await asyncio.to_thread(SafeManifest, granule_href, None, prefetched)
+        hrefs = [manifest.product_metadata_href, manifest.granule_metadata_href]
+        await asyncio.gather(*(read(href) for href in hrefs if href is not None))
+    else:
+        await asyncio.gather(
+            read(os.path.join(granule_href, "metadata.xml")),
+            read(os.path.join(granule_href, "tileInfo.json")),
+            read_if_exists(os.path.join(granule_href, "product_metadata.xml")),
+        )
+    return prefetched
+
+
+async def create_item_async(
+    granule_href: str,
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    reader: Optional[AsyncReader] = None,
+    **kwargs: Any,
+) -> "pystac.Item":
+    """Creates a STAC Item like :func:`~stactools.sentinel2.stac.create_item`,
+    which takes the same keyword arguments, without blocking the event loop.
+
+    Pass a shared ``reader`` to reuse connections across items. Zipped SAFE
+    products, metadata bundles and ``verify=True`` need no concurrent reads
+    (or read image files), so they are created in a worker thread as is.
+    """
+    from stactools.sentinel2.stac import create_item
+
+    if reader is None:
+        async with AsyncReader() as own_reader:
+            return await create_item_async(
+                granule_href, read_href_modifier, own_reader, **kwargs
+            )
+
+    archived = granule_href.lower().endswith((".zip", BUNDLE_EXTENSION))
+    if archived or kwargs.get("verify"):
+        return await asyncio.to_thread(
+            create_item,
+            granule_href,
+            read_href_modifier=read_href_modifier,
+            **kwargs,
+        )
+
+    prefetched = await prefetch(granule_href, read_href_modifier, reader)
+    return await asyncio.to_thread(
+        create_item,
+        granule_href,
+        read_href_modifier=read_href_modifier,
+        reader=prefetched,
+        **kwargs,
+    )
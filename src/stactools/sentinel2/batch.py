@@ -0,0 +1,605 @@
+"""Creates STAC Items for many granules, pruning hrefs before any I/O.
+
+Granule hrefs usually encode the MGRS tile and the sensing time, in SAFE
+product names, Sinergise ``tiles/`` paths, compact item-style names, or (as an
+upper bound) the creation time of OPER granule names. :class:`GranuleFilter`
+rejects hrefs whose tile cannot intersect an area of interest, using the MGRS
+tile index, or whose sensing time cannot fall in a time window, so that they
+cost nothing to skip. Hrefs that cannot be parsed are always kept.
+
+Reprocessed products share the acquisition of the product they replace, and
+so the item id. :func:`deduplicate_hrefs` keeps only the latest processing of
+each acquisition, again from the names alone.
+
+Runs can be split between machines with a :class:`Shard`, assigned by a
+stable hash of the acquisition, or balanced by the time each tile took in
+earlier runs, as recorded by a :class:`Journal`.
+
+Granules can also be filtered on their cloud cover and other quality
+indicators with a :class:`~stactools.sentinel2.peek.Predicate`, which only
+costs a streaming read of the granule metadata.
+
+With a time budget, granules are built in worker processes that are killed if
+they take too long, and pathological granules are set aside in a
+:class:`~stactools.sentinel2.budget.Quarantine`.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import statistics
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from re import Pattern
+from typing import TYPE_CHECKING, Any, Final, Optional, Union
+
+from stactools.sentinel2.mgrs import TILE_SIZE, get_tile_index, utm_transformer
+
+if TYPE_CHECKING:
+    from shapely.geometry.base import BaseGeometry
+
+    from stactools.sentinel2.budget import Quarantine
+    from stactools.sentinel2.peek import Predicate
+    from stactools.sentinel2.profiling import BatchProfiler
+    from stactools.sentinel2.trace import TraceWriter
+
+logger = logging.getLogger(__name__)
+
+TILE_REGEX: Final[str] = r"\d{1,2}[CDEFGHJKLMNPQRSTUVWX][A-HJ-NP-Z][A-HJ-NP-V]"
+
+# S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE
+SAFE_PATTERN: Final[Pattern[str]] = re.compile(
+    r"(S2[A-D])_MSI(L1C|L2A)_(\d{8}T\d{6})_N(\d{4})_R(\d{3})"
+    rf"_T({TILE_REGEX})_(\d{{8}}T\d{{6}})"
+)
+# S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ(_N04.00)
+OPER_PATTERN: Final[Pattern[str]] = re.compile(
+    r"(S2[A-D])_OPER_MSI_(L1C|L2A)_TL_\w{4}_(\d{8}T\d{6})_A(\d{6})"
+    rf"_T({TILE_REGEX})(?:_N(\d{{2}})\.(\d{{2}}))?"
+)
+# .../tiles/10/S/DG/2018/12/31/0/
+TILES_PATH_PATTERN: Final[Pattern[str]] = re.compile(
+    r"tiles/(\d{1,2})/([CDEFGHJKLMNPQRSTUVWX])/([A-Z]{2})"
+    r"/(\d{4})/(\d{1,2})/(\d{1,2})(?:/(\d+))?"
+)
+# S2A_T60CWS_20240109T203651_L2A, S2A_10SDG_20181231_0_L2A
+COMPACT_PATTERN: Final[Pattern[str]] = re.compile(
+    rf"(S2[A-D])_T?({TILE_REGEX})_(\d{{8}})(?:T(\d{{6}}))?_(?:\d+_)?(L1C|L2A)"
+)
+
+# Areas of interest are densified before being projected onto tiles
+AOI_DENSIFY_DEGREES = 0.1
+
+# Cost of a granule whose tile has no recorded duration, if none are recorded
+DEFAULT_GRANULE_COST = 1.0
+
+
+@dataclass(frozen=True)
+class GranuleName:
+    """What a granule href says about the granule, without reading it.
+
+    The sensing time is known to lie between ``sensing_start`` and
+    ``sensing_end`` (inclusive); either may be None if unbounded.
+    """
+
+    platform: str
+    tile: str
+    sensing_start: Optional[datetime]
+    sensing_end: Optional[datetime]
+    product_level: Optional[str] = None
+    processing_baseline: Optional[str] = None
+    generated: Optional[datetime] = None
+
+    @property
+    def acquisition_key(self) -> Optional[str]:
+        """A key shared by every processing of the same acquisition of a tile,
+        or None if the name does not pin down the sensing time."""
+        if self.sensing_start is None or self.sensing_start != self.sensing_end:
+            return None
+        sensed = self.sensing_start.strftime("%Y%m%dT%H%M%S")
+        return f"{self.platform}_{self.tile}_{sensed}_{self.product_level or ''}"
+
+    @property
+    def processing_rank(self) -> tuple[str, datetime]:
+        """Orders processings of an acquisition, latest baseline then latest
+        generation time last."""
+        return (
+            self.processing_baseline or "",
+            self.generated or datetime.min.replace(tzinfo=timezone.utc),
+        )
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.strptime(value, "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+
+
+def _tile(code: str) -> str:
+    return f"{int(code[:-3]):02d}{code[-3:]}"
+
+
+def parse_granule_href(href: str) -> Optional[GranuleName]:
+    """Parses the tile and sensing time out of a granule href, or returns None
+    if the href does not follow a known naming scheme."""
+    name = os.path.basename(href.rstrip("/"))
+    if match := SAFE_PATTERN.search(name):
+        platform, level, sensed, baseline, _, tile, generated = match.groups()
+        sensing = _parse_time(sensed)
+        return GranuleName(
+            platform=platform,
+            tile=_tile(tile),
+            sensing_start=sensing,
+            sensing_end=sensing,
+            product_level=level,
+            processing_baseline=f"{baseline[:2]}.{baseline[2:]}",
+            generated=_parse_time(generated),
+        )
+    if match := OPER_PATTERN.search(name):
+        platform, level, created, _, tile, major, minor = match.groups()
+        # granules are created after they are sensed
+        return GranuleName(
+            platform=platform,
+            tile=_tile(tile),
+            sensing_start=None,
+            sensing_end=_parse_time(created),
+            product_level=level,
+            processing_baseline=None if major is None else f"{major}.{minor}",
+            generated=_parse_time(created),
+        )
+    if match := COMPACT_PATTERN.search(name):
+        platform, tile, day, time, level = match.groups()
+        if time is None:
+            start = datetime.strptime(day, "%Y%m%d").replace(tzinfo=timezone.utc)
+            end = start + timedelta(days=1) - timedelta(microseconds=1)
+        else:
+            start = end = _parse_time(f"{day}T{time}")
+        return GranuleName(platform, _tile(tile), start, end, product_level=level)
+    if match := TILES_PATH_PATTERN.search(href):
+        zone, band, square, year, month, day, _ = match.groups()
+        start = datetime(int(year), int(month), int(day), tzinfo=timezone.utc)
+        return GranuleName(
+            platform="",
+            tile=f"{int(zone):02d}{band}{square}",
+            sensing_start=start,
+            sensing_end=start + timedelta(days=1) - timedelta(microseconds=1),
+        )
+    return None
+
+
+def parse_time_bound(value: str, end: bool = False) -> datetime:
+    """Parses an ISO 8601 date or datetime. Dates are taken as the start of the
+    day, or the end of the day if ``end`` is true; naive datetimes are UTC."""
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+        bound = datetime.fromisoformat(value)
+        if end:
+            bound += timedelta(days=1) - timedelta(microseconds=1)
+    else:
+        bound = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if bound.tzinfo is None:
+        bound = bound.replace(tzinfo=timezone.utc)
+    return bound
+
+
+def read_aoi(href: str) -> "BaseGeometry":
+    """Reads an area of interest from a GeoJSON geometry, Feature or
+    FeatureCollection."""
+    from shapely import union_all
+    from shapely.geometry import shape
+
+    from stactools.core.io import read_text
+
+    geojson = json.loads(read_text(href))
+    if geojson.get("type") == "FeatureCollection":
+        return union_all([shape(f["geometry"]) for f in geojson["features"]])
+    elif geojson.get("type") == "Feature":
+        return shape(geojson["geometry"])
+    return shape(geojson)
+
+
+class GranuleFilter:
+    """Decides from its href alone whether a granule could match an area of
+    interest (in WGS84) and a sensing time window.
+
+    The set of MGRS tiles intersecting the area of interest is computed once,
+    from the tile index and an exact intersection test in each candidate
+    tile's UTM projection. Granules of tiles missing from the index are kept,
+    like granules whose hrefs cannot be parsed.
+    """
+
+    def __init__(
+        self,
+        aoi: Optional["BaseGeometry"] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ):
+        self.start = start
+        self.end = end
+        self.tiles: Optional[frozenset[str]] = None
+        if aoi is not None:
+            self.tiles = frozenset(tiles_intersecting(aoi))
+            logger.info(f"{len(self.tiles)} MGRS tiles intersect the AOI")
+
+    def __call__(self, href: str) -> bool:
+        name = parse_granule_href(href)
+        if name is None:
+            logger.debug(f"Cannot parse {href}; keeping it")
+            return True
+        return self.matches(name)
+
+    def matches(self, name: GranuleName) -> bool:
+        if self.tiles is not None and name.tile not in self.tiles:
+            if name.tile in get_tile_index():
+                return False
+            # a tile the index does not know cannot be placed, so keep it
+            logger.debug(f"{name.tile} is not in the tile index; keeping it")
+        if self.start is not None and name.sensing_end is not None:
+            if name.sensing_end < self.start:
+                return False
+        if self.end is not None and name.sensing_start is not None:
+            if name.sensing_start > self.end:
+                return False
+        return True
+
+
+def tiles_intersecting(aoi: "BaseGeometry") -> list[str]:
+    """Returns the codes of the MGRS tiles that intersect an area of interest
+    given in WGS84."""
+    import shapely
+    from shapely.geometry import box
+
+    densified = shapely.segmentize(aoi, AOI_DENSIFY_DEGREES)
+    west, south, east, north = aoi.bounds
+    codes = []
+    for tile in get_tile_index().tiles_intersecting([west, south, east, north]):
+        projected = shapely.transform(
+            densified, utm_transformer(tile.epsg).transform, interleaved=False
+        )
+        if not all(math.isfinite(v) for v in projected.bounds):
+            continue
+        outline = box(tile.ulx, tile.uly - TILE_SIZE, tile.ulx + TILE_SIZE, tile.uly)
+        if projected.intersects(outline):
+            codes.append(tile.code)
+    return codes
+
+
+def filter_hrefs(
+    hrefs: Iterable[str], granule_filter: Optional[GranuleFilter] = None
+) -> Iterator[str]:
+    """Yields the stripped, non-blank hrefs that pass the filter."""
+    for href in hrefs:
+        href = href.strip()
+        if href and (granule_filter is None or granule_filter(href)):
+            yield href
+
+
+def deduplicate_hrefs(
+    hrefs: Iterable[str],
+) -> tuple[list[str], list[tuple[str, str]]]:
+    """Keeps one href per acquisition, the one with the highest processing
+    baseline and then the latest generation time in its name.
+
+    Returns the kept hrefs, in input order, and ``(dropped, kept)`` pairs for
+    the duplicates. Hrefs whose names do not identify an acquisition are
+    always kept. The index holds one short key and two integers per
+    acquisition.
+    """
+    kept: list[str] = []
+    index: dict[str, tuple[int, tuple[str, datetime]]] = {}
+    dropped: list[tuple[str, int]] = []
+    for href in hrefs:
+        name = parse_granule_href(href)
+        key = None if name is None else name.acquisition_key
+        if name is None or key is None:
+            kept.append(href)
+        elif key not in index:
+            index[key] = (len(kept), name.processing_rank)
+            kept.append(href)
+        else:
+            position, rank = index[key]
+            if name.processing_rank > rank:
+                dropped.append((kept[position], position))
+                kept[position] = href
+                index[key] = (position, name.processing_rank)
+            else:
+                dropped.append((href, position))
+    return kept, [(href, kept[position]) for href, position in dropped]
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Shard ``index`` (counting from 0) of ``count`` shards."""
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, value: str) -> "Shard":
+        """Parses ``"i/N"``, e.g. ``"0/4"`` for the first of four shards."""
+        match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", value)
+        if match is None:
+            raise ValueError(f"Shards are given as i/N, not {value!r}")
+        index, count = int(match.group(1)), int(match.group(2))
+        if count < 1 or index >= count:
+            raise ValueError(
+                f"Shard {value!r} is not between 0/{count} and {count - 1}/{count}"
+            )
+        return cls(index, count)
+
+
+def shard_key(href: str) -> str:
+    """The key that assigns an href to a shard: its acquisition, so that all
+    processings of an acquisition are deduplicated on the same shard, or else
+    the href itself."""
+    name = parse_granule_href(href)
+    key = None if name is None else name.acquisition_key
+    return href.strip() if key is None else key
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def select_shard(
+    hrefs: Iterable[str],
+    shard: Shard,
+    tile_costs: Optional[dict[str, float]] = None,
+    granule_filter: Optional[GranuleFilter] = None,
+) -> Iterator[str]:
+    """Yields the stripped, non-blank hrefs that belong to ``shard``.
+
+    Without ``tile_costs``, an href belongs to the shard its key hashes to,
+    which needs no coordination or memory. With them, every href is costed
+    by the mean duration of its tile (zero if ``granule_filter`` rejects it)
+    and acquisitions are assigned, most costly first, to the shard with the
+    least cost so far. Every node computes the same assignment from the same
+    hrefs and costs.
+    """
+    if tile_costs is None:
+        for href in filter_hrefs(hrefs):
+            if _hash(shard_key(href)) % shard.count == shard.index:
+                yield href
+        return
+
+    hrefs = list(filter_hrefs(hrefs))
+    default_cost = (
+        statistics.median(tile_costs.values()) if tile_costs else DEFAULT_GRANULE_COST
+    )
+    group_costs: dict[str, float] = {}
+    for href in hrefs:
+        key = shard_key(href)
+        if granule_filter is not None and not granule_filter(href):
+            group_costs.setdefault(key, 0.0)
+            continue
+        name = parse_granule_href(href)
+        cost = default_cost if name is None else tile_costs.get(name.tile, default_cost)
+        # duplicates are dropped, so an acquisition costs one build
+        group_costs[key] = max(group_costs.get(key, 0.0), cost)
+
+    loads = [0.0] * shard.count
+    assignment = {}
+    for key in sorted(group_costs, key=lambda k: (-group_costs[k], _hash(k), k)):
+        target = min(range(shard.count), key=lambda i: (loads[i], i))
+        loads[target] += group_costs[key]
+        assignment[key] = target
+    logger.info(
+        f"Shard {shard.index}/{shard.count} has an estimated cost of "
+        f"{loads[shard.index]:.1f}s of {sum(loads):.1f}s"
+    )
+    for href in hrefs:
+        if assignment[shard_key(href)] == shard.index:
+            yield href
+
+
+class Journal:
+    """Appends a JSON line per result of :func:`create_items` to a file,
+    with the granule's tile and the seconds it took to build."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a")
+
+    def record(self, result: dict[str, Any]) -> None:
+        name = parse_granule_href(result["href"])
+        if result.get("skipped"):
+            status = "skipped"
+        elif result.get("quarantined"):
+            status = "quarantined"
+        elif "error" in result:
+            status = "failed"
+        elif result.get("unchanged"):
+            status = "unchanged"
+        else:
+            status = "created"
+        entry = {
+            "href": result["href"],
+            "tile": None if name is None else name.tile,
+            "status": status,
+            "seconds": result.get("seconds"),
+            "time": datetime.now(timezone.utc).isoformat(),
+        }
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def read_tile_costs(paths: Iterable[str]) -> dict[str, float]:
+    """Returns the mean seconds that building a granule of each tile took,
+    from the successful builds recorded in journal files."""
+    durations: dict[str, list[float]] = defaultdict(list)
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if (
+                    entry.get("status") in ("created", "unchanged")
+                    and entry.get("tile")
+                    and entry.get("seconds") is not None
+                ):
+                    durations[entry["tile"]].append(float(entry["seconds"]))
+    return {tile: statistics.fmean(values) for tile, values in durations.items()}
+
+
+def create_items(
+    hrefs: Iterable[str],
+    dst: str,
+    granule_filter: Optional[GranuleFilter] = None,
+    predicate: Optional["Predicate"] = None,
+    deduplicate: bool = True,
+    shard: Optional[Shard] = None,
+    tile_costs: Optional[dict[str, float]] = None,
+    time_budget: Optional[float] = None,
+    workers: int = 1,
+    quarantine: Optional["Quarantine"] = None,
+    trace: Optional["TraceWriter"] = None,
+    profiler: Optional["BatchProfiler"] = None,
+    **kwargs: Any,
+) -> Iterator[dict[str, Any]]:
+    """Creates and saves items for the hrefs that pass the filter and the
+    predicate, yielding a result record per href like
+    :func:`stactools.sentinel2.serve.process_line` does.
+
+    The filter only looks at the href. If ``deduplicate`` is true, all hrefs
+    are read up front so that only the latest processing of each acquisition
+    is built (see :func:`deduplicate_hrefs`). The predicate is evaluated on a
+    :func:`~stactools.sentinel2.peek.peek` of the granule metadata, read with
+    the ``reader`` and ``read_href_modifier`` in ``kwargs``. Skipped hrefs
+    yield ``{"href": ..., "skipped": ...}``, naming what rejected them;
+    duplicates also name the kept href as ``duplicate_of``.
+
+    If a ``shard`` is given, only its hrefs are considered at all; see
+    :func:`select_shard`. Built items' records include the ``seconds`` they
+    took.
+
+    With a ``time_budget`` in seconds, or more than one of ``workers``,
+    granules are built in a :class:`~stactools.sentinel2.budget.WorkerPool`
+    and records are yielded as granules finish. Granules that run out of time,
+    crash their worker or fail the footprint area check are marked
+    ``quarantined`` and, if a ``quarantine`` is given, recorded in it; hrefs
+    already in the quarantine are skipped.
+
+    With a ``trace`` writer, a sample of granules is traced at its sample
+    rate, in whichever process builds them, and their events are added to it.
+    With a ``profiler``, every granule is profiled and its record has the
+    paths of its profiles as ``profile``.
+    """
+    from stactools.sentinel2.budget import WorkerPool, quarantine_reason
+    from stactools.sentinel2.serve import process_line
+
+    def finish(
+        result: dict[str, Any], diagnostics: Optional[str] = None
+    ) -> dict[str, Any]:
+        events = result.pop("trace", None)
+        if events and trace is not None:
+            trace.add(events)
+        if profiler is not None:
+            profiler.add(result)
+        reason = quarantine_reason(result)
+        if reason is not None:
+            result["quarantined"] = reason
+            if quarantine is not None:
+                quarantine.record(result, diagnostics or result.get("error"))
+        return result
+
+    if trace is not None:
+        kwargs["trace_sample"] = trace.sample_rate
+    if profiler is not None:
+        kwargs.update(profiler.options)
+    selected = _select(
+        hrefs,
+        granule_filter,
+        predicate,
+        deduplicate,
+        shard,
+        tile_costs,
+        quarantine,
+        **kwargs,
+    )
+    if time_budget is None and workers <= 1:
+        for entry in selected:
+            if isinstance(entry, dict):
+                yield entry
+                continue
+            start = time.perf_counter()
+            result = process_line(entry, dst, **kwargs)
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            yield finish(result)
+        return
+
+    with WorkerPool(max(workers, 1), dst, time_budget, **kwargs) as pool:
+        for entry in selected:
+            if isinstance(entry, dict):
+                yield entry
+                continue
+            while not pool.idle:
+                for result, diagnostics in pool.collect():
+                    yield finish(result, diagnostics)
+            pool.submit(entry)
+        while pool.busy:
+            for result, diagnostics in pool.collect():
+                yield finish(result, diagnostics)
+
+
+def _select(
+    hrefs: Iterable[str],
+    granule_filter: Optional[GranuleFilter],
+    predicate: Optional["Predicate"],
+    deduplicate: bool,
+    shard: Optional[Shard],
+    tile_costs: Optional[dict[str, float]],
+    quarantine: Optional["Quarantine"],
+    **kwargs: Any,
+) -> Iterator[Union[str, dict[str, Any]]]:
+    """Yields the hrefs to build, and the records of those that are skipped."""
+    from stactools.sentinel2.peek import peek
+
+    candidates: Iterable[str] = filter_hrefs(hrefs)
+    if shard is not None:
+        candidates = select_shard(candidates, shard, tile_costs, granule_filter)
+    if deduplicate:
+        passed = []
+        for href in candidates:
+            if granule_filter is None or granule_filter(href):
+                passed.append(href)
+            else:
+                yield {"href": href, "skipped": "filter"}
+        candidates, duplicates = deduplicate_hrefs(passed)
+        for href, kept in duplicates:
+            logger.info(f"Skipping {href}, a duplicate of {kept}")
+            yield {"href": href, "skipped": "duplicate", "duplicate_of": kept}
+
+    for href in candidates:
+        if not deduplicate and granule_filter is not None:
+            if not granule_filter(href):
+                yield {"href": href, "skipped": "filter"}
+                continue
+        if quarantine is not None and href in quarantine:
+            yield {"href": href, "skipped": "quarantined"}
+            continue
+        if predicate is not None:
+            try:
+                record = peek(
+                    href, kwargs.get("read_href_modifier"), kwargs.get("reader")
+                )
+            except Exception as e:
+                logger.exception(f"Could not peek at {href}")
+                yield {"href": href, "error": f"{type(e).__name__}: {e}"}
+                continue
+            if not predicate(record):
+                yield {"href": href, "skipped": "predicate"}
+                continue
+        yield href
@@ -0,0 +1,271 @@
+"""Builds granules in worker processes, each under a wall-clock time budget.
+
+A few pathological granules, typically polar or antimeridian-crossing ones,
+can spend minutes in the geometry pipeline, and native code cannot be
+interrupted from a thread. :class:`WorkerPool` runs each granule in one of a
+set of worker processes instead, and kills a worker whose granule runs over
+its budget, replacing it so the rest of the batch carries on.
+
+Granules that run out of time, crash their worker, or whose footprint fails
+the area check in :func:`~stactools.sentinel2.stac.make_valid_geometry` are
+quarantined: their result records carry a ``quarantined`` reason, and a
+:class:`Quarantine` file keeps a JSON line per granule with diagnostics,
+including where a timed-out or crashed worker was stuck. Later runs with the
+same quarantine file skip those granules until they are removed from it.
+"""
+
+import faulthandler
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from multiprocessing.connection import Connection, wait
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker is given, after its budget runs out, to dump its stack
+KILL_GRACE = 0.5
+
+TIMEOUT = "timeout"
+GEOMETRY = "geometry"
+CRASH = "crash"
+
+
+def quarantine_reason(result: dict[str, Any]) -> Optional[str]:
+    """Returns why a result record should be quarantined, if it should."""
+    from stactools.sentinel2.stac import GeometryError
+
+    if result.get("quarantined"):
+        return str(result["quarantined"])
+    if str(result.get("error", "")).startswith(f"{GeometryError.__name__}:"):
+        return GEOMETRY
+    return None
+
+
+class Quarantine:
+    """Appends a JSON line per quarantined granule to a file, with the reason,
+    the error, the seconds spent and any further diagnostics.
+
+    :attr:`hrefs` holds the hrefs quarantined so far, including those already
+    in the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hrefs: set[str] = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        self.hrefs.add(json.loads(line)["href"])
+        self._file = open(path, "a")
+
+    def __contains__(self, href: str) -> bool:
+        return href in self.hrefs
+
+    def record(self, result: dict[str, Any], diagnostics: Optional[str] = None) -> None:
+        entry = {
+            "href": result["href"],
+            "reason": quarantine_reason(result),
+            "error": result.get("error"),
+            "seconds": result.get("seconds"),
+            "diagnostics": diagnostics,
+            "time": datetime.now(timezone.utc).isoformat(),
+        }
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        self.hrefs.add(result["href"])
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "Quarantine":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def _work(
+    connection: Connection,
+    dst: str,
+    time_budget: Optional[float],
+    dump_path: str,
+    kwargs: dict[str, Any],
+) -> None:
+    from stactools.sentinel2.reader import HttpReader
+    from stactools.sentinel2.serve import process_line
+
+    with HttpReader() as reader, open(dump_path, "w") as dump:
+        # stacks are dumped if the worker crashes or, before the pool kills it,
+        # if it runs out of time
+        faulthandler.enable(file=dump)
+        while True:
+            try:
+                href = connection.recv()
+            except EOFError:
+                return
+            if href is None:
+                return
+            dump.seek(0)
+            dump.truncate()
+            if time_budget is not None:
+                faulthandler.dump_traceback_later(time_budget, file=dump)
+            start = time.perf_counter()
+            result = process_line(href, dst, reader=reader, **kwargs)
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            faulthandler.cancel_dump_traceback_later()
+            connection.send(result)
+
+
+@dataclass
+class _Worker:
+    process: Any
+    connection: Connection
+    dump_path: str
+    href: Optional[str] = None
+    started: float = 0.0
+
+
+class WorkerPool:
+    """Processes that build and save granules with
+    :func:`stactools.sentinel2.serve.process_line`, killing any that spend more
+    than ``time_budget`` seconds on one granule.
+
+    ``kwargs`` are passed on to ``process_line`` and must be picklable,
+    except for a ``reader``, which is dropped: each worker reads metadata with
+    its own :class:`~stactools.sentinel2.reader.HttpReader`.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        dst: str,
+        time_budget: Optional[float] = None,
+        **kwargs: Any,
+    ):
+        if workers < 1:
+            raise ValueError("A worker pool needs at least one worker")
+        if kwargs.pop("hash_index", None) is not None:
+            raise ValueError("A hash index cannot be shared with worker processes")
+        kwargs.pop("reader", None)
+        self.dst = dst
+        self.time_budget = time_budget
+        self.kwargs = kwargs
+        self.replaced = 0
+        self._context = multiprocessing.get_context()
+        self._directory = tempfile.TemporaryDirectory(prefix="sentinel2-workers-")
+        self._workers = [self._start(index) for index in range(workers)]
+
+    def _start(self, index: int) -> _Worker:
+        parent, child = self._context.Pipe()
+        dump_path = os.path.join(self._directory.name, f"worker-{index}.txt")
+        process = self._context.Process(
+            target=_work,
+            args=(child, self.dst, self.time_budget, dump_path, self.kwargs),
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        return _Worker(process, parent, dump_path)
+
+    @property
+    def idle(self) -> int:
+        """The number of workers without a granule."""
+        return sum(worker.href is None for worker in self._workers)
+
+    @property
+    def busy(self) -> int:
+        """The number of granules being built."""
+        return len(self._workers) - self.idle
+
+    def submit(self, href: str) -> None:
+        """Hands ``href`` to an idle worker; check :attr:`idle` first."""
+        worker = next(worker for worker in self._workers if worker.href is None)
+        worker.connection.send(href)
+        worker.href = href
+        worker.started = time.monotonic()
+
+    def collect(self) -> list[tuple[dict[str, Any], Optional[str]]]:
+        """Waits for at least one granule to finish or run out of time, and
+        returns ``(result, diagnostics)`` for each that did."""
+        busy = [worker for worker in self._workers if worker.href is not None]
+        if not busy:
+            return []
+        timeout = None
+        if self.time_budget is not None:
+            deadline = min(worker.started for worker in busy) + (
+                self.time_budget + KILL_GRACE
+            )
+            timeout = max(deadline - time.monotonic(), 0.0)
+        ready = wait([worker.connection for worker in busy], timeout)
+
+        finished: list[tuple[dict[str, Any], Optional[str]]] = []
+        now = time.monotonic()
+        for index, worker in enumerate(self._workers):
+            if worker.href is None:
+                continue
+            if worker.connection in ready:
+                try:
+                    result = worker.connection.recv()
+                except EOFError:
+                    finished.append(self._replace(index, CRASH))
+                    continue
+                worker.href = None
+                finished.append((result, None))
+            elif (
+                self.time_budget is not None
+                and now - worker.started >= self.time_budget + KILL_GRACE
+            ):
+                finished.append(self._replace(index, TIMEOUT))
+        return finished
+
+    def _replace(self, index: int, reason: str) -> tuple[dict[str, Any], str]:
+        worker = self._workers[index]
+        seconds = round(time.monotonic() - worker.started, 3)
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join()
+        worker.connection.close()
+        with open(worker.dump_path) as f:
+            diagnostics = f.read()
+        if reason == TIMEOUT:
+            error = f"TimeoutError: exceeded the time budget of {self.time_budget}s"
+        else:
+            error = f"WorkerError: worker exited with code {worker.process.exitcode}"
+            diagnostics = diagnostics or error
+        logger.warning(f"Quarantining {worker.href}: {error}")
+        result = {
+            "href": worker.href,
+            "error": error,
+            "quarantined": reason,
+            "seconds": seconds,
+        }
+        self.replaced += 1
+        self._workers[index] = self._start(index)
+        return result, diagnostics
+
+    def close(self) -> None:
+        for worker in self._workers:
+            if worker.href is not None:
+                worker.process.kill()
+            else:
+                try:
+                    worker.connection.send(None)
+                except OSError:
+                    worker.process.kill()
+        for worker in self._workers:
+            worker.process.join()
+            worker.connection.close()
+        self._directory.cleanup()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
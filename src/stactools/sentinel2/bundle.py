@@ -0,0 +1,220 @@
+"""Packs the metadata files of a granule into a single bundle file.
+
+Creating an item reads four to six small metadata files, and on object storage
+the overhead of each request outweighs its transfer. A bundle holds exactly
+the files :func:`~stactools.sentinel2.stac.create_item` reads for a granule,
+each compressed separately, so the item can be recreated from the bundle with
+a single read. Asset hrefs still point at the original granule.
+
+The bundle layout is::
+
+    magic (8 bytes) | index length (uint32, little-endian) | index | members
+
+The index is zlib-compressed JSON with the original granule href, its layout
+(``"safe"`` or ``"granule"``), the item id and, for each member path relative
+to the granule, its ``[offset, size, compressed size]``, with offsets counted
+from the start of the members. Files read from outside the granule, like the
+product metadata of the roda layout, are keyed by their normalised hrefs.
+Files that were probed for and found missing are listed as ``absent``.
+"""
+
+import json
+import logging
+import os
+import posixpath
+import struct
+import threading
+import zlib
+from io import BytesIO
+from typing import Any, BinaryIO, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from stactools.core.io import ReadHrefModifier
+from stactools.sentinel2.reader import MetadataReader, get_reader
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_EXTENSION = ".s2meta"
+BUNDLE_MAGIC = b"S2META\x00\x01"
+BUNDLE_VERSION = 1
+_HEADER = struct.Struct("<8sI")
+
+
+class BundleError(Exception):
+    pass
+
+
+class _RecordingReader(MetadataReader):
+    """Passes reads through to another reader, keeping what was read."""
+
+    def __init__(self, reader: MetadataReader):
+        super().__init__()
+        self.reader = reader
+        self.files: dict[str, bytes] = {}
+        self.absent: set[str] = set()
+        self._lock = threading.Lock()
+
+    def exists(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bool:
+        result = self.reader.exists(href, read_href_modifier)
+        if not result:
+            with self._lock:
+                self.absent.add(href)
+        return result
+
+    def read_bytes(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bytes:
+        data = self.reader.read_bytes(href, read_href_modifier)
+        with self._lock:
+            self.files[href] = data
+        return data
+
+    def read_text(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> str:
+        return str(self.read_bytes(href, read_href_modifier), encoding="utf-8")
+
+    def open(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        return BytesIO(self.read_bytes(href, read_href_modifier))
+
+
+def _member_name(source_href: str, href: str) -> str:
+    root = source_href.rstrip("/")
+    if href.startswith(f"{root}/"):
+        return href[len(root) + 1 :]
+    parts = urlsplit(href)
+    return urlunsplit(parts._replace(path=posixpath.normpath(parts.path)))
+
+
+def create_bundle(
+    granule_href: str,
+    dst: str,
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    reader: Optional[MetadataReader] = None,
+) -> str:
+    """Writes a bundle of the metadata files of a granule into the directory
+    ``dst``, naming it after the item id, and returns its path.
+
+    The granule may be a SAFE product or a granule directory; zipped SAFE
+    products are already a single file. The files are found by creating the
+    item, so the bundle holds exactly what creating it again needs.
+    """
+    from stactools.sentinel2.stac import create_item
+
+    if granule_href.lower().endswith(".zip"):
+        raise BundleError(f"{granule_href} is a zip archive, which needs no bundle")
+    if granule_href.lower().endswith(BUNDLE_EXTENSION):
+        raise BundleError(f"{granule_href} is already a bundle")
+
+    recorder = _RecordingReader(get_reader(reader))
+    item = create_item(
+        granule_href, read_href_modifier=read_href_modifier, reader=recorder
+    )
+
+    members: dict[str, list[int]] = {}
+    data = bytearray()
+    for href in sorted(recorder.files):
+        content = recorder.files[href]
+        compressed = zlib.compress(content, 9)
+        members[_member_name(granule_href, href)] = [
+            len(data),
+            len(content),
+            len(compressed),
+        ]
+        data += compressed
+    index = {
+        "version": BUNDLE_VERSION,
+        "source": granule_href,
+        "layout": "safe" if granule_href.lower().endswith(".safe") else "granule",
+        "id": item.id,
+        "members": members,
+        "absent": sorted(_member_name(granule_href, h) for h in recorder.absent),
+    }
+    index_bytes = zlib.compress(json.dumps(index, separators=(",", ":")).encode())
+
+    path = os.path.join(dst, f"{item.id}{BUNDLE_EXTENSION}")
+    content = _HEADER.pack(BUNDLE_MAGIC, len(index_bytes)) + index_bytes + data
+    if urlsplit(path).scheme in ("", "file"):
+        with open(path, "wb") as f:
+            f.write(content)
+    else:
+        import fsspec
+
+        with fsspec.open(path, "wb") as f:
+            f.write(content)
+    logger.info(f"Bundled {len(members)} files of {granule_href} into {path}")
+    return path
+
+
+class BundleReader(MetadataReader):
+    """Reads the members of a metadata bundle, fetching the whole bundle with
+    one read of ``href``.
+
+    Members are addressed by their hrefs in the original granule, under
+    :attr:`source_href`, so the metadata classes and asset hrefs work as if
+    the granule itself were being read.
+    """
+
+    def __init__(
+        self,
+        href: str,
+        read_href_modifier: Optional[ReadHrefModifier] = None,
+        reader: Optional[MetadataReader] = None,
+    ):
+        super().__init__()
+        self.href = href
+        with get_reader(reader).open(href, read_href_modifier) as f:
+            content = f.read()
+        if len(content) < _HEADER.size:
+            raise BundleError(f"{href} is not a metadata bundle")
+        magic, index_size = _HEADER.unpack_from(content)
+        if magic != BUNDLE_MAGIC:
+            raise BundleError(f"{href} is not a metadata bundle")
+        index_end = _HEADER.size + index_size
+        try:
+            self.index: dict[str, Any] = json.loads(
+                zlib.decompress(content[_HEADER.size : index_end])
+            )
+        except (zlib.error, ValueError) as e:
+            raise BundleError(f"Cannot read the index of {href}: {e}")
+        self._data = memoryview(content)[index_end:]
+        self._members: dict[str, list[int]] = self.index["members"]
+
+    @property
+    def source_href(self) -> str:
+        """The href of the granule the bundle was made from."""
+        return str(self.index["source"])
+
+    @property
+    def layout(self) -> str:
+        """``"safe"`` or ``"granule"``."""
+        return str(self.index["layout"])
+
+    def read_bytes(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bytes:
+        name = _member_name(self.source_href, href)
+        if name not in self._members:
+            raise FileNotFoundError(href)
+        offset, size, compressed_size = self._members[name]
+        content = zlib.decompress(self._data[offset : offset + compressed_size])
+        if len(content) != size:
+            raise BundleError(f"{name} in {self.href} is corrupt")
+        return content
+
+    def read_text(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> str:
+        return str(self.read_bytes(href, read_href_modifier), encoding="utf-8")
+
+    def _exists(self, href: str) -> bool:
+        return _member_name(self.source_href, href) in self._members
+
+    def open(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        return BytesIO(self.read_bytes(href, read_href_modifier))
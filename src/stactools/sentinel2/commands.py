@@ -1,12 +1,13 @@
 import json
 import logging
 import os
+import sys
+from contextlib import ExitStack, nullcontext
 from typing import Optional
 
 import click
 
 from stactools.sentinel2.constants import DEFAULT_TOLERANCE
-from stactools.sentinel2.stac import create_item
 
 logger = logging.getLogger(__name__)
 
@@ -36,12 +37,50 @@ def create_sentinel2_command(cli):
         "--asset-href-prefix",
         help='Prefix for all Asset hrefs instead of default of the "src" value',
     )
+    @click.option(
+        "--verify",
+        is_flag=True,
+        help="Check the SAFE product against its manifest checksums first",
+    )
+    @click.option(
+        "--update",
+        is_flag=True,
+        help="Only write items whose content differs from the saved item",
+    )
+    @click.option(
+        "--keep-created",
+        is_flag=True,
+        help="With --update, keep the created timestamp of the saved item",
+    )
+    @click.option(
+        "--io-stats",
+        is_flag=True,
+        help="Print the reads, probes, bytes and time spent reading each metadata file",
+    )
+    @click.option(
+        "--profile",
+        "profile_dir",
+        help="Save a cProfile profile of creating the item to SCENE_ID.pstats "
+        "in this directory",
+    )
+    @click.option(
+        "--profile-allocations",
+        type=click.IntRange(min=1),
+        help="With --profile, also trace memory allocations and save the peak "
+        "and the top N lines still holding memory to SCENE_ID.allocations.txt",
+    )
     def create_item_command(
         src: str,
         dst: str,
         providers: Optional[str],
         tolerance: float,
         asset_href_prefix: Optional[str],
+        verify: bool,
+        update: bool,
+        keep_created: bool,
+        io_stats: bool,
+        profile_dir: Optional[str],
+        profile_allocations: Optional[int],
     ):
         """Creates a STAC Item for a given Sentinel 2 granule
 
@@ -50,21 +89,706 @@ def create_sentinel2_command(cli):
         in. This will have a filename that matches the ID, which will
         be derived from the Sentinel 2 metadata.
         """
+        from stactools.sentinel2.profiling import GranuleProfile, profile_name
+        from stactools.sentinel2.stac import create_item
+
+        if keep_created and not update:
+            raise click.UsageError("--keep-created requires --update")
+        if profile_allocations is not None and profile_dir is None:
+            raise click.UsageError("--profile-allocations requires --profile")
+
         additional_providers = None
         if providers is not None:
             with open(providers) as f:
                 additional_providers = json.load(f)
 
-        item = create_item(
-            granule_href=src,
-            additional_providers=additional_providers,
-            tolerance=tolerance,
-            asset_href_prefix=asset_href_prefix,
+        reader = None
+        if io_stats:
+            from stactools.sentinel2.accounting import AccountingReader
+
+            reader = AccountingReader()
+        profile = (
+            None if profile_dir is None else GranuleProfile(profile_allocations or 0)
         )
+        item = None
+        try:
+            with profile or nullcontext():
+                item = create_item(
+                    granule_href=src,
+                    additional_providers=additional_providers,
+                    tolerance=tolerance,
+                    asset_href_prefix=asset_href_prefix,
+                    verify=verify,
+                    reader=reader,
+                )
+        finally:
+            # the profile of a failed granule is the one most worth keeping
+            if profile is not None and profile_dir is not None:
+                name = profile_name(src) if item is None else item.id
+                os.makedirs(profile_dir, exist_ok=True)
+                for path in profile.save(profile_dir, name).values():
+                    click.echo(f"Saved {path}", err=True)
+        if reader is not None:
+            for href, counts in sorted(reader.stats.hrefs.items()):
+                click.echo(
+                    f"{href}: {counts.requests} reads, {counts.probes} probes, "
+                    f"{counts.bytes} bytes, {counts.seconds:.3f}s",
+                    err=True,
+                )
+            total = reader.stats.total()
+            click.echo(
+                f"Total: {total.requests} reads, {total.probes} probes, "
+                f"{total.bytes} bytes, {total.seconds:.3f}s",
+                err=True,
+            )
 
         item_path = os.path.join(dst, f"{item.id}.json")
+        if update:
+            from stactools.sentinel2.update import save_item
+
+            if not save_item(item, item_path, keep_created):
+                click.echo(f"{item_path} is unchanged", err=True)
+            return
+
         item.set_self_href(item_path)
 
         item.save_object()
 
+    @sentinel2.command(
+        "create-items", short_help="Create STAC Items for a list of granule hrefs"
+    )
+    @click.argument("hrefs", type=click.File("r"))
+    @click.argument("dst")
+    @click.option(
+        "--aoi",
+        help="GeoJSON file; granules whose MGRS tile misses it are skipped",
+    )
+    @click.option(
+        "--start",
+        help="Skip granules sensed before this ISO 8601 date or datetime",
+    )
+    @click.option(
+        "--end",
+        help="Skip granules sensed after this ISO 8601 date or datetime",
+    )
+    @click.option(
+        "--where",
+        multiple=True,
+        help="Only build granules matching this expression over their quality "
+        "indicators, e.g. 'cloud_cover < 20'. May be repeated",
+    )
+    @click.option(
+        "--keep-duplicates",
+        is_flag=True,
+        help="Build every href, rather than only the latest processing of each "
+        "acquisition",
+    )
+    @click.option(
+        "--update",
+        is_flag=True,
+        help="Only write items whose content differs from the saved item",
+    )
+    @click.option(
+        "--keep-created",
+        is_flag=True,
+        help="With --update, keep the created timestamp of the saved item",
+    )
+    @click.option(
+        "--shard",
+        help="Only build shard i of N, e.g. 0/4, assigned by acquisition",
+    )
+    @click.option(
+        "--balance",
+        multiple=True,
+        help="With --shard, balance shards by the tile durations in this "
+        "journal file. May be repeated",
+    )
+    @click.option(
+        "--journal",
+        help="Append a JSON line with the tile, status and duration of each "
+        "href to this file",
+    )
+    @click.option(
+        "--hash-index",
+        help="With --update, JSON file of saved item hashes to compare with "
+        "instead of reading the saved items; created if missing",
+    )
+    @click.option(
+        "--time-budget",
+        type=float,
+        help="Build granules in worker processes, killing any that take longer "
+        "than this many seconds",
+    )
+    @click.option(
+        "--workers",
+        type=int,
+        default=1,
+        show_default=True,
+        help="Number of worker processes building granules",
+    )
+    @click.option(
+        "--io-stats",
+        is_flag=True,
+        help="Add the metadata reads, probes, bytes and time of each granule "
+        "to its result line as io, and summarize them per layout",
+    )
+    @click.option(
+        "--trace",
+        "trace_path",
+        help="Write a timeline of the fetch, parse, geometry, assets and write "
+        "stages of a sample of granules, per worker, to this trace-event JSON "
+        "file, for Perfetto or chrome://tracing",
+    )
+    @click.option(
+        "--trace-sample",
+        type=click.FloatRange(0, 1),
+        help="With --trace, the fraction of granules traced; 0.1 by default",
+    )
+    @click.option(
+        "--profile",
+        "profile_dir",
+        help="Save a cProfile profile of each granule to SCENE_ID.pstats in "
+        "this directory",
+    )
+    @click.option(
+        "--profile-allocations",
+        type=click.IntRange(min=1),
+        help="With --profile, also trace memory allocations and save the peak "
+        "and the top N lines still holding memory to SCENE_ID.allocations.txt",
+    )
+    @click.option(
+        "--profile-aggregate",
+        is_flag=True,
+        help="With --profile, also merge the profiles of all granules into "
+        "batch.pstats and batch.allocations.txt",
+    )
+    @click.option(
+        "--quarantine",
+        help="Append a JSON line with diagnostics for each granule that runs "
+        "out of time, crashes its worker or has an invalid footprint to this "
+        "file, and skip the granules already in it",
+    )
+    @click.option(
+        "-p",
+        "--providers",
+        help="Path to JSON file containing array of additional providers",
+    )
+    @click.option(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Item geometry simplification tolerance, e.g., 0.0001",
+    )
+    def create_items_command(
+        hrefs,
+        dst: str,
+        aoi: Optional[str],
+        start: Optional[str],
+        end: Optional[str],
+        where: tuple[str, ...],
+        keep_duplicates: bool,
+        update: bool,
+        keep_created: bool,
+        shard: Optional[str],
+        balance: tuple[str, ...],
+        journal: Optional[str],
+        hash_index: Optional[str],
+        time_budget: Optional[float],
+        workers: int,
+        quarantine: Optional[str],
+        io_stats: bool,
+        trace_path: Optional[str],
+        trace_sample: Optional[float],
+        profile_dir: Optional[str],
+        profile_allocations: Optional[int],
+        profile_aggregate: bool,
+        providers: Optional[str],
+        tolerance: float,
+    ):
+        """Creates STAC Items for the granule hrefs listed in HREFS, one per
+        line ("-" for stdin), saving them in DST.
+
+        Granules are filtered on the MGRS tile and sensing time in their
+        names before anything is read, then on --where expressions evaluated
+        against a quick read of their granule metadata. Of several products of
+        the same acquisition, only the one with the highest processing
+        baseline and latest generation time is built. One JSON result line
+        is written per built granule, and a summary at the end.
+
+        With --update, items identical to the saved ones, apart from their
+        created timestamps, are not rewritten.
+
+        With --shard, every node of a distributed run is given the same HREFS
+        and builds its own share of them.
+
+        With --time-budget, a granule that takes too long to build is stopped
+        and, like granules with invalid footprints, quarantined.
+
+        With --trace, the stages of a sample of granules are written to a
+        timeline, to see whether workers wait on reads, geometry or writes.
+        With --profile, every granule is profiled.
+        """
+        from stactools.sentinel2.accounting import BatchIoStats, IoCounts
+        from stactools.sentinel2.batch import (
+            GranuleFilter,
+            Journal,
+            Shard,
+            create_items,
+            parse_time_bound,
+            read_aoi,
+            read_tile_costs,
+        )
+        from stactools.sentinel2.budget import Quarantine
+        from stactools.sentinel2.peek import Predicate
+        from stactools.sentinel2.profiling import BatchProfiler
+        from stactools.sentinel2.reader import HttpReader
+        from stactools.sentinel2.trace import DEFAULT_SAMPLE_RATE, TraceWriter
+        from stactools.sentinel2.update import HashIndex
+
+        predicate = None
+        if where:
+            predicate = Predicate(" and ".join(f"({w})" for w in where))
+
+        additional_providers = None
+        if providers is not None:
+            with open(providers) as f:
+                additional_providers = json.load(f)
+
+        granule_filter = GranuleFilter(
+            aoi=None if aoi is None else read_aoi(aoi),
+            start=None if start is None else parse_time_bound(start),
+            end=None if end is None else parse_time_bound(end, end=True),
+        )
+        try:
+            selected_shard = None if shard is None else Shard.parse(shard)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--shard")
+        if balance and selected_shard is None:
+            raise click.UsageError("--balance requires --shard")
+        tile_costs = read_tile_costs(balance) if balance else None
+        if trace_sample is not None and trace_path is None:
+            raise click.UsageError("--trace-sample requires --trace")
+        if profile_dir is None:
+            if profile_allocations is not None:
+                raise click.UsageError("--profile-allocations requires --profile")
+            if profile_aggregate:
+                raise click.UsageError("--profile-aggregate requires --profile")
+
+        if keep_created and not update:
+            raise click.UsageError("--keep-created requires --update")
+        index = None
+        if hash_index is not None:
+            if not update:
+                raise click.UsageError("--hash-index requires --update")
+            if time_budget is not None or workers > 1:
+                raise click.UsageError(
+                    "--hash-index cannot be used with --time-budget or --workers"
+                )
+            index = HashIndex(hash_index)
+        if workers < 1:
+            raise click.BadParameter("must be at least 1", param_hint="--workers")
+
+        counts = {"created": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+        batch_io = BatchIoStats()
+
+        def close_trace(trace: TraceWriter) -> None:
+            trace.close()
+            click.echo(f"Traced {trace.granules} granules to {trace_path}", err=True)
+
+        def close_profiler(profiler: BatchProfiler) -> None:
+            click.echo(
+                f"Profiled {profiler.granules} granules in {profile_dir}", err=True
+            )
+            for path in profiler.close().values():
+                click.echo(f"Saved {path}", err=True)
+
+        # closed even if the run fails, so that the journal, quarantine, trace
+        # and profiles of the granules built so far are kept
+        with ExitStack() as stack:
+            run_journal = None
+            if journal is not None:
+                run_journal = stack.enter_context(Journal(journal))
+            run_quarantine = None
+            if quarantine is not None:
+                run_quarantine = stack.enter_context(Quarantine(quarantine))
+            profiler = None
+            if profile_dir is not None:
+                profiler = BatchProfiler(
+                    profile_dir, profile_allocations or 0, profile_aggregate
+                )
+                stack.callback(close_profiler, profiler)
+            trace = None
+            if trace_path is not None:
+                if trace_sample is None:
+                    trace_sample = DEFAULT_SAMPLE_RATE
+                trace = TraceWriter(trace_path, trace_sample)
+                stack.callback(close_trace, trace)
+            reader = stack.enter_context(HttpReader())
+            for result in create_items(
+                hrefs,
+                dst,
+                granule_filter,
+                predicate,
+                deduplicate=not keep_duplicates,
+                shard=selected_shard,
+                tile_costs=tile_costs,
+                time_budget=time_budget,
+                workers=workers,
+                quarantine=run_quarantine,
+                trace=trace,
+                profiler=profiler,
+                account_io=io_stats,
+                update=update,
+                keep_created=keep_created,
+                hash_index=index,
+                tolerance=tolerance,
+                additional_providers=additional_providers,
+                reader=reader,
+            ):
+                if run_journal is not None:
+                    run_journal.record(result)
+                if "io" in result:
+                    batch_io.add(result["href"], IoCounts.from_dict(result["io"]))
+                if result.get("skipped"):
+                    counts["skipped"] += 1
+                    if "duplicate_of" in result:
+                        click.echo(
+                            f"Duplicate {result['href']} "
+                            f"(keeping {result['duplicate_of']})",
+                            err=True,
+                        )
+                    continue
+                if result.get("quarantined"):
+                    click.echo(
+                        f"Quarantined {result['href']} ({result['quarantined']})",
+                        err=True,
+                    )
+                if result.get("unchanged"):
+                    counts["unchanged"] += 1
+                    continue
+                counts["failed" if "error" in result else "created"] += 1
+                click.echo(json.dumps(result))
+        if io_stats:
+            for line in batch_io.summary():
+                click.echo(f"I/O {line}", err=True)
+        if index is not None:
+            index.save()
+        unchanged = f"{counts['unchanged']} unchanged, " if update else ""
+        click.echo(
+            f"{counts['created']} created, {unchanged}{counts['skipped']} skipped, "
+            f"{counts['failed']} failed",
+            err=True,
+        )
+        if counts["failed"]:
+            sys.exit(1)
+
+    @sentinel2.command(
+        "rewrite-hrefs", short_help="Rewrite the asset hrefs of saved items"
+    )
+    @click.argument("paths", nargs=-1, required=True)
+    @click.option(
+        "--prefix",
+        "prefixes",
+        nargs=2,
+        multiple=True,
+        metavar="OLD NEW",
+        help="Replace the href prefix OLD with NEW. May be repeated",
+    )
+    @click.option(
+        "--regex",
+        "patterns",
+        nargs=2,
+        multiple=True,
+        metavar="PATTERN REPLACEMENT",
+        help="Replace the first match of PATTERN, as in re.sub. May be repeated",
+    )
+    @click.option(
+        "--dry-run",
+        is_flag=True,
+        help="Count what would change without writing anything",
+    )
+    @click.option(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of files to rewrite in parallel processes",
+    )
+    def rewrite_hrefs_command(
+        paths: tuple[str, ...],
+        prefixes: tuple[tuple[str, str], ...],
+        patterns: tuple[tuple[str, str], ...],
+        dry_run: bool,
+        workers: int,
+    ):
+        """Rewrites the asset hrefs of items in place, without reading any
+        granule metadata.
+
+        PATHS are item JSON files, NDJSON files of items, or directories
+        containing them; "-" streams NDJSON from stdin to stdout. Each href
+        is rewritten by the first matching rule, --prefix rules first.
+        """
+        from stactools.sentinel2.rewrite import (
+            PrefixRule,
+            RewriteError,
+            regex_rule,
+            rewrite_files,
+            rewrite_stream,
+        )
+
+        if not prefixes and not patterns:
+            raise click.UsageError("Give at least one --prefix or --regex rule")
+        try:
+            rules = [PrefixRule(old, new) for old, new in prefixes] + [
+                regex_rule(pattern, replacement) for pattern, replacement in patterns
+            ]
+        except RewriteError as e:
+            raise click.UsageError(str(e))
+
+        if paths == ("-",):
+            stats = rewrite_stream(sys.stdin, sys.stdout, rules)
+        else:
+            stats = rewrite_files(paths, rules, dry_run, workers)
+        for error in stats.errors:
+            click.echo(f"ERROR {error}", err=True)
+        click.echo(
+            f"{stats.items_changed} of {stats.items} items changed "
+            f"({stats.hrefs_changed} hrefs) in {stats.files_changed} of "
+            f"{stats.files} files",
+            err=True,
+        )
+        if stats.errors:
+            sys.exit(1)
+
+    @sentinel2.command(
+        "bundle", short_help="Pack a granule's metadata files into one bundle"
+    )
+    @click.argument("src")
+    @click.argument("dst")
+    def bundle_command(src: str, dst: str):
+        """Packs the metadata files that creating an item reads into a single
+        compressed bundle, which create-item accepts in place of the granule.
+
+        SRC is the path to the granule (a SAFE product or granule directory)
+        DST is the directory the bundle, named after the item id, is saved in.
+        """
+        from stactools.sentinel2.bundle import create_bundle
+
+        click.echo(create_bundle(src, dst))
+
+    @sentinel2.group(
+        "queue", short_help="Share item creation between workers with a queue"
+    )
+    def queue():
+        """Commands for a SQLite work queue of granule hrefs, which workers on
+        one or more machines claim under a lease, retrying failures."""
+        pass
+
+    @queue.command("put", short_help="Add granule hrefs to a queue")
+    @click.argument("queue_path")
+    @click.argument("hrefs", type=click.File("r"))
+    def queue_put_command(queue_path: str, hrefs):
+        """Adds the granule hrefs listed in HREFS, one per line ("-" for
+        stdin), to the queue at QUEUE_PATH, creating it if needed. Hrefs that
+        are already queued are ignored."""
+        from stactools.sentinel2.workqueue import SqliteQueue
+
+        with SqliteQueue(queue_path) as work_queue:
+            added = work_queue.put(hrefs)
+        click.echo(f"{added} hrefs added")
+
+    @queue.command("work", short_help="Create items for hrefs claimed from a queue")
+    @click.argument("queue_path")
+    @click.argument("dst")
+    @click.option(
+        "--batch-size",
+        type=int,
+        default=10,
+        help="Number of hrefs to claim at a time",
+    )
+    @click.option(
+        "--lease",
+        type=float,
+        default=600.0,
+        help="Seconds a claimed batch is held before it can be claimed again",
+    )
+    @click.option(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Attempts at an href before it is marked failed",
+    )
+    @click.option(
+        "--poll",
+        type=float,
+        help="Keep polling for work at this interval in seconds, rather than "
+        "exiting when the queue is empty",
+    )
+    @click.option(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Item geometry simplification tolerance, e.g., 0.0001",
+    )
+    def queue_work_command(
+        queue_path: str,
+        dst: str,
+        batch_size: int,
+        lease: float,
+        max_attempts: int,
+        poll: Optional[float],
+        tolerance: float,
+    ):
+        """Claims batches of hrefs from the queue at QUEUE_PATH and saves their
+        items in DST, acknowledging each result."""
+        from stactools.sentinel2.reader import HttpReader
+        from stactools.sentinel2.workqueue import SqliteQueue, run_worker
+
+        with SqliteQueue(queue_path, max_attempts=max_attempts) as work_queue:
+            with HttpReader() as reader:
+                counts = run_worker(
+                    work_queue,
+                    dst,
+                    batch_size=batch_size,
+                    lease_seconds=lease,
+                    poll_interval=poll,
+                    tolerance=tolerance,
+                    reader=reader,
+                )
+        click.echo(
+            f"{counts['done']} done, {counts['failed']} failed, {counts['lost']} lost",
+            err=True,
+        )
+
+    @queue.command("status", short_help="Count the tasks in a queue by state")
+    @click.argument("queue_path")
+    @click.option("--failures", is_flag=True, help="List failed hrefs and errors")
+    def queue_status_command(queue_path: str, failures: bool):
+        """Prints the number of queued, leased, done and failed hrefs in the
+        queue at QUEUE_PATH."""
+        from stactools.sentinel2.workqueue import SqliteQueue
+
+        with SqliteQueue(queue_path) as work_queue:
+            counts = work_queue.counts()
+            click.echo(", ".join(f"{n} {state}" for state, n in counts.items()))
+            if failures:
+                for href, error in work_queue.failures():
+                    click.echo(f"FAILED {href}: {error}")
+
+    @sentinel2.command(
+        "verify", short_help="Check a SAFE product against its manifest checksums"
+    )
+    @click.argument("src")
+    @click.option(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of files to hash in parallel",
+    )
+    def verify_command(src: str, workers: int):
+        """Checks the size and checksum of every file listed in the manifest
+        of a SAFE product, zipped or not.
+
+        SRC is the path to the SAFE product. Exits with a non-zero status if
+        any file is missing or does not match.
+        """
+        from stactools.sentinel2.verify import verify_safe
+
+        result = verify_safe(src, max_workers=workers)
+        for path in result.mismatched:
+            click.echo(f"MISMATCH {path}")
+        for path in result.missing:
+            click.echo(f"MISSING {path}")
+        click.echo(
+            f"{len(result.verified)} verified, {len(result.mismatched)} mismatched, "
+            f"{len(result.missing)} missing, {len(result.skipped)} without checksum"
+        )
+        if not result.ok:
+            sys.exit(1)
+
+    @sentinel2.command(
+        "serve", short_help="Create STAC Items for granule hrefs read line by line"
+    )
+    @click.option(
+        "--dst",
+        help="Directory to save items in. If not set, items are written inline",
+    )
+    @click.option(
+        "--socket",
+        "socket_path",
+        help="Listen on this Unix domain socket instead of reading stdin",
+    )
+    @click.option(
+        "-p",
+        "--providers",
+        help="Path to JSON file containing array of additional providers",
+    )
+    @click.option(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Item geometry simplification tolerance, e.g., 0.0001",
+    )
+    @click.option(
+        "--max-connections-per-host",
+        type=int,
+        default=8,
+        help="Maximum concurrent keep-alive connections per metadata host",
+    )
+    @click.option(
+        "--adaptive",
+        is_flag=True,
+        help="Adapt the connections per host, up to the maximum, to throttling "
+        "and latency",
+    )
+    @click.option(
+        "--update",
+        is_flag=True,
+        help="Only write items whose content differs from the saved item",
+    )
+    @click.option(
+        "--keep-created",
+        is_flag=True,
+        help="With --update, keep the created timestamp of the saved item",
+    )
+    def serve_command(
+        dst: Optional[str],
+        socket_path: Optional[str],
+        providers: Optional[str],
+        tolerance: float,
+        max_connections_per_host: int,
+        adaptive: bool,
+        update: bool,
+        keep_created: bool,
+    ):
+        """Runs a resident worker that creates STAC Items for granules.
+
+        Each input line is a granule href, or a JSON object with a "href" key
+        and optional "dst" and create_item keyword arguments. One JSON result
+        line is written per input line, with either the item (or its path, if
+        a destination is set) or an error.
+        """
+        from stactools.sentinel2.reader import HttpReader
+        from stactools.sentinel2.serve import serve, serve_socket
+
+        if keep_created and not update:
+            raise click.UsageError("--keep-created requires --update")
+
+        additional_providers = None
+        if providers is not None:
+            with open(providers) as f:
+                additional_providers = json.load(f)
+
+        with HttpReader(max_connections_per_host, adaptive=adaptive) as reader:
+            kwargs = dict(
+                update=update,
+                keep_created=keep_created,
+                tolerance=tolerance,
+                additional_providers=additional_providers,
+                reader=reader,
+            )
+            if socket_path is not None:
+                serve_socket(socket_path, dst, **kwargs)
+            else:
+                serve(sys.stdin, sys.stdout, dst, **kwargs)
+
     return sentinel2
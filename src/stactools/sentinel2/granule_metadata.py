@@ -12,6 +12,7 @@ from stactools.core.io import ReadHrefModifier
 from stactools.core.io.xml import XmlElement
 from stactools.sentinel2.constants import GRANULE_METADATA_ASSET_KEY
 from stactools.sentinel2.constants import SENTINEL2_PROPERTY_PREFIX as s2_prefix
+from stactools.sentinel2.reader import MetadataReader, get_reader
 
 BASELINE_PROCESSING: Final[Pattern[str]] = re.compile(r"_N(\d\d\.\d\d)")
 
@@ -21,10 +22,15 @@ class GranuleMetadataError(Exception):
 
 
 class GranuleMetadata:
-    def __init__(self, href, read_href_modifier: ReadHrefModifier | None = None):
+    def __init__(
+        self,
+        href,
+        read_href_modifier: ReadHrefModifier | None = None,
+        reader: MetadataReader | None = None,
+    ):
         self.href = href
 
-        self._root = XmlElement.from_file(href, read_href_modifier)
+        self._root = get_reader(reader).read_xml(href, read_href_modifier)
 
         tile_id = self._root.find_text("n1:General_Info/TILE_ID")
         if tile_id is None:
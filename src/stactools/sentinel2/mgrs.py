@@ -1,13 +1,20 @@
 """Implements the :stac-ext:`MGRS Extension <mgrs>`."""
 
+import math
+import os
 import re
+from dataclasses import dataclass
+from functools import lru_cache
 from re import Pattern
-from typing import Any, Optional, Union, cast
+from typing import TYPE_CHECKING, Any, Optional, Union, cast
 
 import pystac
 from pystac.extensions.base import ExtensionManagementMixin, PropertiesExtension
 from pystac.extensions.hooks import ExtensionHooks
 
+if TYPE_CHECKING:
+    from pyproj import Transformer
+
 SCHEMA_URI: str = "https://stac-extensions.github.io/mgrs/v1.0.0/schema.json"
 PREFIX: str = "mgrs:"
 
@@ -248,3 +255,240 @@ class MgrsExtensionHooks(ExtensionHooks):
 
 
 MGRS_EXTENSION_HOOKS: ExtensionHooks = MgrsExtensionHooks()
+
+
+# Sentinel-2 tile grid
+#
+# Sentinel-2 products are tiled on the MGRS 100 km grid squares of each UTM
+# zone and latitude band. Each tile is 109.8 km square, starting at the south
+# west corner of its grid square snapped to a 60 m grid, so that neighbouring
+# tiles overlap by 9.8 km. The tiles are indexed in a binary file shipped with
+# the package, generated by ``scripts/create_mgrs_index.py``, which is memory
+# mapped on first use.
+
+TILE_SIZE: int = 109800
+TILE_ALIGNMENT: int = 60
+SOUTH_FALSE_NORTHING: int = 10_000_000
+
+COLUMN_LETTERS: tuple[str, str, str] = ("ABCDEFGH", "JKLMNPQR", "STUVWXYZ")
+ROW_LETTERS: str = "ABCDEFGHJKLMNPQRSTUV"
+
+TILE_INDEX_PATH: str = os.path.join(os.path.dirname(__file__), "mgrs_tiles.bin")
+TILE_INDEX_MAGIC: bytes = b"S2MGRS\x00\x01"
+# WGS84 bounds are stored in hundredths of a degree, rounded outwards.
+# A tile crossing the antimeridian has its west bound greater than its east.
+TILE_INDEX_FIELDS: list[tuple[str, str]] = [
+    ("tile", "S5"),
+    ("epsg", "<u2"),
+    ("ulx", "<i4"),
+    ("uly", "<i4"),
+    ("west", "<i2"),
+    ("south", "<i2"),
+    ("east", "<i2"),
+    ("north", "<i2"),
+]
+
+TILE_PATTERN: Pattern[str] = re.compile(
+    r"T?(\d{1,2})([CDEFGHJKLMNPQRSTUVWX])([ABCDEFGHJKLMNPQRSTUVWXYZ][ABCDEFGHJKLMNPQRSTUV])"
+)
+
+
+class MgrsTileIndexError(Exception):
+    pass
+
+
+def tile_epsg(utm_zone: int, latitude_band: str) -> int:
+    """The EPSG code of the WGS84 / UTM projection a tile is delivered in."""
+    return (32600 if latitude_band >= "N" else 32700) + utm_zone
+
+
+def tile_code(
+    utm_zone: int, latitude_band: str, easting: float, northing: float
+) -> str:
+    """The tile code, e.g. ``10SDG``, of the grid square containing a UTM
+    coordinate in the zone's northern or southern hemisphere projection."""
+    column = COLUMN_LETTERS[(utm_zone - 1) % 3][int(easting // 100_000) - 1]
+    row_offset = 5 if utm_zone % 2 == 0 else 0
+    row = ROW_LETTERS[(int(northing // 100_000) + row_offset) % len(ROW_LETTERS)]
+    return f"{utm_zone:02d}{latitude_band}{column}{row}"
+
+
+def tile_origin(easting: float, northing: float, south: bool) -> tuple[int, int]:
+    """The UTM upper left corner of the tile whose grid square has its south
+    west corner at ``(easting, northing)``."""
+    false_northing = SOUTH_FALSE_NORTHING if south else 0
+    top = int(northing) + 100_000 - false_northing
+    ulx = int(easting) // TILE_ALIGNMENT * TILE_ALIGNMENT
+    uly = -(-top // TILE_ALIGNMENT) * TILE_ALIGNMENT + false_northing
+    return ulx, uly
+
+
+def normalize_tile_code(code: str) -> str:
+    """Returns a tile code with a zero-padded zone and no ``T`` prefix, e.g.
+    ``07HFE`` for ``T7HFE``."""
+    match = TILE_PATTERN.fullmatch(code.upper())
+    if match is None:
+        raise ValueError(f"Invalid MGRS tile: {code}")
+    utm_zone, latitude_band, grid_square = match.groups()
+    return f"{int(utm_zone):02d}{latitude_band}{grid_square}"
+
+
+@dataclass(frozen=True)
+class MgrsTile:
+    """A Sentinel-2 tile, as stored in the tile index."""
+
+    code: str
+    epsg: int
+    ulx: int
+    uly: int
+    bbox: tuple[float, float, float, float]
+    """Conservative WGS84 bounds. West is greater than east for tiles crossing
+    the antimeridian."""
+
+    @property
+    def utm_zone(self) -> int:
+        return int(self.code[:2])
+
+    @property
+    def latitude_band(self) -> str:
+        return self.code[2]
+
+    @property
+    def grid_square(self) -> str:
+        return self.code[3:]
+
+    @property
+    def proj_bbox(self) -> list[float]:
+        return [
+            float(self.ulx),
+            float(self.uly - TILE_SIZE),
+            float(self.ulx + TILE_SIZE),
+            float(self.uly),
+        ]
+
+    def check_projection(
+        self, epsg: Optional[int], proj_bbox: list[float]
+    ) -> list[str]:
+        """Returns descriptions of how a granule's EPSG code and projected
+        bounds disagree with this tile, if at all. Granules never extend past
+        their tile, but may cover only part of it."""
+        problems = []
+        if epsg != self.epsg:
+            problems.append(
+                f"EPSG {epsg} does not match tile {self.code} ({self.epsg})"
+            )
+        west, south, east, north = self.proj_bbox
+        if not (
+            west <= proj_bbox[0] <= proj_bbox[2] <= east
+            and south <= proj_bbox[1] <= proj_bbox[3] <= north
+        ):
+            problems.append(
+                f"Projected bounds {proj_bbox} are not within tile {self.code} "
+                f"{self.proj_bbox}"
+            )
+        return problems
+
+
+class MgrsTileIndex:
+    """A memory-mapped index of Sentinel-2 tiles, sorted by tile code."""
+
+    def __init__(self, path: str = TILE_INDEX_PATH):
+        import numpy
+
+        with open(path, "rb") as f:
+            if f.read(len(TILE_INDEX_MAGIC)) != TILE_INDEX_MAGIC:
+                raise MgrsTileIndexError(f"{path} is not a Sentinel-2 tile index")
+        self.path = path
+        self._tiles = numpy.memmap(
+            path,
+            dtype=numpy.dtype(TILE_INDEX_FIELDS),
+            mode="r",
+            offset=len(TILE_INDEX_MAGIC),
+        )
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def __contains__(self, code: str) -> bool:
+        return self.get(code) is not None
+
+    def __getitem__(self, code: str) -> MgrsTile:
+        tile = self.get(code)
+        if tile is None:
+            raise KeyError(code)
+        return tile
+
+    def get(self, code: str) -> Optional[MgrsTile]:
+        """Returns the tile with the given code, e.g. ``T10SDG``, ``10SDG`` or
+        ``7HFE``, or None if there is no such tile."""
+        key = normalize_tile_code(code).encode("ascii")
+        codes = self._tiles["tile"]
+        i = int(codes.searchsorted(key))
+        if i == len(codes) or codes[i] != key:
+            return None
+        return self._tile(i)
+
+    def tiles_intersecting(self, bbox: list[float]) -> list[MgrsTile]:
+        """Returns the tiles whose WGS84 bounds intersect ``bbox``, given as
+        ``[west, south, east, north]``, with west greater than east for boxes
+        crossing the antimeridian. Tile bounds are conservative, so this may
+        return tiles that only come close to the box."""
+        import numpy
+
+        west, south = math.floor(bbox[0] * 100), math.floor(bbox[1] * 100)
+        east, north = math.ceil(bbox[2] * 100), math.ceil(bbox[3] * 100)
+        tiles = self._tiles
+        mask = (tiles["south"] <= north) & (tiles["north"] >= south)
+        crosses = tiles["west"] > tiles["east"]
+        intervals = [(west, east)] if west <= east else [(west, 18000), (-18000, east)]
+        overlaps = numpy.zeros(len(tiles), dtype=bool)
+        for low, high in intervals:
+            overlaps |= numpy.where(
+                crosses,
+                (tiles["west"] <= high) | (tiles["east"] >= low),
+                (tiles["west"] <= high) & (tiles["east"] >= low),
+            )
+        return [self._tile(int(i)) for i in numpy.flatnonzero(mask & overlaps)]
+
+    def tiles_at(self, lon: float, lat: float) -> list[MgrsTile]:
+        """Returns the tiles containing a WGS84 point. Tiles overlap, so there
+        may be several."""
+        tiles = []
+        for tile in self.tiles_intersecting([lon, lat, lon, lat]):
+            x, y = utm_transformer(tile.epsg).transform(lon, lat)
+            if (
+                tile.ulx <= x <= tile.ulx + TILE_SIZE
+                and tile.uly - TILE_SIZE <= y <= tile.uly
+            ):
+                tiles.append(tile)
+        return tiles
+
+    def _tile(self, i: int) -> MgrsTile:
+        record = self._tiles[i]
+        return MgrsTile(
+            code=record["tile"].decode("ascii"),
+            epsg=int(record["epsg"]),
+            ulx=int(record["ulx"]),
+            uly=int(record["uly"]),
+            bbox=(
+                int(record["west"]) / 100,
+                int(record["south"]) / 100,
+                int(record["east"]) / 100,
+                int(record["north"]) / 100,
+            ),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_tile_index() -> MgrsTileIndex:
+    """Returns the tile index shipped with the package, mapping it on first
+    use."""
+    return MgrsTileIndex()
+
+
+@lru_cache(maxsize=None)
+def utm_transformer(epsg: int) -> "Transformer":
+    """Returns a cached transformer from WGS84 to the given EPSG code."""
+    from pyproj import Transformer
+
+    return Transformer.from_crs(4326, epsg, always_xy=True)
@@ -0,0 +1,290 @@
+"""Reads just enough of a granule's metadata to decide whether to build an item.
+
+:func:`peek` streams the granule (tile) metadata file and stops parsing at the
+end of ``Image_Content_QI``, discarding the viewing and sun angle grids as it
+goes, so it is much cheaper than :func:`stactools.sentinel2.stac.create_item`.
+:class:`Predicate` evaluates filter expressions such as ``cloud_cover < 20``
+against the resulting :class:`GranulePeek`.
+"""
+
+import ast
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Optional, Union
+
+from pystac.utils import str_to_datetime
+
+from stactools.core.io import ReadHrefModifier
+from stactools.sentinel2.bundle import BUNDLE_EXTENSION, BundleReader
+from stactools.sentinel2.granule_metadata import BASELINE_PROCESSING
+from stactools.sentinel2.reader import MetadataReader, ZipReader, get_reader
+
+TILE_ID_PATTERN = re.compile(r"_T(\d{2}[A-Z]{3})")
+
+PLATFORMS = {
+    "S2A": "sentinel-2a",
+    "S2B": "sentinel-2b",
+    "S2C": "sentinel-2c",
+    "S2D": "sentinel-2d",
+}
+
+
+# Fields that predicates can use, besides Image_Content_QI values, whose names
+# end in one of QUALITY_SUFFIXES
+PEEK_FIELDS = frozenset(
+    {
+        "href",
+        "tile_id",
+        "tile",
+        "platform",
+        "datetime",
+        "date",
+        "processing_baseline",
+        "cloud_cover",
+        "snow_cover",
+        "nodata_percentage",
+        "data_coverage",
+    }
+)
+QUALITY_SUFFIXES = ("_percentage", "_accuracy")
+
+
+class PeekError(Exception):
+    pass
+
+
+class PredicateError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class GranulePeek:
+    """Identifiers and image content quality indicators of a granule.
+
+    ``datetime`` is the granule's ``SENSING_TIME``, which can be a few minutes
+    after the product start time used as the item datetime. ``quality`` holds
+    every numeric ``Image_Content_QI`` value, keyed by its lower-cased element
+    name, e.g. ``water_percentage``.
+    """
+
+    href: str
+    tile_id: str
+    tile: Optional[str]
+    platform: Optional[str]
+    datetime: Optional[datetime]
+    processing_baseline: Optional[str]
+    cloud_cover: Optional[float]
+    snow_cover: Optional[float]
+    nodata_percentage: Optional[float]
+    quality: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def data_coverage(self) -> Optional[float]:
+        """The percentage of the tile with data."""
+        if self.nodata_percentage is None:
+            return None
+        return 100 - self.nodata_percentage
+
+    def to_dict(self) -> dict[str, Any]:
+        """The values that predicates can refer to."""
+        d = {k: v for k, v in asdict(self).items() if k != "quality"}
+        d["datetime"] = None if self.datetime is None else self.datetime.isoformat()
+        d["date"] = None if self.datetime is None else self.datetime.date().isoformat()
+        d["data_coverage"] = self.data_coverage
+        return {**self.quality, **d}
+
+
+def granule_metadata_href(
+    granule_href: str,
+    read_href_modifier: Optional[ReadHrefModifier],
+    reader: MetadataReader,
+) -> str:
+    """Returns the href of the granule (tile) metadata file."""
+    if granule_href.lower().endswith(".safe"):
+        from stactools.sentinel2.safe_manifest import SafeManifest
+
+        manifest = SafeManifest(granule_href, read_href_modifier, reader)
+        if manifest.granule_metadata_href is None:
+            raise PeekError(f"No granule metadata is listed in {manifest.href}")
+        return manifest.granule_metadata_href
+    return os.path.join(granule_href, "metadata.xml")
+
+
+def peek(
+    granule_href: str,
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    reader: Optional[MetadataReader] = None,
+) -> GranulePeek:
+    """Reads the identifiers and image content quality indicators of a granule,
+    from any of the layouts :func:`~stactools.sentinel2.stac.create_item`
+    accepts."""
+    if granule_href.lower().endswith(".zip"):
+        with ZipReader(granule_href, read_href_modifier, reader) as zip_reader:
+            href = granule_metadata_href(zip_reader.safe_href, None, zip_reader)
+            return _peek(granule_href, href, None, zip_reader)
+    if granule_href.lower().endswith(BUNDLE_EXTENSION):
+        with BundleReader(granule_href, read_href_modifier, reader) as bundle_reader:
+            href = granule_metadata_href(bundle_reader.source_href, None, bundle_reader)
+            return _peek(granule_href, href, None, bundle_reader)
+    reader = get_reader(reader)
+    href = granule_metadata_href(granule_href, read_href_modifier, reader)
+    return _peek(granule_href, href, read_href_modifier, reader)
+
+
+def _peek(
+    granule_href: str,
+    href: str,
+    read_href_modifier: Optional[ReadHrefModifier],
+    reader: MetadataReader,
+) -> GranulePeek:
+    from lxml import etree
+
+    general: dict[str, str] = {}
+    quality: dict[str, float] = {}
+    with reader.open(href, read_href_modifier) as f:
+        for _, element in etree.iterparse(f, events=("end",)):
+            name = etree.QName(element).localname
+            parent = element.getparent()
+            parent_name = None if parent is None else etree.QName(parent).localname
+            if parent_name == "General_Info" and name in ("TILE_ID", "SENSING_TIME"):
+                general[name] = (element.text or "").strip()
+            elif parent_name == "Image_Content_QI":
+                try:
+                    quality[name.lower()] = float(element.text or "")
+                except ValueError:
+                    pass
+            elif name == "Image_Content_QI":
+                break
+            # only the values read above are needed, so drop the parsed tree
+            element.clear()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    if "TILE_ID" not in general:
+        raise PeekError(f"Cannot find TILE_ID in {href}")
+    tile_id = general["TILE_ID"]
+    tile_match = TILE_ID_PATTERN.search(tile_id)
+    baseline_match = BASELINE_PROCESSING.search(tile_id)
+    return GranulePeek(
+        href=granule_href,
+        tile_id=tile_id,
+        tile=tile_match.group(1) if tile_match else None,
+        platform=PLATFORMS.get(tile_id[:3]),
+        datetime=str_to_datetime(general["SENSING_TIME"])
+        if general.get("SENSING_TIME")
+        else None,
+        processing_baseline=baseline_match.group(1) if baseline_match else None,
+        cloud_cover=quality.get("cloudy_pixel_percentage"),
+        snow_cover=quality.get("snow_ice_percentage"),
+        nodata_percentage=quality.get("nodata_pixel_percentage"),
+        quality=quality,
+    )
+
+
+_COMPARISONS = {
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b,
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+
+class Predicate:
+    """A filter expression over the fields of a :class:`GranulePeek`, e.g.
+    ``cloud_cover < 20 and data_coverage >= 50`` or ``tile in ("10SDG",)``.
+
+    Expressions may use comparisons (chained or not), ``and``, ``or``,
+    ``not``, field names, and number, string and tuple literals. A comparison
+    involving a missing value, e.g. a quality indicator that only L2A
+    products have, is false.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        try:
+            tree = ast.parse(expression, mode="eval")
+        except SyntaxError as e:
+            raise PredicateError(f"Invalid predicate {expression!r}: {e.msg}")
+        self._validate(tree.body)
+        self._tree = tree.body
+
+    def __call__(self, record: Union[GranulePeek, dict[str, Any]]) -> bool:
+        values = record.to_dict() if isinstance(record, GranulePeek) else record
+        return bool(self._evaluate(self._tree, values))
+
+    def __repr__(self) -> str:
+        return f"Predicate({self.expression!r})"
+
+    def _validate(self, node: ast.AST) -> None:
+        if isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._validate(value)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            self._validate(node.operand)
+        elif isinstance(node, ast.Compare):
+            for op in node.ops:
+                if type(op) not in _COMPARISONS:
+                    raise PredicateError(f"Unsupported operator in {self.expression!r}")
+            for operand in [node.left, *node.comparators]:
+                self._validate_operand(operand)
+        else:
+            raise PredicateError(
+                f"Predicates must be comparisons joined by and/or/not: "
+                f"{self.expression!r}"
+            )
+
+    def _validate_operand(self, node: ast.AST) -> None:
+        if isinstance(node, ast.Tuple):
+            for element in node.elts:
+                self._validate_operand(element)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            self._validate_operand(node.operand)
+        elif isinstance(node, ast.Name):
+            if node.id not in PEEK_FIELDS and not node.id.endswith(QUALITY_SUFFIXES):
+                raise PredicateError(
+                    f"Unknown field {node.id!r} in {self.expression!r}"
+                )
+        elif not isinstance(node, ast.Constant):
+            raise PredicateError(
+                f"Unsupported value {ast.unparse(node)!r} in {self.expression!r}"
+            )
+
+    def _evaluate(self, node: ast.AST, values: dict[str, Any]) -> Any:
+        if isinstance(node, ast.BoolOp):
+            results = (self._evaluate(value, values) for value in node.values)
+            return all(results) if isinstance(node.op, ast.And) else any(results)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return not self._evaluate(node.operand, values)
+        elif isinstance(node, ast.Compare):
+            left = self._value(node.left, values)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._value(comparator, values)
+                if left is None or right is None:
+                    return False
+                try:
+                    if not _COMPARISONS[type(op)](left, right):
+                        return False
+                except TypeError:
+                    return False
+                left = right
+            return True
+        raise PredicateError(f"Cannot evaluate {ast.unparse(node)!r}")
+
+    def _value(self, node: ast.AST, values: dict[str, Any]) -> Any:
+        if isinstance(node, ast.Name):
+            return values.get(node.id)
+        elif isinstance(node, ast.Constant):
+            return node.value
+        elif isinstance(node, ast.UnaryOp):
+            value = self._value(node.operand, values)
+            return None if value is None else -value
+        elif isinstance(node, ast.Tuple):
+            return tuple(self._value(element, values) for element in node.elts)
+        raise PredicateError(f"Cannot evaluate {ast.unparse(node)!r}")
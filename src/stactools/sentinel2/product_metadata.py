@@ -6,9 +6,9 @@ from pystac.utils import map_opt, str_to_datetime
 from shapely.geometry import Polygon, mapping
 
 from stactools.core.io import ReadHrefModifier
-from stactools.core.io.xml import XmlElement
 from stactools.sentinel2.constants import COORD_ROUNDING, PRODUCT_METADATA_ASSET_KEY
 from stactools.sentinel2.constants import SENTINEL2_PROPERTY_PREFIX as s2_prefix
+from stactools.sentinel2.reader import MetadataReader, get_reader
 from stactools.sentinel2.utils import fix_z_values
 
 
@@ -18,10 +18,13 @@ class ProductMetadataError(Exception):
 
 class ProductMetadata:
     def __init__(
-        self, href, read_href_modifier: Optional[ReadHrefModifier] = None
+        self,
+        href,
+        read_href_modifier: Optional[ReadHrefModifier] = None,
+        reader: Optional[MetadataReader] = None,
     ) -> None:
         self.href = href
-        self._root = XmlElement.from_file(href, read_href_modifier)
+        self._root = get_reader(reader).read_xml(href, read_href_modifier)
 
         product_info_node = self._root.find("n1:General_Info/Product_Info")
         if product_info_node is None:
@@ -0,0 +1,168 @@
+"""Profiles the creation of items, per granule or across a batch.
+
+A :class:`GranuleProfile` runs code under :mod:`cProfile` and, optionally,
+:mod:`tracemalloc`, and saves a ``.pstats`` file (for ``python -m pstats``,
+snakeviz and the like) and a report of the peak traced memory and the top
+lines still holding memory afterwards. Files are named by scene id, e.g.
+``S2A_T07HFE_20190212T192646_L2A.pstats``, so they can be attached to a
+ticket as they are.
+
+:class:`BatchProfiler` collects the profiles of a batch run, from whichever
+process built each granule, and can merge them into ``batch.pstats`` and
+``batch.allocations.txt``.
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Optional
+
+# File name stem of the profiles merged across a batch
+BATCH_NAME = "batch"
+
+# Frames kept per traced allocation; one attributes memory to a line
+ALLOCATION_FRAMES = 1
+
+
+def profile_name(href: str) -> str:
+    """A file name stem for a granule whose scene id is not known."""
+    return re.sub(r"[^\w.-]", "_", os.path.basename(href.rstrip("/"))) or "granule"
+
+
+def format_allocations(
+    top: list[tuple[str, int, int]], peak: int, granules: int = 1
+) -> str:
+    """A report of the peak traced memory and the ``(line, bytes, blocks)``
+    still allocated."""
+    lines = [f"Peak traced memory: {peak / 2**20:.1f} MiB"]
+    if granules > 1:
+        lines[0] += f" (largest of {granules} granules)"
+    lines.append(f"Top {len(top)} lines by memory still allocated:")
+    for rank, (where, size, count) in enumerate(top, 1):
+        lines.append(f"{rank:4}. {where}: {size / 1024:.1f} KiB in {count} blocks")
+    return "\n".join(lines) + "\n"
+
+
+class GranuleProfile:
+    """Profiles the code run in its context. With ``allocations``, also traces
+    memory allocations and keeps the top ``allocations`` lines by memory
+    still allocated at the end, unless something else is already tracing.
+    """
+
+    def __init__(self, allocations: int = 0):
+        self.allocations = allocations
+        self.profile = cProfile.Profile()
+        self.top: list[tuple[str, int, int]] = []
+        self.peak = 0
+        self._tracing = False
+
+    def __enter__(self) -> "GranuleProfile":
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(ALLOCATION_FRAMES)
+            self._tracing = True
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.profile.disable()
+        if self._tracing:
+            snapshot = tracemalloc.take_snapshot()
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self._tracing = False
+            snapshot = snapshot.filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                ]
+            )
+            self.top = [
+                (str(stat.traceback[0]), stat.size, stat.count)
+                for stat in snapshot.statistics("lineno")[: self.allocations]
+            ]
+
+    def save(self, directory: str, name: str) -> dict[str, str]:
+        """Saves ``{name}.pstats`` and, if allocations were traced,
+        ``{name}.allocations.txt`` in ``directory``, returning their paths."""
+        paths = {"pstats": os.path.join(directory, f"{name}.pstats")}
+        self.profile.dump_stats(paths["pstats"])
+        if self.allocations and self.top:
+            paths["allocations"] = os.path.join(directory, f"{name}.allocations.txt")
+            with open(paths["allocations"], "w") as f:
+                f.write(format_allocations(self.top, self.peak))
+        return paths
+
+
+class BatchProfiler:
+    """Collects the profiles of a batch run's granules, each saved in
+    ``directory`` by the process that built it. With ``aggregate``, the
+    profiles are also merged into ``batch.pstats`` and the allocation reports,
+    by adding up the lines in each granule's top ``allocations``, into
+    ``batch.allocations.txt`` when the profiler is closed.
+    """
+
+    def __init__(self, directory: str, allocations: int = 0, aggregate: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.allocations = allocations
+        self.aggregate = aggregate
+        self.granules = 0
+        self._stats: Optional[pstats.Stats] = None
+        self._allocated: dict[str, list[int]] = defaultdict(lambda: [0, 0])
+        self._peak = 0
+
+    @property
+    def options(self) -> dict[str, Any]:
+        """Keyword arguments for :func:`stactools.sentinel2.serve.process_line`."""
+        return {"profile_dir": self.directory, "profile_allocations": self.allocations}
+
+    def add(self, result: dict[str, Any]) -> None:
+        """Adds the profile of a result record, removing the allocations it
+        carries for merging."""
+        profile = result.get("profile")
+        if profile is None:
+            return
+        top = profile.pop("top", [])
+        peak = profile.pop("peak", 0)
+        self.granules += 1
+        if not self.aggregate:
+            return
+        if self._stats is None:
+            self._stats = pstats.Stats(profile["pstats"])
+        else:
+            self._stats.add(profile["pstats"])
+        for where, size, count in top:
+            self._allocated[where][0] += size
+            self._allocated[where][1] += count
+        self._peak = max(self._peak, peak)
+
+    def close(self) -> dict[str, str]:
+        """Writes the merged profiles, if aggregating, returning their paths."""
+        paths: dict[str, str] = {}
+        if self._stats is None:
+            return paths
+        paths["pstats"] = os.path.join(self.directory, f"{BATCH_NAME}.pstats")
+        self._stats.dump_stats(paths["pstats"])
+        if self.allocations and self._allocated:
+            top = sorted(
+                (
+                    (where, size, count)
+                    for where, (size, count) in self._allocated.items()
+                ),
+                key=lambda entry: -entry[1],
+            )[: self.allocations]
+            paths["allocations"] = os.path.join(
+                self.directory, f"{BATCH_NAME}.allocations.txt"
+            )
+            with open(paths["allocations"], "w") as f:
+                f.write(format_allocations(top, self._peak, self.granules))
+        return paths
+
+    def __enter__(self) -> "BatchProfiler":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
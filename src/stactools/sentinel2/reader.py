@@ -0,0 +1,691 @@
+"""Readers for the metadata files that items are created from.
+
+By default metadata is read with :func:`stactools.core.io.read_text`, which
+opens a new connection for every remote file. :class:`HttpReader` keeps a pool
+of keep-alive connections per host instead, so that reading the four or five
+metadata files of a granule (and of the next granule on the same host) only
+pays for connection and TLS setup once. Throttled and failed requests are
+retried with jittered backoff, and a host that keeps failing is left alone for
+a while; with ``adaptive=True`` the per-host concurrency limit adapts to how
+the host responds (see :mod:`stactools.sentinel2.throttle`).
+
+Readers also answer whether an href exists, for any scheme they can read, and
+cache the answers so that probing for optional files is only paid for once.
+
+:class:`ZipReader` reads the metadata of a zipped SAFE product straight out of
+the archive, using the zip central directory to fetch only the members needed.
+"""
+
+import http.client
+import io
+import logging
+import os
+import threading
+import time
+import zipfile
+from collections import OrderedDict, defaultdict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    Literal,
+    Optional,
+    Union,
+    overload,
+)
+from urllib.parse import urlsplit
+
+from stactools.core.io import ReadHrefModifier, read_text
+from stactools.sentinel2.throttle import (
+    RETRY_STATUSES,
+    THROTTLE_STATUSES,
+    AdaptiveLimit,
+    CircuitBreaker,
+    ConcurrencyLimit,
+    RetryPolicy,
+)
+
+if TYPE_CHECKING:
+    from stactools.core.io.xml import XmlElement
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 8
+DEFAULT_TIMEOUT = 30.0
+EXISTS_CACHE_SIZE = 4096
+# Small enough that reading a few metadata members of a remote zip archive does
+# not drag in the surrounding image data.
+ZIP_BLOCK_SIZE = 64 * 1024
+
+
+class HttpReaderError(Exception):
+    pass
+
+
+class ZipReaderError(Exception):
+    pass
+
+
+class MetadataReader:
+    """Reads metadata files using :func:`stactools.core.io.read_text`."""
+
+    def __init__(self) -> None:
+        self._exists_lock = threading.Lock()
+        self._exists_cache: OrderedDict[str, bool] = OrderedDict()
+
+    def exists(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bool:
+        """Returns whether ``href`` exists. Answers are cached per href, with
+        the least recently used answers evicted first."""
+        with self._exists_lock:
+            if href in self._exists_cache:
+                self._exists_cache.move_to_end(href)
+                return self._exists_cache[href]
+        if read_href_modifier is None:
+            result = self._exists(href)
+        else:
+            result = self._exists(read_href_modifier(href))
+        with self._exists_lock:
+            self._exists_cache[href] = result
+            while len(self._exists_cache) > EXISTS_CACHE_SIZE:
+                self._exists_cache.popitem(last=False)
+        return result
+
+    def _exists(self, href: str) -> bool:
+        if urlsplit(href).scheme in ("", "file"):
+            return os.path.exists(href)
+
+        import fsspec
+
+        # as before, a file that cannot be checked, e.g. for lack of a backend
+        # or credentials, is treated as absent
+        try:
+            fs, path = fsspec.core.url_to_fs(href)
+            return bool(fs.exists(path))
+        except Exception as e:
+            logger.debug(f"Cannot check whether {href} exists: {e}")
+            return False
+
+    def read_text(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> str:
+        return read_text(href, read_href_modifier)
+
+    def read_bytes(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bytes:
+        return self.read_text(href, read_href_modifier).encode("utf-8")
+
+    def open(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        """Opens ``href`` for streaming binary reads, e.g. to hash a file."""
+        if read_href_modifier is not None:
+            href = read_href_modifier(href)
+        if urlsplit(href).scheme in ("", "file"):
+            return open(to_vsi_path(href), "rb")
+
+        import fsspec
+
+        return fsspec.open(href, "rb").open()
+
+    def open_seekable(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        """Opens ``href`` for random access, e.g. to read members of a zip
+        archive. Remote files are opened with fsspec, which fetches blocks of
+        :data:`ZIP_BLOCK_SIZE` bytes with ranged reads as they are needed."""
+        if read_href_modifier is not None:
+            href = read_href_modifier(href)
+        if urlsplit(href).scheme in ("", "file"):
+            return open(to_vsi_path(href), "rb")
+
+        import fsspec
+
+        return fsspec.open(href, "rb", block_size=ZIP_BLOCK_SIZE).open()
+
+    def read_xml(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> "XmlElement":
+        from lxml import etree
+
+        from stactools.core.io.xml import XmlElement
+
+        return XmlElement(etree.fromstring(self.read_bytes(href, read_href_modifier)))
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "MetadataReader":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def get_reader(reader: Optional[MetadataReader]) -> MetadataReader:
+    return MetadataReader() if reader is None else reader
+
+
+class HttpReader(MetadataReader):
+    """Reads http(s) hrefs over pooled keep-alive connections.
+
+    At most ``max_connections_per_host`` requests are in flight to any one host
+    at a time; further reads wait for a connection to be returned to the pool.
+    With ``adaptive=True`` that is the ceiling of an
+    :class:`~stactools.sentinel2.throttle.AdaptiveLimit` instead, which backs
+    off when the host throttles or slows down.
+
+    Throttled requests, server errors and dropped connections are retried
+    according to ``retry``. After ``failure_threshold`` consecutive failures,
+    requests to the host raise
+    :class:`~stactools.sentinel2.throttle.CircuitOpenError` without being sent
+    for ``reset_timeout`` seconds.
+
+    Hrefs with other schemes are read like :class:`MetadataReader` does.
+    A single reader is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+        timeout: float = DEFAULT_TIMEOUT,
+        adaptive: bool = False,
+        retry: RetryPolicy = RetryPolicy(),
+        failure_threshold: int = 10,
+        reset_timeout: float = 30.0,
+    ):
+        super().__init__()
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.adaptive = adaptive
+        self.retry = retry
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.connections_opened = 0
+        self.retries = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = (
+            defaultdict(list)
+        )
+        self._limits: dict[tuple[str, str], ConcurrencyLimit] = {}
+        self._breakers: dict[tuple[str, str], CircuitBreaker] = {}
+
+    def read_bytes(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bytes:
+        if read_href_modifier is not None:
+            href = read_href_modifier(href)
+        if urlsplit(href).scheme not in ("http", "https"):
+            return read_text(href).encode("utf-8")
+
+        status, body = self._request("GET", href)
+        if status == 404:
+            raise FileNotFoundError(href)
+        elif status != 200:
+            raise HttpReaderError(f"GET {href} returned HTTP {status}")
+        return body
+
+    def _exists(self, href: str) -> bool:
+        if urlsplit(href).scheme not in ("http", "https"):
+            return super()._exists(href)
+
+        status, _ = self._request("HEAD", href)
+        if status in (405, 501):
+            # HEAD is not supported, so fall back to fetching a single byte
+            status, _ = self._request("GET", href, {"Range": "bytes=0-0"})
+        if status in (200, 206):
+            return True
+        elif status in (403, 404, 410):
+            # Object stores answer 403 for missing keys without list permission
+            return False
+        raise HttpReaderError(f"Probing {href} returned HTTP {status}")
+
+    def read_text(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> str:
+        return str(self.read_bytes(href, read_href_modifier), encoding="utf-8")
+
+    def open(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        """Opens ``href`` for streaming binary reads. An http(s) body is read
+        from the socket as the caller reads it, on a pooled connection that,
+        like the request's place under the host's concurrency limit, is held
+        until the file is closed. It goes back to the pool if the body was read
+        to the end, and is closed otherwise."""
+        if read_href_modifier is not None:
+            href = read_href_modifier(href)
+        if urlsplit(href).scheme not in ("http", "https"):
+            return super().open(href)
+
+        status, body = self._request("GET", href, stream=True)
+        if isinstance(body, _HttpStream):
+            return body  # type: ignore[return-value]
+        elif status == 404:
+            raise FileNotFoundError(href)
+        raise HttpReaderError(f"GET {href} returned HTTP {status}")
+
+    def open_seekable(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        """Opens ``href`` for random access. An http(s) file is read in blocks
+        of :data:`ZIP_BLOCK_SIZE` bytes or more, with ranged GETs that are
+        pooled, retried and throttled like any other request."""
+        if read_href_modifier is not None:
+            href = read_href_modifier(href)
+        if urlsplit(href).scheme not in ("http", "https"):
+            return super().open_seekable(href)
+        return io.BufferedReader(  # type: ignore[return-value]
+            _HttpRangeFile(self, href), ZIP_BLOCK_SIZE
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+    def concurrency(self, href: str) -> int:
+        """The current limit on requests in flight to the host of ``href``."""
+        url = urlsplit(href)
+        return self._host(url.scheme, url.netloc)[0].limit
+
+    @overload
+    def _request(
+        self,
+        method: str,
+        href: str,
+        headers: Optional[dict[str, str]] = None,
+        stream: Literal[False] = False,
+    ) -> tuple[int, bytes]: ...
+
+    @overload
+    def _request(
+        self,
+        method: str,
+        href: str,
+        headers: Optional[dict[str, str]] = None,
+        *,
+        stream: Literal[True],
+    ) -> tuple[int, Union[bytes, "_HttpStream"]]: ...
+
+    def _request(
+        self,
+        method: str,
+        href: str,
+        headers: Optional[dict[str, str]] = None,
+        stream: bool = False,
+    ) -> tuple[int, Union[bytes, "_HttpStream"]]:
+        """Sends a request, retrying as configured, and returns the final
+        status and body. With ``stream``, a successful body is returned unread
+        as an :class:`_HttpStream`."""
+        url = urlsplit(href)
+        key = (url.scheme, url.netloc)
+        path = url.path + (f"?{url.query}" if url.query else "")
+        limit, breaker = self._host(*key)
+        attempt = 0
+        while True:
+            breaker.check()
+            limit.acquire()
+            start = time.monotonic()
+            try:
+                status, body, retry_after = self._attempt(
+                    key, method, path, headers, stream
+                )
+            except (http.client.HTTPException, OSError):
+                limit.release()
+                breaker.record_failure()
+                if attempt >= self.retry.retries:
+                    raise
+                retry_after = None
+            else:
+                latency = time.monotonic() - start
+                if isinstance(body, _HttpStream):
+                    # the limit counts the request in flight until the body
+                    # has been read and the connection is free again
+                    body.on_close = lambda: limit.release(latency)
+                    breaker.record_success()
+                    return status, body
+                throttled = status in THROTTLE_STATUSES
+                limit.release(latency, throttled)
+                final = status not in RETRY_STATUSES or attempt >= self.retry.retries
+                if throttled:
+                    with self._lock:
+                        self.throttled += 1
+                    # a throttling host is up, so only a request that could
+                    # not get through at all counts against it
+                    if final:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_throttled()
+                elif status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if final:
+                    return status, body
+            with self._lock:
+                self.retries += 1
+            time.sleep(self.retry.delay(attempt, retry_after))
+            attempt += 1
+
+    def _attempt(
+        self,
+        key: tuple[str, str],
+        method: str,
+        path: str,
+        headers: Optional[dict[str, str]],
+        stream: bool = False,
+    ) -> tuple[int, Union[bytes, "_HttpStream"], Optional[str]]:
+        connection, reused = self._checkout(key)
+        try:
+            response = self._send(connection, method, path, headers, stream)
+        except (http.client.HTTPException, ConnectionError):
+            connection.close()
+            if not reused:
+                raise
+            # The server closed an idle keep-alive connection; retry once on a
+            # fresh connection.
+            connection, _ = self._checkout(key, fresh=True)
+            try:
+                response = self._send(connection, method, path, headers, stream)
+            except BaseException:
+                connection.close()
+                raise
+        except BaseException:
+            connection.close()
+            raise
+        status, body, retry_after = response
+        if isinstance(body, http.client.HTTPResponse):
+            return status, _HttpStream(self, key, connection, body), retry_after
+        if connection.sock is not None:
+            self._checkin(key, connection)
+        return status, body, retry_after
+
+    def _host(
+        self, scheme: str, netloc: str
+    ) -> tuple[ConcurrencyLimit, CircuitBreaker]:
+        key = (scheme, netloc)
+        with self._lock:
+            if key not in self._limits:
+                if self.adaptive:
+                    self._limits[key] = AdaptiveLimit(self.max_connections_per_host)
+                else:
+                    self._limits[key] = ConcurrencyLimit(self.max_connections_per_host)
+                self._breakers[key] = CircuitBreaker(
+                    f"{scheme}://{netloc}", self.failure_threshold, self.reset_timeout
+                )
+            return self._limits[key], self._breakers[key]
+
+    def _checkout(
+        self, key: tuple[str, str], fresh: bool = False
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if not fresh and self._idle[key]:
+                return self._idle[key].pop(), True
+            self.connections_opened += 1
+        scheme, netloc = key
+        connection_class = (
+            http.client.HTTPSConnection
+            if scheme == "https"
+            else http.client.HTTPConnection
+        )
+        logger.debug(f"Opening connection to {scheme}://{netloc}")
+        return connection_class(netloc, timeout=self.timeout), False
+
+    def _checkin(
+        self, key: tuple[str, str], connection: http.client.HTTPConnection
+    ) -> None:
+        with self._lock:
+            self._idle[key].append(connection)
+
+    def _send(
+        self,
+        connection: http.client.HTTPConnection,
+        method: str,
+        path: str,
+        headers: Optional[dict[str, str]] = None,
+        stream: bool = False,
+    ) -> tuple[int, Union[bytes, http.client.HTTPResponse], Optional[str]]:
+        connection.request(
+            method, path, headers={"Connection": "keep-alive", **(headers or {})}
+        )
+        response = connection.getresponse()
+        if stream and response.status in (200, 206):
+            return response.status, response, None
+        body = response.read()
+        if response.will_close:
+            connection.close()
+        return response.status, body, response.getheader("Retry-After")
+
+
+class _HttpStream(io.RawIOBase):
+    """The body of a streamed response. The pooled connection it is read from
+    is returned to the pool on close if the body was read to the end, and
+    closed otherwise; ``on_close`` is then called."""
+
+    def __init__(
+        self,
+        reader: HttpReader,
+        key: tuple[str, str],
+        connection: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+    ):
+        super().__init__()
+        self.on_close: Optional[Callable[[], None]] = None
+        self._reader = reader
+        self._key = key
+        self._connection = connection
+        self._response = response
+
+    def readable(self) -> bool:
+        return True
+
+    def getheader(self, name: str) -> Optional[str]:
+        return self._response.getheader(name)
+
+    def readinto(self, buffer: Any) -> int:
+        return self._response.readinto(buffer)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            return self._response.read()
+        return self._response.read(size)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if (
+                self._response.isclosed()
+                and not self._response.will_close
+                and self._connection.sock is not None
+            ):
+                self._reader._checkin(self._key, self._connection)
+            else:
+                self._response.close()
+                self._connection.close()
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+            super().close()
+
+
+class _HttpRangeFile(io.RawIOBase):
+    """A seekable http(s) file, each read of which is a ranged GET through an
+    :class:`HttpReader`. The first request fetches the last
+    :data:`ZIP_BLOCK_SIZE` bytes, which tell the size of the file and, for a
+    zip archive, hold its central directory, so they are kept."""
+
+    def __init__(self, reader: HttpReader, href: str):
+        super().__init__()
+        self._reader = reader
+        self._href = href
+        self._position = 0
+        self._tail, content_range = self._get(f"-{ZIP_BLOCK_SIZE}")
+        total = (content_range or "").rpartition("/")[2]
+        if not total.isdigit():
+            raise HttpReaderError(
+                f"GET {href} returned no size in its Content-Range: {content_range}"
+            )
+        self._size = int(total)
+        self._tail_start = self._size - len(self._tail)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._position = position
+        return position
+
+    def readinto(self, buffer: Any) -> int:
+        size = min(len(buffer), self._size - self._position)
+        if size <= 0:
+            return 0
+        if self._position >= self._tail_start:
+            start = self._position - self._tail_start
+            data = self._tail[start : start + size]
+        else:
+            data, _ = self._get(f"{self._position}-{self._position + size - 1}")
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def _get(self, byte_range: str) -> tuple[bytes, Optional[str]]:
+        status, body = self._reader._request(
+            "GET", self._href, {"Range": f"bytes={byte_range}"}, stream=True
+        )
+        if not isinstance(body, _HttpStream):
+            if status == 404:
+                raise FileNotFoundError(self._href)
+            raise HttpReaderError(f"GET {self._href} returned HTTP {status}")
+        with body:
+            if status != 206:
+                raise HttpReaderError(
+                    f"{self._href} cannot be read at random: the host ignores "
+                    "range requests"
+                )
+            return body.read(), body.getheader("Content-Range")
+
+
+def to_vsi_path(href: str) -> str:
+    """Returns the GDAL virtual file system path for an href, e.g.
+    ``/vsicurl/https://...`` for http(s) or ``/vsis3/bucket/key`` for S3."""
+    url = urlsplit(href)
+    if url.scheme == "":
+        return os.path.abspath(href)
+    elif url.scheme == "file":
+        return os.path.abspath(url.path)
+    elif url.scheme in ("http", "https"):
+        return f"/vsicurl/{href}"
+    elif url.scheme == "s3":
+        return f"/vsis3/{url.netloc}{url.path}"
+    elif url.scheme in ("gs", "gcs"):
+        return f"/vsigs/{url.netloc}{url.path}"
+    elif url.scheme in ("az", "abfs", "abfss"):
+        return f"/vsiaz/{url.netloc}{url.path}"
+    raise ValueError(f"Cannot express {href} as a GDAL virtual file system path")
+
+
+class ZipReader(MetadataReader):
+    """Reads members of a zip archive, e.g. a zipped SAFE product, in place.
+
+    Members are addressed by their ``/vsizip/`` path, which is also how GDAL
+    reads them, so hrefs built from :attr:`safe_href` are usable as asset
+    hrefs. Only the zip central directory and the members that are actually
+    read are fetched; the archive is opened with the
+    :meth:`~MetadataReader.open_seekable` of ``reader``, which reads remote
+    archives with ranged reads.
+    """
+
+    def __init__(
+        self,
+        href: str,
+        read_href_modifier: Optional[ReadHrefModifier] = None,
+        reader: Optional[MetadataReader] = None,
+    ):
+        super().__init__()
+        self.href = href
+        vsi_path = to_vsi_path(href)
+        # local paths are already absolute, /vsicurl/ and friends are chained
+        if not vsi_path.startswith("/vsi"):
+            self.vsi_href = f"/vsizip{vsi_path}"
+        else:
+            self.vsi_href = f"/vsizip/{vsi_path}"
+
+        self._file = get_reader(reader).open_seekable(href, read_href_modifier)
+        try:
+            self._zip = zipfile.ZipFile(self._file)
+        except zipfile.BadZipFile as e:
+            self._file.close()
+            raise ZipReaderError(f"{self.href} is not a zip archive: {e}")
+        self._names = frozenset(self._zip.namelist())
+
+    @property
+    def safe_href(self) -> str:
+        """The ``/vsizip/`` href of the SAFE directory in the archive, i.e. the
+        directory containing ``manifest.safe``."""
+        manifests = sorted(
+            name
+            for name in self._names
+            if name == "manifest.safe" or name.endswith("/manifest.safe")
+        )
+        if not manifests:
+            raise ZipReaderError(f"Cannot find manifest.safe in {self.href}")
+        root = os.path.dirname(manifests[0])
+        return f"{self.vsi_href}/{root}" if root else self.vsi_href
+
+    def member_name(self, href: str) -> str:
+        prefix = f"{self.vsi_href}/"
+        if not href.startswith(prefix):
+            raise ZipReaderError(f"{href} is not a member of {self.href}")
+        return href[len(prefix) :]
+
+    def read_bytes(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bytes:
+        name = self.member_name(href)
+        if name not in self._names:
+            raise FileNotFoundError(href)
+        return self._zip.read(name)
+
+    def read_text(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> str:
+        return str(self.read_bytes(href), encoding="utf-8")
+
+    def _exists(self, href: str) -> bool:
+        return self.member_name(href) in self._names
+
+    def open(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        name = self.member_name(href)
+        if name not in self._names:
+            raise FileNotFoundError(href)
+        return self._zip.open(name)  # type: ignore[return-value]
+
+    def close(self) -> None:
+        self._zip.close()
+        self._file.close()
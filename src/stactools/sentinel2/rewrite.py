@@ -0,0 +1,228 @@
+"""Rewrites the asset hrefs of existing items, without reading any metadata.
+
+Items are read from item JSON files or from NDJSON files of items, which are
+streamed line by line so memory use does not grow with the file size. Lines
+that no prefix rule could apply to are copied through without being parsed.
+Files are rewritten in place by writing a temporary file next to them and
+renaming it over the original, and only if something changed.
+"""
+
+import json
+import os
+import re
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from re import Pattern
+from typing import Any, Optional, TextIO, Union
+
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl", ".geojsonl")
+JSON_EXTENSIONS = (".json", ".geojson")
+
+
+class RewriteError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class PrefixRule:
+    """Replaces the prefix ``old`` of an href with ``new``."""
+
+    old: str
+    new: str
+
+    def apply(self, href: str) -> Optional[str]:
+        if href.startswith(self.old):
+            return self.new + href[len(self.old) :]
+        return None
+
+    def might_apply(self, line: str) -> bool:
+        # the prefix as it appears inside a JSON string
+        return json.dumps(self.old)[1:-1] in line
+
+
+@dataclass(frozen=True)
+class RegexRule:
+    """Replaces the first match of ``pattern`` in an href with
+    ``replacement``, which may refer to groups as in :func:`re.sub`."""
+
+    pattern: Pattern[str]
+    replacement: str
+
+    def apply(self, href: str) -> Optional[str]:
+        rewritten, count = self.pattern.subn(self.replacement, href, count=1)
+        return rewritten if count else None
+
+    def might_apply(self, line: str) -> bool:
+        return True
+
+
+Rule = Union[PrefixRule, RegexRule]
+
+
+def regex_rule(pattern: str, replacement: str) -> RegexRule:
+    try:
+        return RegexRule(re.compile(pattern), replacement)
+    except re.error as e:
+        raise RewriteError(f"Invalid pattern {pattern!r}: {e}")
+
+
+@dataclass
+class RewriteStats:
+    """Counts of what a rewrite saw and changed."""
+
+    files: int = 0
+    files_changed: int = 0
+    items: int = 0
+    items_changed: int = 0
+    hrefs_changed: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def add(self, other: "RewriteStats") -> None:
+        self.files += other.files
+        self.files_changed += other.files_changed
+        self.items += other.items
+        self.items_changed += other.items_changed
+        self.hrefs_changed += other.hrefs_changed
+        self.errors.extend(other.errors)
+
+
+def rewrite_href(href: str, rules: Iterable[Rule]) -> str:
+    """Returns the href rewritten by the first rule that applies to it."""
+    for rule in rules:
+        rewritten = rule.apply(href)
+        if rewritten is not None:
+            return rewritten
+    return href
+
+
+def rewrite_item(item: dict[str, Any], rules: Iterable[Rule]) -> int:
+    """Rewrites the hrefs of an item dictionary's assets, and of their
+    alternates, in place. Returns the number of hrefs changed."""
+    rules = list(rules)
+    changed = 0
+    for asset in item.get("assets", {}).values():
+        targets = [asset, *asset.get("alternate", {}).values()]
+        for target in targets:
+            href = target.get("href")
+            if href is None:
+                continue
+            rewritten = rewrite_href(href, rules)
+            if rewritten != href:
+                target["href"] = rewritten
+                changed += 1
+    return changed
+
+
+def rewrite_lines(
+    lines: Iterable[str], rules: Iterable[Rule], stats: RewriteStats
+) -> Iterator[str]:
+    """Rewrites a stream of NDJSON item lines, yielding the output lines."""
+    rules = list(rules)
+    for line in lines:
+        if not line.strip():
+            yield line
+            continue
+        stats.items += 1
+        if not any(rule.might_apply(line) for rule in rules):
+            yield line
+            continue
+        item = json.loads(line)
+        changed = rewrite_item(item, rules)
+        if changed:
+            stats.items_changed += 1
+            stats.hrefs_changed += changed
+            yield json.dumps(item, separators=(",", ":")) + "\n"
+        else:
+            yield line
+
+
+def rewrite_stream(
+    input: TextIO, output: TextIO, rules: Iterable[Rule]
+) -> RewriteStats:
+    """Rewrites NDJSON items from ``input`` to ``output``."""
+    stats = RewriteStats()
+    for line in rewrite_lines(input, rules, stats):
+        output.write(line)
+    return stats
+
+
+def rewrite_file(
+    path: str, rules: Iterable[Rule], dry_run: bool = False
+) -> RewriteStats:
+    """Rewrites an item JSON or NDJSON file in place, if anything changed."""
+    rules = list(rules)
+    stats = RewriteStats(files=1)
+    temporary_path = f"{path}.rewrite.tmp"
+    try:
+        if path.lower().endswith(NDJSON_EXTENSIONS):
+            output_path = os.devnull if dry_run else temporary_path
+            with open(path) as input, open(output_path, "w") as output:
+                for line in rewrite_lines(input, rules, stats):
+                    output.write(line)
+        else:
+            with open(path) as f:
+                item = json.load(f)
+            stats.items = 1
+            changed = rewrite_item(item, rules)
+            if changed:
+                stats.items_changed = 1
+                stats.hrefs_changed = changed
+                if not dry_run:
+                    with open(temporary_path, "w") as f:
+                        json.dump(item, f, indent=2)
+        if stats.items_changed:
+            stats.files_changed = 1
+            if not dry_run:
+                os.replace(temporary_path, path)
+    except (OSError, ValueError) as e:
+        stats.errors.append(f"{path}: {type(e).__name__}: {e}")
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return stats
+
+
+def find_item_files(paths: Iterable[str]) -> Iterator[str]:
+    """Yields the given files, and the JSON and NDJSON files under the given
+    directories."""
+    extensions = JSON_EXTENSIONS + NDJSON_EXTENSIONS
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(extensions):
+                    yield os.path.join(root, name)
+
+
+def rewrite_files(
+    paths: Iterable[str],
+    rules: Iterable[Rule],
+    dry_run: bool = False,
+    max_workers: int = 1,
+) -> RewriteStats:
+    """Rewrites every item file in ``paths`` (files or directories), in
+    ``max_workers`` processes."""
+    rules = list(rules)
+    files = find_item_files(paths)
+    stats = RewriteStats()
+    if max_workers <= 1:
+        for path in files:
+            stats.add(rewrite_file(path, rules, dry_run))
+        return stats
+    with ProcessPoolExecutor(max_workers) as executor:
+        # submit a few files per worker at a time, so that pending work (and
+        # memory) stays bounded however many files there are
+        pending: set[Future[RewriteStats]] = set()
+        for path in files:
+            if len(pending) >= max_workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stats.add(future.result())
+            pending.add(executor.submit(rewrite_file, path, rules, dry_run))
+        for future in pending:
+            stats.add(future.result())
+    return stats
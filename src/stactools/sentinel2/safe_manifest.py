@@ -1,79 +1,147 @@
 import os
+from dataclasses import dataclass
 from typing import Optional
 
 import pystac
+from pystac.extensions.file import FileExtension
+from pystac.utils import map_opt
 
 from stactools.core.io import ReadHrefModifier
-from stactools.core.io.xml import XmlElement
 from stactools.sentinel2.constants import SAFE_MANIFEST_ASSET_KEY
+from stactools.sentinel2.reader import MetadataReader, get_reader
+
+# Multihash function codes and digest lengths, as used by file:checksum
+MULTIHASH_PREFIXES = {
+    "MD5": "d510",
+    "SHA3-256": "1620",
+}
+
+IMAGE_EXTENSIONS = (".jp2", ".tif")
 
 
 class ManifestError(Exception):
     pass
 
 
+@dataclass(frozen=True)
+class DataObject:
+    """A file listed in the dataObjectSection of a SAFE manifest."""
+
+    id: str
+    path: str
+    href: str
+    size: Optional[int] = None
+    checksum_name: Optional[str] = None
+    checksum: Optional[str] = None
+
+    @property
+    def multihash(self) -> Optional[str]:
+        """The checksum as a hex-encoded multihash, or None if the manifest
+        does not give a checksum in a supported algorithm."""
+        prefix = MULTIHASH_PREFIXES.get(self.checksum_name or "")
+        if prefix is None or self.checksum is None:
+            return None
+        return prefix + self.checksum.lower()
+
+    def add_file_info(self, asset: pystac.Asset) -> None:
+        """Sets file:size and file:checksum on the asset. The File Info
+        extension still needs to be added to the Item that owns it."""
+        file = FileExtension.ext(asset)
+        if self.size is not None:
+            file.size = self.size
+        if (multihash := self.multihash) is not None:
+            file.checksum = multihash
+
+
 class SafeManifest:
     def __init__(
-        self, granule_href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+        self,
+        granule_href: str,
+        read_href_modifier: Optional[ReadHrefModifier] = None,
+        reader: Optional[MetadataReader] = None,
     ):
         self.granule_href = granule_href
         self.href = os.path.join(granule_href, "manifest.safe")
 
-        root = XmlElement.from_file(self.href, read_href_modifier)
-        self._data_object_section = root.find("dataObjectSection")
-        if self._data_object_section is None:
+        root = get_reader(reader).read_xml(self.href, read_href_modifier)
+        data_object_section = root.find("dataObjectSection")
+        if data_object_section is None:
             raise ManifestError(
                 f"Manifest at {self.href} does not have a dataObjectSection"
             )
 
-    def _find_href(self, xpaths: list[str]) -> Optional[str]:
-        file_path = None
-        for xpath in xpaths:
-            file_path = self._data_object_section.find_attr("href", xpath)
-            if file_path is not None:
-                break
-
-        if file_path is None:
-            return None
-        else:
+        # Index the data objects once, by ID and by path relative to the product
+        self.data_objects: dict[str, DataObject] = {}
+        for node in data_object_section.element.iterfind("dataObject"):
+            byte_stream = node.find("byteStream")
+            location = None if byte_stream is None else byte_stream.find("fileLocation")
+            if location is None or not location.get("href"):
+                continue
             # Remove relative prefix that some paths have
-            file_path = file_path.strip("./")
-            return os.path.join(self.granule_href, file_path)
+            path = location.get("href").strip("./")
+            checksum = byte_stream.find("checksum")
+            self.data_objects[node.get("ID")] = DataObject(
+                id=node.get("ID"),
+                path=path,
+                href=os.path.join(self.granule_href, path),
+                size=map_opt(int, byte_stream.get("size")),
+                checksum_name=None
+                if checksum is None
+                else checksum.get("checksumName"),
+                checksum=None if checksum is None else checksum.text,
+            )
+        self.data_objects_by_path = {
+            data_object.path: data_object for data_object in self.data_objects.values()
+        }
+
+    def _find_href(self, ids: list[str]) -> Optional[str]:
+        for id in ids:
+            if (data_object := self.data_objects.get(id)) is not None:
+                return data_object.href
+        return None
 
     @property
     def product_metadata_href(self) -> Optional[str]:
         return self._find_href(
-            [
-                'dataObject[@ID="S2_Level-1C_Product_Metadata"]/byteStream/fileLocation',
-                'dataObject[@ID="S2_Level-2A_Product_Metadata"]/byteStream/fileLocation',
-            ]
+            ["S2_Level-1C_Product_Metadata", "S2_Level-2A_Product_Metadata"]
         )
 
     @property
     def inspire_metadata_href(self) -> Optional[str]:
-        return self._find_href(
-            ['dataObject[@ID="INSPIRE_Metadata"]/byteStream/fileLocation']
-        )
+        return self._find_href(["INSPIRE_Metadata"])
 
     @property
     def datastrip_metadata_href(self) -> Optional[str]:
         return self._find_href(
-            [
-                'dataObject[@ID="S2_Level-1C_Datastrip1_Metadata"]/byteStream/fileLocation',
-                'dataObject[@ID="S2_Level-2A_Datastrip1_Metadata"]/byteStream/fileLocation',
-            ]
+            ["S2_Level-1C_Datastrip1_Metadata", "S2_Level-2A_Datastrip1_Metadata"]
         )
 
     @property
     def granule_metadata_href(self) -> Optional[str]:
         return self._find_href(
             [
-                'dataObject[@ID="S2_Level-2A_Tile1_Data"]/byteStream/fileLocation',
-                'dataObject[@ID="S2_Level-1C_Tile1_Metadata"]/byteStream/fileLocation',
-                'dataObject[@ID="S2_Level-2A_Tile1_Metadata"]/byteStream/fileLocation',
+                "S2_Level-2A_Tile1_Data",
+                "S2_Level-1C_Tile1_Metadata",
+                "S2_Level-2A_Tile1_Metadata",
             ]
         )
 
+    @property
+    def image_paths(self) -> list[str]:
+        """Paths, relative to the product, of the images in IMG_DATA."""
+        return [
+            data_object.path
+            for data_object in self.data_objects.values()
+            if "/IMG_DATA/" in data_object.path
+            and data_object.path.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+
+    def data_object_for_href(self, href: str) -> Optional[DataObject]:
+        prefix = os.path.join(self.granule_href, "")
+        if not href.startswith(prefix):
+            return None
+        return self.data_objects_by_path.get(href[len(prefix) :])
+
     def create_asset(self) -> tuple[str, pystac.Asset]:
         asset = pystac.Asset(
             href=self.href, media_type=pystac.MediaType.XML, roles=["metadata"]
@@ -0,0 +1,237 @@
+"""A long-lived worker that creates STAC Items for granules as they arrive.
+
+Each input line is either a granule href, or a JSON object with a ``href`` key
+and optionally ``dst`` and any keyword arguments accepted by
+:func:`stactools.sentinel2.stac.create_item`. One JSON result line is written
+per input line, in the same order. Keeping a single process resident means
+imports, transformer caches and connection pools are only set up once.
+"""
+
+import json
+import logging
+import os
+import socketserver
+import stat
+from contextlib import ExitStack
+from typing import TYPE_CHECKING, Any, Optional, TextIO
+
+if TYPE_CHECKING:
+    from stactools.sentinel2.update import HashIndex
+
+logger = logging.getLogger(__name__)
+
+JOB_KEYS = frozenset(
+    {
+        "href",
+        "dst",
+        "tolerance",
+        "additional_providers",
+        "asset_href_prefix",
+        "allow_fallback_geometry",
+    }
+)
+
+
+def parse_job(line: str) -> dict[str, Any]:
+    """Parses one input line into a job dictionary with at least a ``href``."""
+    line = line.strip()
+    if not line.startswith("{"):
+        return {"href": line}
+    job = json.loads(line)
+    if not isinstance(job, dict) or "href" not in job:
+        raise ValueError("JSON job lines must be objects with a 'href' key")
+    unknown = set(job) - JOB_KEYS
+    if unknown:
+        raise ValueError(f"Unknown job keys: {', '.join(sorted(unknown))}")
+    return job
+
+
+def process_line(
+    line: str,
+    dst: Optional[str] = None,
+    update: bool = False,
+    keep_created: bool = False,
+    hash_index: Optional["HashIndex"] = None,
+    account_io: bool = False,
+    trace_sample: float = 0.0,
+    profile_dir: Optional[str] = None,
+    profile_allocations: int = 0,
+    **kwargs: Any,
+) -> dict:
+    """Creates the item for one input line and returns the result record.
+
+    If a destination directory is given (either as ``dst`` or in the job), the
+    item is saved there and the record contains its path. Otherwise the record
+    contains the item itself. Errors are reported in the record rather than
+    raised, so that one bad granule does not stop the worker.
+
+    With ``update``, an item whose content matches the item already saved is
+    not rewritten and the record has ``"unchanged": true``; see
+    :func:`stactools.sentinel2.update.save_item`.
+
+    With ``account_io``, the metadata reads are made through an
+    :class:`~stactools.sentinel2.accounting.AccountingReader` and the record
+    has their total cost as ``io``.
+
+    With a ``trace_sample`` rate, the line is traced if
+    :func:`~stactools.sentinel2.trace.sampled` and the record has the trace
+    events of its stages as ``trace``.
+
+    With a ``profile_dir``, the line is profiled and the record has the paths
+    of the files saved there as ``profile``; see
+    :class:`~stactools.sentinel2.profiling.GranuleProfile`. With
+    ``profile_allocations``, ``profile`` also carries the ``peak`` memory and
+    the ``top`` allocating lines, for a
+    :class:`~stactools.sentinel2.profiling.BatchProfiler` to merge.
+    """
+    accounting = None
+    if account_io:
+        from stactools.sentinel2.accounting import AccountingReader
+
+        accounting = AccountingReader(kwargs.pop("reader", None))
+        kwargs["reader"] = accounting
+
+    from stactools.sentinel2.trace import TracingReader, record, sampled
+
+    try:
+        job = parse_job(line)
+    except ValueError as e:
+        logger.exception(f"Could not parse job {line.strip()}")
+        return {"href": line.strip(), "error": f"{type(e).__name__}: {e}"}
+    # JSON job lines are sampled and traced by their href, like plain lines
+    href = job["href"]
+    tracing = sampled(href, trace_sample)
+    if tracing:
+        kwargs["reader"] = TracingReader(kwargs.pop("reader", None))
+    profile = None
+    with ExitStack() as stack:
+        if profile_dir is not None:
+            from stactools.sentinel2.profiling import GranuleProfile, profile_name
+
+            profile = stack.enter_context(GranuleProfile(profile_allocations))
+        if tracing:
+            events = stack.enter_context(record(href))
+        result = _process_line(job, dst, update, keep_created, hash_index, **kwargs)
+
+    if tracing:
+        result["trace"] = events
+    if profile is not None:
+        name = result.get("id") or profile_name(result["href"])
+        result["profile"] = profile.save(str(profile_dir), name)
+        if profile_allocations:
+            result["profile"].update(top=profile.top, peak=profile.peak)
+
+    if accounting is not None:
+        result["io"] = accounting.stats.total().to_dict()
+    return result
+
+
+def _process_line(
+    job: dict[str, Any],
+    dst: Optional[str],
+    update: bool,
+    keep_created: bool,
+    hash_index: Optional["HashIndex"],
+    **kwargs: Any,
+) -> dict:
+    from stactools.sentinel2.stac import create_item
+    from stactools.sentinel2.trace import span
+
+    options = dict(job)
+    href = options.pop("href")
+    dst = options.pop("dst", dst)
+    try:
+        item = create_item(granule_href=href, **{**kwargs, **options})
+    except Exception as e:
+        logger.exception(f"Could not create item for {href}")
+        return {"href": href, "error": f"{type(e).__name__}: {e}"}
+
+    if dst is None:
+        return {"href": href, "id": item.id, "item": item.to_dict()}
+
+    item_path = os.path.join(dst, f"{item.id}.json")
+    if update:
+        from stactools.sentinel2.update import save_item
+
+        try:
+            with span("write", path=item_path):
+                written = save_item(item, item_path, keep_created, hash_index)
+        except Exception as e:
+            logger.exception(f"Could not save item for {href}")
+            return {"href": href, "error": f"{type(e).__name__}: {e}"}
+        if not written:
+            return {"href": href, "id": item.id, "path": item_path, "unchanged": True}
+        return {"href": href, "id": item.id, "path": item_path}
+
+    with span("write", path=item_path):
+        item.set_self_href(item_path)
+        item.save_object()
+    return {"href": href, "id": item.id, "path": item_path}
+
+
+def serve(
+    input: TextIO, output: TextIO, dst: Optional[str] = None, **kwargs: Any
+) -> int:
+    """Processes lines from ``input`` until it is exhausted, writing one result
+    line to ``output`` per non-blank input line. Returns the number of lines
+    processed."""
+    count = 0
+    for line in input:
+        if not line.strip():
+            continue
+        result = process_line(line, dst, **kwargs)
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        count += 1
+    return count
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    server: "SocketServer"
+
+    def handle(self) -> None:
+        for raw in self.rfile:
+            line = raw.decode("utf-8")
+            if not line.strip():
+                continue
+            result = process_line(line, self.server.dst, **self.server.kwargs)
+            self.wfile.write((json.dumps(result) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class SocketServer(socketserver.ThreadingUnixStreamServer):
+    """Serves each connection on a Unix domain socket like :func:`serve`.
+
+    A socket left at ``path`` by an earlier server is replaced; anything else
+    there raises :class:`FileExistsError`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, dst: Optional[str] = None, **kwargs: Any):
+        self.path = path
+        self.dst = dst
+        self.kwargs = kwargs
+        _remove_socket(path)
+        super().__init__(path, _LineHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        _remove_socket(self.path)
+
+
+def _remove_socket(path: str) -> None:
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    os.remove(path)
+
+
+def serve_socket(path: str, dst: Optional[str] = None, **kwargs: Any) -> None:
+    """Listens on a Unix domain socket at ``path`` until interrupted."""
+    with SocketServer(path, dst, **kwargs) as server:
+        logger.info(f"Listening on {path}")
+        server.serve_forever()
@@ -1,19 +1,27 @@
+import hashlib
+import json
 import logging
 import math
 import os
 import re
-from dataclasses import dataclass
+import threading
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 from itertools import chain
 from re import Pattern
 from statistics import mean
-from typing import Any, Final, Optional
+from typing import TYPE_CHECKING, Any, Final, Optional, Union
 
-import antimeridian
 import pystac
-from pyproj import Transformer
+import shapely
 from pystac.extensions.classification import Classification, ClassificationExtension
 from pystac.extensions.eo import Band, EOExtension
+from pystac.extensions.file import SIZE_PROP as FILE_SIZE_PROP
+from pystac.extensions.file import FileExtension
 from pystac.extensions.grid import GridExtension
 from pystac.extensions.projection import ProjectionExtension
 from pystac.extensions.raster import DataType, RasterBand, RasterExtension
@@ -25,11 +33,10 @@ from shapely import remove_repeated_points
 from shapely.geometry import MultiPolygon, Polygon
 from shapely.geometry import mapping as shapely_mapping
 from shapely.geometry import shape as shapely_shape
-from shapely.ops import transform as shapely_transform
-from shapely.validation import make_valid
+from shapely.geometry.polygon import orient
 
 from stactools.core.io import ReadHrefModifier
-from stactools.core.projection import transform_from_bbox
+from stactools.sentinel2.bundle import BUNDLE_EXTENSION, BundleReader
 from stactools.sentinel2.constants import (
     ASSET_TO_TITLE,
     BANDS_TO_ASSET_NAME,
@@ -48,15 +55,26 @@ from stactools.sentinel2.constants import (
     UNSUFFIXED_BAND_RESOLUTION,
 )
 from stactools.sentinel2.constants import SENTINEL2_PROPERTY_PREFIX as s2_prefix
-from stactools.sentinel2.granule_metadata import GranuleMetadata, ViewingAngle
-from stactools.sentinel2.mgrs import MgrsExtension
-from stactools.sentinel2.product_metadata import ProductMetadata
-from stactools.sentinel2.safe_manifest import SafeManifest
-from stactools.sentinel2.tileinfo_metadata import TileInfoMetadata
+from stactools.sentinel2.mgrs import MgrsExtension, get_tile_index
+from stactools.sentinel2.reader import MetadataReader, ZipReader, get_reader
+from stactools.sentinel2.trace import span
 from stactools.sentinel2.utils import extract_gsd
+from stactools.sentinel2.verify import verify_safe
+
+# The metadata readers pull in lxml, and the geometry code pulls in pyproj and
+# antimeridian. These are imported where they are used, so that importing this
+# module (and registering the CLI) stays cheap for short-lived processes.
+if TYPE_CHECKING:
+    from pyproj import Transformer
+
+    from stactools.sentinel2.granule_metadata import ViewingAngle
+    from stactools.sentinel2.safe_manifest import DataObject
 
 logger = logging.getLogger(__name__)
 
+# Default number of items that iter_items creates concurrently
+ITER_ITEMS_MAX_WORKERS = 8
+
 MGRS_PATTERN: Final[Pattern[str]] = re.compile(
     r"_T(\d{1,2})([CDEFGHJKLMNPQRSTUVWX])([ABCDEFGHJKLMNPQRSTUVWXYZ][ABCDEFGHJKLMNPQRSTUV])"
 )
@@ -82,6 +100,14 @@ RGB_BANDS: Final[list[Band]] = [
 
 DEFAULT_SCALE = 0.0001
 
+FOOTPRINT_CACHE_SIZE = 1024
+# Footprints larger than this, in square degrees, are taken to be inverted
+MAX_FOOTPRINT_AREA = 100
+
+
+class GeometryError(Exception):
+    """Raised when a granule's footprint cannot be made into a sane geometry."""
+
 
 @dataclass(frozen=True)
 class Metadata:
@@ -99,12 +125,14 @@ class Metadata:
     proj_bbox: list[float]
     resolution_to_shape: dict[int, tuple[int, int]]
     processing_baseline: str
-    viewing_angles: dict[str, ViewingAngle]
+    viewing_angles: dict[str, "ViewingAngle"]
     orbit_state: Optional[str] = None
     relative_orbit: Optional[int] = None
     sun_azimuth: Optional[float] = None
     sun_zenith: Optional[float] = None
     boa_add_offsets: Optional[dict[str, int]] = None
+    # files listed in the SAFE manifest, by path relative to the product
+    data_objects: dict[str, "DataObject"] = field(default_factory=dict)
 
 
 def create_item(
@@ -114,13 +142,21 @@ def create_item(
     read_href_modifier: Optional[ReadHrefModifier] = None,
     asset_href_prefix: Optional[str] = None,
     allow_fallback_geometry: bool = True,
+    reader: Optional[MetadataReader] = None,
+    verify: bool = False,
 ) -> pystac.Item:
     """Create a STAC Item from a Sentinel 2 granule.
 
     Arguments:
         granule_href: The HREF to the granule. This is expected to be a path
             to a SAFE archive, e.g. https://sentinel2l2a01.blob.core.windows.net/sentinel2-l2/01/C/CV/2016/03/27/S2A_MSIL2A_20160327T204522_N0212_R128_T01CCV_20210214T042702.SAFE,
-            or a partial S3 object path, e.g. s3://sentinel-s2-l2a/tiles/10/S/DG/2018/12/31/0/
+            or a partial S3 object path, e.g. s3://sentinel-s2-l2a/tiles/10/S/DG/2018/12/31/0/,
+            or a zipped SAFE archive, e.g. S2A_MSIL2A_20160327T204522_N0212_R128_T01CCV_20210214T042702.SAFE.zip.
+            Metadata is read from zip archives in place, and asset hrefs point into
+            the archive using GDAL /vsizip/ paths.
+            Metadata bundles (.s2meta) made by
+            :func:`~stactools.sentinel2.bundle.create_bundle` are read with a single
+            request, and asset hrefs point at the granule the bundle was made from.
         tolerance: Determines the level of simplification of the geometry
         additional_providers: Optional list of additional providers to set into the Item
         read_href_modifier: A function that takes an HREF and returns a modified HREF.
@@ -129,21 +165,82 @@ def create_item(
         asset_href_prefix: The URL prefix to apply to the asset hrefs
         allow_fallback_geometry: If reading from granule href, allow usage of the product metadata geometry
             if tileInfo file does not have a data footprint. Defaults to True.
+        reader: The reader used to read the metadata files, e.g. a
+            :class:`~stactools.sentinel2.reader.HttpReader` to reuse pooled
+            keep-alive connections across reads and items. Defaults to reading
+            each file with :func:`stactools.core.io.read_text`.
+        verify: If True, check every file of a SAFE product against the size and
+            checksum in its manifest before creating the item, raising a
+            :class:`~stactools.sentinel2.verify.VerificationError` on a mismatch.
+            Only SAFE products (zipped or not) list checksums.
 
     Returns:
         pystac.Item: An item representing the Sentinel 2 scene
     """  # noqa
+    asset_root = granule_href
+    with span("parse"):
+        if granule_href.lower().endswith(".zip"):
+            with ZipReader(granule_href, read_href_modifier, reader) as zip_reader:
+                asset_root = zip_reader.safe_href
+                if verify:
+                    verify_safe(asset_root, reader=zip_reader).raise_for_errors()
+                metadata = metadata_from_safe_manifest(asset_root, None, zip_reader)
+        elif granule_href.lower().endswith(BUNDLE_EXTENSION):
+            if verify:
+                raise ValueError(
+                    f"Cannot verify {granule_href}: bundles only hold metadata files"
+                )
+            with BundleReader(
+                granule_href, read_href_modifier, reader
+            ) as bundle_reader:
+                asset_root = bundle_reader.source_href
+                if bundle_reader.layout == "safe":
+                    metadata = metadata_from_safe_manifest(
+                        asset_root, None, bundle_reader
+                    )
+                else:
+                    metadata = metadata_from_granule_metadata(
+                        asset_root,
+                        None,
+                        tolerance,
+                        allow_fallback_geometry,
+                        bundle_reader,
+                    )
+        elif granule_href.lower().endswith(".safe"):
+            if verify:
+                verify_safe(granule_href, read_href_modifier, reader).raise_for_errors()
+            metadata = metadata_from_safe_manifest(
+                granule_href, read_href_modifier, reader
+            )
+        elif verify:
+            raise ValueError(
+                f"Cannot verify {granule_href}: only SAFE products list checksums"
+            )
+        else:
+            metadata = metadata_from_granule_metadata(
+                granule_href,
+                read_href_modifier,
+                tolerance,
+                allow_fallback_geometry,
+                reader,
+            )
 
-    if granule_href.lower().endswith(".safe"):
-        metadata = metadata_from_safe_manifest(granule_href, read_href_modifier)
-    else:
-        metadata = metadata_from_granule_metadata(
-            granule_href, read_href_modifier, tolerance, allow_fallback_geometry
+    mgrs_match = MGRS_PATTERN.search(metadata.scene_id)
+    with span("geometry"):
+        geometry = make_valid_geometry(
+            metadata.geometry,
+            mgrs_tile="".join(mgrs_match.groups()) if mgrs_match else None,
+            epsg=metadata.epsg,
         )
 
-    geometry = make_valid_geometry(metadata.geometry)
+    # antimeridian's bbox and centroid only differ from shapely's for
+    # multipolygons, i.e. footprints split at the antimeridian
+    if geometry.geom_type == "Polygon":
+        bbox = [round(v, COORD_ROUNDING) for v in geometry.bounds]
+    else:
+        import antimeridian
 
-    bbox = [round(v, COORD_ROUNDING) for v in antimeridian.bbox(geometry)]
+        bbox = [round(v, COORD_ROUNDING) for v in antimeridian.bbox(geometry)]
 
     item = pystac.Item(
         id=metadata.scene_id,
@@ -188,11 +285,15 @@ def create_item(
             f"Could not determine EPSG code for {granule_href}; which is required."
         )
 
-    centroid = antimeridian.centroid(item.geometry)
+    if geometry.geom_type == "Polygon":
+        centroid = geometry.centroid
+    else:
+        import antimeridian
+
+        centroid = antimeridian.centroid(item.geometry)
     projection.centroid = {"lat": round(centroid.y, 5), "lon": round(centroid.x, 5)}
 
     # MGRS and Grid Extension
-    mgrs_match = MGRS_PATTERN.search(metadata.scene_id)
     if mgrs_match and len(mgrs_groups := mgrs_match.groups()) == 3:
         mgrs = MgrsExtension.ext(item, add_if_missing=True)
         mgrs.utm_zone = int(mgrs_groups[0])
@@ -200,6 +301,9 @@ def create_item(
         mgrs.grid_square = mgrs_groups[2]
         grid = GridExtension.ext(item, add_if_missing=True)
         grid.code = f"MGRS-{mgrs.utm_zone:02}{mgrs.latitude_band}{mgrs.grid_square}"
+        check_tile_projection(
+            "".join(mgrs_groups), metadata.epsg, metadata.proj_bbox, metadata.scene_id
+        )
     else:
         logger.error(
             "Error populating MGRS and Grid Extensions fields from ID: "
@@ -242,24 +346,39 @@ def create_item(
 
     # --Assets--
 
-    image_assets = dict(
-        [
-            image_asset_from_href(
-                item=item,
-                asset_href=os.path.join(asset_href_prefix or granule_href, image_path),
-                resolution_to_shape=metadata.resolution_to_shape,
-                proj_bbox=metadata.proj_bbox,
-                media_type=metadata.image_media_type,
-                processing_baseline=metadata.processing_baseline,
-                boa_add_offsets=metadata.boa_add_offsets,
-            )
-            for image_path in metadata.image_paths
-        ]
-    )
+    with span("assets"):
+        image_assets = dict(
+            [
+                image_asset_from_href(
+                    item=item,
+                    asset_href=os.path.join(
+                        asset_href_prefix or asset_root, image_path
+                    ),
+                    resolution_to_shape=metadata.resolution_to_shape,
+                    proj_bbox=metadata.proj_bbox,
+                    media_type=metadata.image_media_type,
+                    processing_baseline=metadata.processing_baseline,
+                    boa_add_offsets=metadata.boa_add_offsets,
+                )
+                for image_path in metadata.image_paths
+            ]
+        )
+
+        # assets are matched to manifest entries by href, as several image paths
+        # may map to the same asset key
+        image_root = os.path.join(asset_href_prefix or asset_root, "")
+        for asset in image_assets.values():
+            if asset.href.startswith(image_root):
+                image_path = asset.href[len(image_root) :]
+                if (data_object := metadata.data_objects.get(image_path)) is not None:
+                    data_object.add_file_info(asset)
+
+        for key, asset in chain(image_assets.items(), metadata.extra_assets.items()):
+            assert key not in item.assets
+            item.add_asset(key, asset)
 
-    for key, asset in chain(image_assets.items(), metadata.extra_assets.items()):
-        assert key not in item.assets
-        item.add_asset(key, asset)
+        if any(FILE_SIZE_PROP in asset.extra_fields for asset in item.assets.values()):
+            FileExtension.add_to(item)
 
     # --Links--
 
@@ -268,6 +387,66 @@ def create_item(
     return item
 
 
+def iter_items(
+    granule_hrefs: Iterable[str],
+    max_workers: int = ITER_ITEMS_MAX_WORKERS,
+    prefetch: Optional[int] = None,
+    ordered: bool = False,
+    **kwargs: Any,
+) -> Iterator[tuple[str, Union[pystac.Item, Exception]]]:
+    """Creates items for many granules concurrently, yielding ``(href, item)``
+    pairs, or ``(href, exception)`` if an item could not be created.
+
+    Hrefs are read from ``granule_hrefs`` lazily, and at most ``prefetch``
+    (by default twice ``max_workers``) items are in flight or waiting to be
+    consumed at any time, so memory use does not grow with the number of
+    hrefs. Results are yielded as they complete or, if ``ordered`` is true,
+    in input order. Other keyword arguments are passed to
+    :func:`create_item`; pass a shared ``reader``, e.g. an
+    :class:`~stactools.sentinel2.reader.HttpReader`, to reuse connections.
+
+    Closing the generator early cancels the hrefs that have not started.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    limit = max(prefetch or 2 * max_workers, 1)
+    hrefs = (href.strip() for href in granule_hrefs if href.strip())
+
+    def create(href: str) -> Union[pystac.Item, Exception]:
+        try:
+            return create_item(href, **kwargs)
+        except Exception as e:
+            logger.debug(f"Could not create item for {href}: {e}")
+            return e
+
+    executor = ThreadPoolExecutor(max_workers, thread_name_prefix="iter_items")
+    try:
+        if ordered:
+            queue: deque[tuple[str, Future[Union[pystac.Item, Exception]]]] = deque()
+            for href in hrefs:
+                queue.append((href, executor.submit(create, href)))
+                if len(queue) >= limit:
+                    head, future = queue.popleft()
+                    yield head, future.result()
+            while queue:
+                head, future = queue.popleft()
+                yield head, future.result()
+        else:
+            pending: dict[Future[Union[pystac.Item, Exception]], str] = {}
+            for href in hrefs:
+                pending[executor.submit(create, href)] = href
+                if len(pending) >= limit:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
 def set_asset_properties(
     asset: pystac.Asset,
     resolution: int,
@@ -275,6 +454,8 @@ def set_asset_properties(
     proj_bbox_10m: list[float],
     gsd: Optional[int] = None,
 ) -> pystac.Asset:
+    from stactools.core.projection import transform_from_bbox
+
     if gsd:
         pystac.CommonMetadata(asset).gsd = gsd
     asset_projection = ProjectionExtension.ext(asset)
@@ -577,14 +758,20 @@ def mk_asset_id(maybe_res: Optional[int], name: str):
 
 # this is used for SAFE archive format
 def metadata_from_safe_manifest(
-    granule_href: str, read_href_modifier: Optional[ReadHrefModifier]
+    granule_href: str,
+    read_href_modifier: Optional[ReadHrefModifier],
+    reader: Optional[MetadataReader] = None,
 ) -> Metadata:
-    safe_manifest = SafeManifest(granule_href, read_href_modifier)
+    from stactools.sentinel2.granule_metadata import GranuleMetadata
+    from stactools.sentinel2.product_metadata import ProductMetadata
+    from stactools.sentinel2.safe_manifest import SafeManifest
+
+    safe_manifest = SafeManifest(granule_href, read_href_modifier, reader)
     product_metadata = ProductMetadata(
-        safe_manifest.product_metadata_href, read_href_modifier
+        safe_manifest.product_metadata_href, read_href_modifier, reader
     )
     granule_metadata = GranuleMetadata(
-        safe_manifest.granule_metadata_href, read_href_modifier
+        safe_manifest.granule_metadata_href, read_href_modifier, reader
     )
     extra_assets = dict(
         [
@@ -624,6 +811,10 @@ def metadata_from_safe_manifest(
         )
         extra_assets["preview"] = pvi_asset
 
+    for asset in extra_assets.values():
+        if (data_object := safe_manifest.data_object_for_href(asset.href)) is not None:
+            data_object.add_file_info(asset)
+
     return Metadata(
         scene_id=product_metadata.scene_id,
         extra_assets=extra_assets,
@@ -637,7 +828,8 @@ def metadata_from_safe_manifest(
             **granule_metadata.metadata_dict,
         },
         image_media_type=product_metadata.image_media_type,
-        image_paths=product_metadata.image_paths,
+        # older or trimmed manifests may not list the images
+        image_paths=safe_manifest.image_paths or product_metadata.image_paths,
         cloudiness_percentage=granule_metadata.cloudiness_percentage,
         snow_ice_percentage=granule_metadata.snow_ice_percentage,
         epsg=granule_metadata.epsg,
@@ -648,6 +840,7 @@ def metadata_from_safe_manifest(
         processing_baseline=granule_metadata.processing_baseline,
         boa_add_offsets=product_metadata.boa_add_offsets,
         viewing_angles=granule_metadata.viewing_angles,
+        data_objects=safe_manifest.data_objects_by_path,
     )
 
 
@@ -658,24 +851,51 @@ def metadata_from_granule_metadata(
     read_href_modifier: Optional[ReadHrefModifier],
     tolerance: float,
     allow_fallback_geometry: bool = True,
+    reader: Optional[MetadataReader] = None,
 ) -> Metadata:
-    granule_metadata = GranuleMetadata(
-        os.path.join(granule_metadata_href, "metadata.xml"), read_href_modifier
-    )
-    tileinfo_metadata = TileInfoMetadata(
-        os.path.join(granule_metadata_href, "tileInfo.json"), read_href_modifier
-    )
+    from shapely.ops import transform as shapely_transform
+
+    from stactools.sentinel2.granule_metadata import GranuleMetadata
+    from stactools.sentinel2.product_metadata import ProductMetadata
+    from stactools.sentinel2.tileinfo_metadata import TileInfoMetadata
+
+    reader = get_reader(reader)
+
+    def read_product_metadata_if_exists(href: str) -> Optional[ProductMetadata]:
+        if reader.exists(href, read_href_modifier):
+            return ProductMetadata(href, read_href_modifier, reader)
+        return None
+
+    # The tile-level product metadata is optional, so probing for it (and
+    # reading it) happens alongside the other reads rather than after them.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        product_metadata_future = executor.submit(
+            read_product_metadata_if_exists,
+            os.path.join(granule_metadata_href, "product_metadata.xml"),
+        )
+        tileinfo_metadata_future = executor.submit(
+            TileInfoMetadata,
+            os.path.join(granule_metadata_href, "tileInfo.json"),
+            read_href_modifier,
+            reader,
+        )
+        granule_metadata = GranuleMetadata(
+            os.path.join(granule_metadata_href, "metadata.xml"),
+            read_href_modifier,
+            reader,
+        )
+        tileinfo_metadata = tileinfo_metadata_future.result()
+        product_metadata = product_metadata_future.result()
 
-    product_metadata = None
-    if os.path.exists(f := os.path.join(granule_metadata_href, "product_metadata.xml")):
-        product_metadata = ProductMetadata(f, read_href_modifier)
-    elif granule_metadata_href.startswith("https://roda.sentinel-hub.com"):
+    if product_metadata is None and granule_metadata_href.startswith(
+        "https://roda.sentinel-hub.com"
+    ):
         f = (
             granule_metadata_href.split("tiles/")[0]
             + tileinfo_metadata.product_path
             + "/metadata.xml"
         )
-        product_metadata = ProductMetadata(f, read_href_modifier)
+        product_metadata = ProductMetadata(f, read_href_modifier, reader)
 
     # check if tile info has geometry, and non-empty coordinates
     if tileinfo_metadata.geometry and (
@@ -684,10 +904,9 @@ def metadata_from_granule_metadata(
         # force_over to force latitude to not wrap around the antimeridian.
         # this is common with vertices where the latitude is within the
         # tolerance to be considered "on the antimeridian"
-        # (introduced in pyproj 3.4.0+, but only worked with 3.5.0+)
-        transformer = Transformer.from_crs(
-            granule_metadata.epsg, 4326, force_over=True, always_xy=True
-        )
+        # (introduced in pyproj 3.4.0+, but only worked with 3.5.0+);
+        # see wgs84_transformer
+        transformer = wgs84_transformer(granule_metadata.epsg)
         geometry = shapely_mapping(
             shapely_transform(
                 transformer.transform, shapely_shape(tileinfo_metadata.geometry)
@@ -750,6 +969,31 @@ def metadata_from_granule_metadata(
     )
 
 
+def check_tile_projection(
+    tile_code: str, epsg: int, proj_bbox: list[float], scene_id: str
+) -> None:
+    """Logs a warning if a granule's EPSG code or projected bounds do not fit
+    its MGRS tile."""
+    tile = get_tile_index().get(tile_code)
+    if tile is None:
+        logger.warning(f"{scene_id}: {tile_code} is not a known Sentinel-2 tile")
+        return
+    for problem in tile.check_projection(epsg, proj_bbox):
+        logger.warning(f"{scene_id}: {problem}")
+
+
+@lru_cache(maxsize=None)
+def wgs84_transformer(epsg: int) -> "Transformer":
+    """Returns a transformer from the given EPSG code to WGS84.
+
+    Transformers are slow to construct and there are only a few hundred UTM
+    zones, so they are cached for the lifetime of the process.
+    """
+    from pyproj import Transformer
+
+    return Transformer.from_crs(epsg, 4326, force_over=True, always_xy=True)
+
+
 def offset_for_pb(processing_baseline: str) -> float:
     if processing_baseline < "04.00":
         return 0
@@ -782,9 +1026,98 @@ def raster_bands(
     ]
 
 
-def make_valid_geometry(input_geometry: dict[str, Any]) -> Polygon | MultiPolygon:
+class FootprintCache:
+    """A thread-safe LRU cache of valid footprints.
+
+    Most granules cover their whole MGRS tile, so revisits of a tile produce
+    the same input footprint and the same valid geometry. Entries are keyed by
+    MGRS tile, EPSG code and a digest of the input geometry, so granules that
+    only partially cover a tile are cached separately (and rarely hit).
+    """
+
+    def __init__(self, maxsize: int = FOOTPRINT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[
+            tuple[str, Optional[int], str], Polygon | MultiPolygon
+        ] = OrderedDict()
+
+    @staticmethod
+    def key(
+        mgrs_tile: str, epsg: Optional[int], input_geometry: dict[str, Any]
+    ) -> tuple[str, Optional[int], str]:
+        # JSON serialization normalizes tuples to lists and orders the keys;
+        # floats are written exactly, so only identical geometries match.
+        normalized = json.dumps(input_geometry, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16)
+        return mgrs_tile, epsg, digest.hexdigest()
+
+    def get(
+        self, key: tuple[str, Optional[int], str]
+    ) -> Optional[Polygon | MultiPolygon]:
+        with self._lock:
+            geometry = self._entries.get(key)
+            if geometry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return geometry
+
+    def put(
+        self, key: tuple[str, Optional[int], str], geometry: Polygon | MultiPolygon
+    ) -> None:
+        with self._lock:
+            self._entries[key] = geometry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+FOOTPRINT_CACHE = FootprintCache()
+
+
+def make_valid_geometry(
+    input_geometry: dict[str, Any],
+    mgrs_tile: Optional[str] = None,
+    epsg: Optional[int] = None,
+) -> Polygon | MultiPolygon:
+    """Returns a valid, antimeridian-aware footprint for ``input_geometry``.
+
+    If ``mgrs_tile`` is given, results are cached in :data:`FOOTPRINT_CACHE`,
+    so that repeat acquisitions of a tile skip the geometry pipeline. Shapely
+    geometries are immutable, so cached results are safe to share.
+    """
+    if mgrs_tile is None:
+        return _make_valid_geometry(input_geometry)
+    key = FOOTPRINT_CACHE.key(mgrs_tile, epsg, input_geometry)
+    geometry = FOOTPRINT_CACHE.get(key)
+    if geometry is None:
+        geometry = _make_valid_geometry(input_geometry, int(mgrs_tile[:-3]))
+        FOOTPRINT_CACHE.put(key, geometry)
+    return geometry
+
+
+def _make_valid_geometry(
+    input_geometry: dict[str, Any], utm_zone: Optional[int] = None
+) -> Polygon | MultiPolygon:
+    from shapely.validation import make_valid
+
     # ensure that we have a valid geometry, fixing any antimeridian issues
-    shapely_geometry = shapely_shape(antimeridian.fix_shape(input_geometry))
+    if utm_zone is not None and is_far_from_antimeridian(input_geometry, utm_zone):
+        shapely_geometry = fix_ordinary_polygon(input_geometry)
+    else:
+        import antimeridian
+
+        shapely_geometry = shapely_shape(antimeridian.fix_shape(input_geometry))
     geometry = make_valid(shapely_geometry)
 
     # make_valid can result in linestrings being created, if GeometeryCollection,
@@ -804,7 +1137,66 @@ def make_valid_geometry(input_geometry: dict[str, Any]) -> Polygon | MultiPolygo
     # resulting in a wildly-incorrect geometry, we fail here if the geometry
     # is unreasonably large. Typical areas will no greater than 3, whereas an
     # incorrect globe-covering geometry will have an area for 61110.
-    if (ga := geometry.area) > 100:
-        raise Exception(f"Area of geometry is {ga}, which is too large to be correct.")
+    if (ga := geometry.area) > MAX_FOOTPRINT_AREA:
+        raise GeometryError(
+            f"Area of geometry is {ga}, which is too large to be correct."
+        )
 
     return geometry
+
+
+# Footprints with longitudes within this many degrees of ±180, or latitudes
+# beyond this, go through the full antimeridian handling
+ANTIMERIDIAN_MARGIN = 1.0
+POLAR_LATITUDE = 80.0
+
+
+def is_far_from_antimeridian(input_geometry: dict[str, Any], utm_zone: int) -> bool:
+    """Returns whether a footprint can neither cross the antimeridian nor
+    enclose a pole, so that :func:`fix_ordinary_polygon` gives the same result
+    as :func:`antimeridian.fix_shape`.
+
+    Only tiles in UTM zones 1 and 60 touch ±180, and only polar tiles can
+    enclose a pole; the raw coordinate range is checked as well, in case the
+    tile and the footprint disagree.
+    """
+    if utm_zone in (1, 60) or input_geometry.get("type") != "Polygon":
+        return False
+    points = list(chain.from_iterable(input_geometry["coordinates"]))
+    if not points:
+        return False
+    longitudes = [point[0] for point in points]
+    west, east = min(longitudes), max(longitudes)
+    return (
+        west > -180 + ANTIMERIDIAN_MARGIN
+        and east < 180 - ANTIMERIDIAN_MARGIN
+        and east - west < 180
+        and all(abs(point[1]) < POLAR_LATITUDE for point in points)
+    )
+
+
+def fix_ordinary_polygon(input_geometry: dict[str, Any]) -> Polygon:
+    """Does what :func:`antimeridian.fix_shape` does to a polygon that does not
+    cross the antimeridian, without checking every edge for a crossing.
+
+    The exterior's longitudes are normalized and near-duplicate points are
+    dropped, exactly as antimeridian does, and clockwise polygons are
+    reoriented.
+    """
+    exterior, *interiors = input_geometry["coordinates"]
+    coords: list[tuple[float, ...]] = []
+    for x, y, *z in exterior:
+        point = (((x + 180) % 360) - 180, y, *z)
+        if (
+            not coords
+            or abs(point[0] - coords[-1][0]) > 1e-8
+            or abs(point[1] - coords[-1][1]) > 1e-8
+            or any(abs(a - b) > 1e-8 for a, b in zip(point[2:], coords[-1][2:]))
+        ):
+            coords.append(point)
+    polygon = Polygon(coords, interiors)
+    if not shapely.is_ccw(polygon.exterior) or any(
+        shapely.is_ccw(interior) for interior in polygon.interiors
+    ):
+        polygon = orient(polygon)
+    return polygon
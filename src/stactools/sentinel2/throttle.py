@@ -0,0 +1,211 @@
+"""Concurrency limits, retries and circuit breaking for remote reads.
+
+:class:`HttpReader <stactools.sentinel2.reader.HttpReader>` keeps one
+:class:`ConcurrencyLimit` and one :class:`CircuitBreaker` per host.
+:class:`AdaptiveLimit` adjusts its limit AIMD-style, like TCP congestion
+control: it grows by about one request per round trip while requests succeed
+and halves when the host throttles (HTTP 429 or 503) or when latency climbs
+well above its long-run average, at most once per round trip.
+"""
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean the host wants fewer requests
+THROTTLE_STATUSES = frozenset({429, 503})
+# Responses worth retrying
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host that keeps failing."""
+
+
+class ConcurrencyLimit:
+    """Limits the number of requests in flight to ``limit``."""
+
+    def __init__(self, limit: int):
+        self._limit = float(limit)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), 1)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False) -> None:
+        """Returns a slot, recording how long the request took (None if it
+        failed without a response) and whether it was throttled."""
+        with self._condition:
+            self._in_flight -= 1
+            self._record(latency, throttled)
+            self._condition.notify_all()
+
+    def _record(self, latency: Optional[float], throttled: bool) -> None:
+        pass
+
+
+class AdaptiveLimit(ConcurrencyLimit):
+    """A limit between ``minimum`` and ``maximum`` that adapts to the host.
+
+    Starts at ``initial`` (by default a quarter of ``maximum``). Each response
+    without congestion adds ``1 / limit``; a throttled response, or a latency
+    average over ``latency_tolerance`` times the long-run average, multiplies
+    the limit by ``backoff``. Set ``latency_tolerance`` to None to react to
+    throttling only.
+    """
+
+    # weights of the latest latency in the short- and long-run averages
+    SHORT_WEIGHT = 0.3
+    LONG_WEIGHT = 0.02
+
+    def __init__(
+        self,
+        maximum: int,
+        minimum: int = 1,
+        initial: Optional[int] = None,
+        backoff: float = 0.5,
+        latency_tolerance: Optional[float] = 2.0,
+    ):
+        if not 1 <= minimum <= maximum:
+            raise ValueError(f"Invalid limits {minimum} to {maximum}")
+        if initial is None:
+            initial = max(maximum // 4, minimum)
+        super().__init__(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.decreases = 0
+        self._short_latency: Optional[float] = None
+        self._long_latency: Optional[float] = None
+        self._last_decrease = 0.0
+
+    def _record(self, latency: Optional[float], throttled: bool) -> None:
+        congested = throttled
+        if latency is not None:
+            if self._short_latency is None or self._long_latency is None:
+                self._short_latency = self._long_latency = latency
+            else:
+                self._short_latency += self.SHORT_WEIGHT * (
+                    latency - self._short_latency
+                )
+                self._long_latency += self.LONG_WEIGHT * (latency - self._long_latency)
+            if (
+                self.latency_tolerance is not None
+                and self._short_latency > self.latency_tolerance * self._long_latency
+            ):
+                congested = True
+
+        if not congested:
+            self._limit = min(self._limit + 1 / self._limit, float(self.maximum))
+            return
+        # responses to requests sent before the last decrease say nothing about
+        # the new limit, so decrease at most once per round trip
+        now = time.monotonic()
+        if now - self._last_decrease < (self._short_latency or 0.0):
+            return
+        self._last_decrease = now
+        self._limit = max(self._limit * self.backoff, float(self.minimum))
+        self.decreases += 1
+        logger.debug(f"Reduced concurrency to {self.limit}")
+
+
+class CircuitBreaker:
+    """Stops requests to a host after ``failure_threshold`` consecutive
+    failures, for ``reset_timeout`` seconds. Then a single trial request is
+    let through, which closes the circuit if it succeeds and opens it again
+    if it fails."""
+
+    def __init__(
+        self, name: str, failure_threshold: int = 10, reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def check(self) -> None:
+        """Raises :class:`CircuitOpenError` unless a request may be sent."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._trial:
+                raise CircuitOpenError(
+                    f"Not sending requests to {self.name} after "
+                    f"{self._failures} consecutive failures"
+                )
+            self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"Resuming requests to {self.name}")
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_throttled(self) -> None:
+        """Records a throttled response, which only counts against the host if
+        it answers the trial request."""
+        with self._lock:
+            if self._trial:
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial or (
+                self._opened_at is None and self._failures >= self.failure_threshold
+            ):
+                logger.warning(
+                    f"Pausing requests to {self.name} for {self.reset_timeout}s "
+                    f"after {self._failures} consecutive failures"
+                )
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retries up to ``retries`` times, waiting a random time of up to
+    ``base_delay * 2 ** attempt`` seconds ("full jitter") capped at
+    ``max_delay``, or as long as the server asked for in ``Retry-After``."""
+
+    retries: int = 3
+    base_delay: float = 0.1
+    max_delay: float = 10.0
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after is not None:
+            try:
+                return min(max(float(retry_after), 0.0), self.max_delay)
+            except ValueError:
+                # an HTTP date, which is not worth parsing for a hint
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
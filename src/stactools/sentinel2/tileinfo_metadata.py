@@ -6,15 +6,23 @@ import pystac
 from pystac.utils import str_to_datetime
 from shapely.geometry import shape
 
-from stactools.core.io import ReadHrefModifier, read_text
+from stactools.core.io import ReadHrefModifier
 from stactools.sentinel2.constants import SENTINEL2_PROPERTY_PREFIX as s2_prefix
 from stactools.sentinel2.constants import TILEINFO_METADATA_ASSET_KEY
+from stactools.sentinel2.reader import MetadataReader, get_reader
 
 
 class TileInfoMetadata:
-    def __init__(self, href, read_href_modifier: Optional[ReadHrefModifier] = None):
+    def __init__(
+        self,
+        href,
+        read_href_modifier: Optional[ReadHrefModifier] = None,
+        reader: Optional[MetadataReader] = None,
+    ):
         self.href = href
-        self.tileinfo = json.loads(read_text(self.href, read_href_modifier))
+        self.tileinfo = json.loads(
+            get_reader(reader).read_text(self.href, read_href_modifier)
+        )
 
         self._datetime = str_to_datetime(self.tileinfo["timestamp"])
         self._geometry = self.tileinfo.get("tileDataGeometry")
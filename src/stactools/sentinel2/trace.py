@@ -0,0 +1,228 @@
+"""Records where the time of a batch run goes, as a trace-event timeline.
+
+:class:`TraceWriter` writes the Chrome trace-event JSON format, which
+Perfetto (https://ui.perfetto.dev) and ``chrome://tracing`` open. Each traced
+granule is a ``granule`` span on the timeline of the process and thread that
+built it, containing spans for its stages: ``parse`` (reading and parsing
+the metadata), ``fetch`` (each metadata read, within ``parse``),
+``geometry``, ``assets`` and ``write``. Gaps between granules on a worker's
+timeline are time it spent waiting for work.
+
+Only a sample of granules is traced, chosen by a hash of the href so that
+worker processes agree without coordinating and reruns trace the same
+granules. Outside a traced granule, :func:`span` costs a context variable
+lookup.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, BinaryIO, Optional, TextIO
+
+from stactools.core.io import ReadHrefModifier
+from stactools.sentinel2.reader import MetadataReader, get_reader
+
+# The fraction of granules traced unless another is given
+DEFAULT_SAMPLE_RATE = 0.1
+
+CATEGORY = "sentinel2"
+
+_events: ContextVar[Optional[list[dict[str, Any]]]] = ContextVar(
+    "sentinel2_trace_events", default=None
+)
+
+
+def sampled(href: str, rate: float) -> bool:
+    """Whether the granule at ``href`` is traced at a sample ``rate`` between
+    0 and 1. The same href is always sampled, or not, at the same rate."""
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    digest = hashlib.blake2b(href.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") < rate * 2**64
+
+
+class _Span:
+    def __init__(self, events: list[dict[str, Any]], name: str, args: dict):
+        self.events = events
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type: Any, *args: object) -> None:
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.events.append(
+            {
+                "name": self.name,
+                "cat": CATEGORY,
+                "ph": "X",
+                "ts": self.start / 1000,
+                "dur": (end - self.start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": self.args,
+            }
+        )
+
+
+class _NullSpan:
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **args: Any) -> Any:
+    """A context manager timing a stage of the granule being traced, if any."""
+    events = _events.get()
+    if events is None:
+        return _NULL_SPAN
+    return _Span(events, name, args)
+
+
+@contextmanager
+def record(href: str) -> Iterator[list[dict[str, Any]]]:
+    """Traces the granule at ``href`` in this context, yielding the list that
+    its events are appended to as spans end."""
+    events: list[dict[str, Any]] = []
+    token = _events.set(events)
+    try:
+        with _Span(events, "granule", {"href": href}):
+            yield events
+    finally:
+        _events.reset(token)
+
+
+class _TracedFile:
+    """A file whose reads are traced as fetches of an href."""
+
+    def __init__(self, file: BinaryIO, href: str):
+        self._file = file
+        self._href = href
+
+    def read(self, size: int = -1) -> bytes:
+        with span("fetch", href=self._href, op="read"):
+            return self._file.read(size)
+
+    def readinto(self, buffer: Any) -> int:
+        with span("fetch", href=self._href, op="read"):
+            return self._file.readinto(buffer)  # type: ignore[attr-defined]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._file, name)
+
+    def __iter__(self) -> Any:
+        return iter(self.read, b"")
+
+    def __enter__(self) -> "_TracedFile":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self._file.close()
+
+
+class TracingReader(MetadataReader):
+    """Passes reads through to ``reader``, tracing each as a ``fetch`` span."""
+
+    def __init__(self, reader: Optional[MetadataReader] = None):
+        super().__init__()
+        self.reader = get_reader(reader)
+
+    def read_bytes(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bytes:
+        with span("fetch", href=href, op="read"):
+            return self.reader.read_bytes(href, read_href_modifier)
+
+    def read_text(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> str:
+        with span("fetch", href=href, op="read"):
+            return self.reader.read_text(href, read_href_modifier)
+
+    def exists(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> bool:
+        with span("fetch", href=href, op="exists"):
+            return self.reader.exists(href, read_href_modifier)
+
+    def open(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        with span("fetch", href=href, op="open"):
+            file = self.reader.open(href, read_href_modifier)
+        return _TracedFile(file, href)  # type: ignore[return-value]
+
+    def open_seekable(
+        self, href: str, read_href_modifier: Optional[ReadHrefModifier] = None
+    ) -> BinaryIO:
+        with span("fetch", href=href, op="open"):
+            file = self.reader.open_seekable(href, read_href_modifier)
+        return _TracedFile(file, href)  # type: ignore[return-value]
+
+
+class TraceWriter:
+    """Writes trace events to a JSON file as they are added, naming each
+    process after its role in the run.
+
+    The file is only valid JSON once the writer is closed.
+    """
+
+    def __init__(self, path: str, sample_rate: float = DEFAULT_SAMPLE_RATE):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"Sample rates are between 0 and 1, not {sample_rate}")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.granules = 0
+        self._pids: set[int] = set()
+        self._file: TextIO = open(path, "w")
+        self._file.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+        self._first = True
+
+    def _write(self, event: dict[str, Any]) -> None:
+        if not self._first:
+            self._file.write(",\n")
+        self._file.write(json.dumps(event))
+        self._first = False
+
+    def add(self, events: list[dict[str, Any]]) -> None:
+        """Adds the events of one traced granule."""
+        for event in events:
+            if event["pid"] not in self._pids:
+                self._pids.add(event["pid"])
+                name = "main" if event["pid"] == os.getpid() else "worker"
+                self._write(
+                    {
+                        "name": "process_name",
+                        "ph": "M",
+                        "pid": event["pid"],
+                        "args": {"name": f"{name} {event['pid']}"},
+                    }
+                )
+            self._write(event)
+        self.granules += 1
+
+    def close(self) -> None:
+        self._file.write("\n]}\n")
+        self._file.close()
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
@@ -0,0 +1,154 @@
+"""Saves items only when their content has changed.
+
+Rebuilding an item always produces a new ``created`` timestamp, so comparing
+files byte for byte would rewrite every item. :func:`canonical_hash` digests
+an item without its volatile fields, and :func:`save_item` compares that
+digest with the one of the item already at the destination (or recorded in a
+:class:`HashIndex`) before writing.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from pystac import Item
+
+logger = logging.getLogger(__name__)
+
+# Properties that change on every build without the item changing
+VOLATILE_PROPERTIES = frozenset({"created", "updated"})
+
+
+class HashIndexError(Exception):
+    pass
+
+
+def canonical_hash(item: dict[str, Any]) -> str:
+    """Returns a SHA-256 hex digest of an item dictionary that ignores key
+    order, volatile properties and the item's self link."""
+    content = dict(item)
+    content["properties"] = {
+        k: v
+        for k, v in item.get("properties", {}).items()
+        if k not in VOLATILE_PROPERTIES
+    }
+    content["links"] = [
+        link for link in item.get("links", []) if link.get("rel") != "self"
+    ]
+    canonical = json.dumps(
+        content, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class HashIndex:
+    """A JSON file recording the canonical hash and ``created`` timestamp of
+    each saved item, by path, so that existing items need not be read back.
+
+    Changes are kept in memory until :meth:`save`, which replaces the file
+    atomically. Access is thread safe.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Optional[str]]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._entries = json.load(f)
+            except ValueError as e:
+                raise HashIndexError(f"{path} is not a hash index: {e}")
+            if not isinstance(self._entries, dict):
+                raise HashIndexError(f"{path} is not a hash index")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, item_path: str) -> Optional[dict[str, Optional[str]]]:
+        with self._lock:
+            return self._entries.get(item_path)
+
+    def set(self, item_path: str, digest: str, created: Optional[str]) -> None:
+        with self._lock:
+            self._entries[item_path] = {"hash": digest, "created": created}
+
+    def save(self) -> None:
+        with self._lock:
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(self._entries, f, sort_keys=True)
+            os.replace(temporary_path, self.path)
+
+
+def _exists(item_path: str) -> bool:
+    if "://" not in item_path:
+        return os.path.exists(item_path)
+
+    from stactools.sentinel2.reader import MetadataReader
+
+    return MetadataReader().exists(item_path)
+
+
+def _read_existing(item_path: str) -> Optional[dict[str, Any]]:
+    from stactools.core.io import read_text
+
+    if "://" not in item_path and not os.path.exists(item_path):
+        return None
+    try:
+        return json.loads(read_text(item_path))
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logger.warning(f"Cannot parse existing item {item_path}; overwriting it")
+        return None
+
+
+def save_item(
+    item: "Item",
+    item_path: str,
+    keep_created: bool = False,
+    hash_index: Optional[HashIndex] = None,
+) -> bool:
+    """Saves an item at ``item_path`` unless an item with the same canonical
+    hash is already there. Returns whether the item was written.
+
+    The existing item's hash and ``created`` timestamp are taken from the hash
+    index if it has an entry for the path and the file is still there, or else
+    read from the existing file. If ``keep_created`` is true, a changed item
+    keeps the ``created`` timestamp of the item it replaces.
+    """
+    item.set_self_href(item_path)
+    digest = canonical_hash(item.to_dict(include_self_link=False))
+
+    previous = hash_index.get(item_path) if hash_index is not None else None
+    if previous is not None:
+        if not _exists(item_path):
+            logger.info(f"{item_path} is in the hash index but missing; writing it")
+            previous = None
+    else:
+        existing = _read_existing(item_path)
+        if existing is not None:
+            previous = {
+                "hash": canonical_hash(existing),
+                "created": existing.get("properties", {}).get("created"),
+            }
+
+    created = item.properties.get("created")
+    if previous is not None:
+        if keep_created and previous.get("created") is not None:
+            created = previous["created"]
+            item.properties["created"] = created
+        if previous.get("hash") == digest:
+            if hash_index is not None:
+                hash_index.set(item_path, digest, previous.get("created"))
+            return False
+
+    item.save_object(include_self_link=True)
+    if hash_index is not None:
+        hash_index.set(item_path, digest, created)
+    return True
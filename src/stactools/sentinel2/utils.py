@@ -1,13 +1,13 @@
 import re
 from re import Pattern
-from typing import Final, Optional
+from typing import TYPE_CHECKING, Final, Optional
 
 import shapely
 from pystac import Item
 from shapely.geometry import MultiPolygon, Polygon, shape
 
-from stactools.core.utils import antimeridian
-from stactools.core.utils.antimeridian import Strategy
+if TYPE_CHECKING:
+    from stactools.core.utils.antimeridian import Strategy
 
 GSD_PATTERN: Final[Pattern[str]] = re.compile(r"[_R](\d0)m")
 
@@ -41,7 +41,7 @@ def fix_z_values(coord_values: list[str]) -> list[float]:
     return [float(c) for c in coord_values if c]
 
 
-def handle_antimeridian(item: Item, antimeridian_strategy: Strategy) -> None:
+def handle_antimeridian(item: Item, antimeridian_strategy: "Strategy") -> None:
     """Handles some quirks of the antimeridian.
     Applies the requested SPLIT or NORMALIZE strategy via the stactools
     antimeridian utility. If the geometry is already SPLIT (a MultiPolygon,
@@ -54,6 +54,8 @@ def handle_antimeridian(item: Item, antimeridian_strategy: Strategy) -> None:
             normalize geometries so all longitudes are either positive or
             negative.
     """
+    from stactools.core.utils import antimeridian
+
     geometry = shape(item.geometry)
     if isinstance(geometry, MultiPolygon):
         # force all positive lons so we can merge on an antimeridian split
@@ -0,0 +1,150 @@
+"""Verifies the files of a SAFE product against the checksums in its manifest.
+
+Files are hashed in parallel. Local files are memory-mapped and hashed in one
+call, and other files are streamed in large chunks; hashlib releases the GIL
+while hashing, so threads are enough to keep several cores busy.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlsplit
+
+from stactools.core.io import ReadHrefModifier
+from stactools.sentinel2.reader import (
+    MetadataReader,
+    ZipReader,
+    get_reader,
+    to_vsi_path,
+)
+from stactools.sentinel2.safe_manifest import DataObject, SafeManifest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+CHUNK_SIZE = 8 * 1024 * 1024
+
+HASH_FUNCTIONS = {
+    "MD5": hashlib.md5,
+    "SHA3-256": hashlib.sha3_256,
+}
+
+
+class VerificationError(Exception):
+    pass
+
+
+@dataclass
+class VerificationResult:
+    """The outcome of verifying a SAFE product.
+
+    Paths are relative to the product, as listed in the manifest.
+    """
+
+    granule_href: str
+    verified: list[str] = field(default_factory=list)
+    mismatched: list[str] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatched and not self.missing
+
+    def raise_for_errors(self) -> None:
+        if not self.ok:
+            raise VerificationError(
+                f"{self.granule_href} failed verification: "
+                f"{len(self.mismatched)} mismatched and {len(self.missing)} "
+                "missing files"
+            )
+
+
+def verify_safe(
+    granule_href: str,
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    reader: Optional[MetadataReader] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> VerificationResult:
+    """Hashes every file listed in a SAFE product's manifest and compares it
+    with the manifest's size and checksum.
+
+    ``granule_href`` may be a SAFE directory or a zipped SAFE archive.
+    """
+    if granule_href.lower().endswith(".zip"):
+        with ZipReader(granule_href, read_href_modifier, reader) as zip_reader:
+            manifest = SafeManifest(zip_reader.safe_href, reader=zip_reader)
+            return verify_manifest(manifest, None, zip_reader, max_workers)
+    reader = get_reader(reader)
+    manifest = SafeManifest(granule_href, read_href_modifier, reader)
+    return verify_manifest(manifest, read_href_modifier, reader, max_workers)
+
+
+def verify_manifest(
+    manifest: SafeManifest,
+    read_href_modifier: Optional[ReadHrefModifier] = None,
+    reader: Optional[MetadataReader] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> VerificationResult:
+    reader = get_reader(reader)
+    result = VerificationResult(manifest.granule_href)
+
+    def check(data_object: DataObject) -> tuple[DataObject, Optional[bool]]:
+        try:
+            size, digest = hash_file(data_object, read_href_modifier, reader)
+        except FileNotFoundError:
+            return data_object, None
+        if data_object.size is not None and size != data_object.size:
+            return data_object, False
+        return data_object, digest == (data_object.checksum or "").lower()
+
+    to_check = []
+    for data_object in manifest.data_objects.values():
+        if data_object.checksum_name in HASH_FUNCTIONS and data_object.checksum:
+            to_check.append(data_object)
+        else:
+            result.skipped.append(data_object.path)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for data_object, matches in executor.map(check, to_check):
+            if matches is None:
+                logger.warning(f"Missing {data_object.href}")
+                result.missing.append(data_object.path)
+            elif matches:
+                result.verified.append(data_object.path)
+            else:
+                logger.warning(f"Checksum mismatch for {data_object.href}")
+                result.mismatched.append(data_object.path)
+
+    return result
+
+
+def hash_file(
+    data_object: DataObject,
+    read_href_modifier: Optional[ReadHrefModifier],
+    reader: MetadataReader,
+) -> tuple[int, str]:
+    """Returns the size and hex digest of a data object's file, using the hash
+    algorithm named in the manifest."""
+    hash = HASH_FUNCTIONS[data_object.checksum_name or ""]()
+    href = data_object.href
+    size = 0
+    if not isinstance(reader, ZipReader) and urlsplit(href).scheme in ("", "file"):
+        if read_href_modifier is not None:
+            href = read_href_modifier(href)
+        with open(to_vsi_path(href), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # empty files cannot be memory-mapped
+            if size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    hash.update(m)
+    else:
+        with reader.open(href, read_href_modifier) as f:
+            while chunk := f.read(CHUNK_SIZE):
+                size += len(chunk)
+                hash.update(chunk)
+    return size, hash.hexdigest()
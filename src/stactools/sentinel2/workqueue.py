@@ -0,0 +1,339 @@
+"""A shared work queue of granule hrefs, for creating items on many machines.
+
+Workers claim batches of hrefs under a lease, create their items and
+acknowledge each one. A task whose lease expires before it is acknowledged,
+e.g. because its worker died, can be claimed again, and a task that fails is
+retried until it has been attempted ``max_attempts`` times.
+
+:class:`WorkQueue` is the interface workers use; :class:`SqliteQueue`
+implements it with a SQLite database, which can live on a local disk, stand
+in for a real message broker in tests, or be shared between machines on a
+network filesystem.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 600.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 30.0
+DEFAULT_BATCH_SIZE = 10
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    href TEXT NOT NULL UNIQUE,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (state, available_at);
+"""
+
+
+@dataclass(frozen=True)
+class Lease:
+    """A claimed task, held by ``owner`` until ``expires`` (a Unix time)."""
+
+    id: int
+    href: str
+    owner: str
+    expires: float
+    attempts: int
+
+
+class WorkQueue(ABC):
+    """A queue of granule hrefs with leases, retries and visibility timeouts."""
+
+    @abstractmethod
+    def put(self, hrefs: Iterable[str]) -> int:
+        """Adds hrefs that are not already queued, returning how many were
+        added."""
+
+    @abstractmethod
+    def claim(
+        self,
+        owner: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ) -> list[Lease]:
+        """Leases up to ``batch_size`` available tasks to ``owner``."""
+
+    @abstractmethod
+    def ack(self, lease: Lease, result: Optional[dict[str, Any]] = None) -> bool:
+        """Marks a leased task done. Returns False if the lease was lost, e.g.
+        because it expired and the task was claimed by another worker."""
+
+    @abstractmethod
+    def nack(self, lease: Lease, error: str) -> bool:
+        """Records a failed attempt, making the task available again after the
+        retry delay unless it is out of attempts. Returns False if the lease
+        was lost."""
+
+    @abstractmethod
+    def extend(self, lease: Lease, lease_seconds: float) -> Optional[Lease]:
+        """Extends a lease, returning the new lease or None if it was lost."""
+
+    @abstractmethod
+    def counts(self) -> dict[str, int]:
+        """The number of tasks in each state."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+class SqliteQueue(WorkQueue):
+    """A :class:`WorkQueue` in a SQLite database at ``path``.
+
+    Claims run in ``BEGIN IMMEDIATE`` transactions, so concurrent workers
+    never lease the same task. The write-ahead log (``journal_mode="wal"``)
+    lets workers read while another writes, but needs shared memory between
+    the processes; on network filesystems, use ``journal_mode="delete"``.
+    A single queue object is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        journal_mode: str = "wal",
+        timeout: float = 60.0,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        mode = self._connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        if mode.fetchone()[0].lower() != journal_mode.lower():
+            logger.warning(f"Cannot use journal mode {journal_mode} for {path}")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection, self._lock)
+
+    def put(self, hrefs: Iterable[str]) -> int:
+        with self._transaction() as cursor:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO tasks (href) VALUES (?)",
+                ((href.strip(),) for href in hrefs if href.strip()),
+            )
+            return max(cursor.rowcount, 0)
+
+    def claim(
+        self,
+        owner: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ) -> list[Lease]:
+        now = time.time()
+        expires = now + lease_seconds
+        with self._transaction() as cursor:
+            self._expire(cursor, now)
+            rows = cursor.execute(
+                "SELECT id, href, attempts FROM tasks "
+                "WHERE state = ? AND available_at <= ? ORDER BY id LIMIT ?",
+                (QUEUED, now, batch_size),
+            ).fetchall()
+            cursor.executemany(
+                "UPDATE tasks SET state = ?, lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                [(LEASED, owner, expires, row[0]) for row in rows],
+            )
+        return [
+            Lease(id=id, href=href, owner=owner, expires=expires, attempts=attempts + 1)
+            for id, href, attempts in rows
+        ]
+
+    def _expire(self, cursor: sqlite3.Cursor, now: float) -> None:
+        # leases that ran out count as failed attempts
+        cursor.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "error = 'Lease expired', lease_owner = NULL, lease_expires = NULL "
+            "WHERE state = ? AND lease_expires < ?",
+            (self.max_attempts, FAILED, QUEUED, LEASED, now),
+        )
+        if cursor.rowcount:
+            logger.info(f"Re-queued {cursor.rowcount} tasks with expired leases")
+
+    def ack(self, lease: Lease, result: Optional[dict[str, Any]] = None) -> bool:
+        with self._transaction() as cursor:
+            cursor.execute(
+                "UPDATE tasks SET state = ?, result = ?, error = NULL, "
+                "lease_owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND state = ? AND lease_owner = ? "
+                "AND lease_expires = ?",
+                (
+                    DONE,
+                    None if result is None else json.dumps(result),
+                    lease.id,
+                    LEASED,
+                    lease.owner,
+                    lease.expires,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def nack(self, lease: Lease, error: str) -> bool:
+        state = FAILED if lease.attempts >= self.max_attempts else QUEUED
+        with self._transaction() as cursor:
+            cursor.execute(
+                "UPDATE tasks SET state = ?, error = ?, available_at = ?, "
+                "lease_owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND state = ? AND lease_owner = ? "
+                "AND lease_expires = ?",
+                (
+                    state,
+                    error,
+                    time.time() + self.retry_delay,
+                    lease.id,
+                    LEASED,
+                    lease.owner,
+                    lease.expires,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def extend(self, lease: Lease, lease_seconds: float) -> Optional[Lease]:
+        expires = time.time() + lease_seconds
+        with self._transaction() as cursor:
+            cursor.execute(
+                "UPDATE tasks SET lease_expires = ? "
+                "WHERE id = ? AND state = ? AND lease_owner = ? "
+                "AND lease_expires = ?",
+                (expires, lease.id, LEASED, lease.owner, lease.expires),
+            )
+            if cursor.rowcount != 1:
+                return None
+        return Lease(lease.id, lease.href, lease.owner, expires, lease.attempts)
+
+    def counts(self) -> dict[str, int]:
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        with self._transaction() as cursor:
+            for state, count in cursor.execute(
+                "SELECT state, COUNT(*) FROM tasks GROUP BY state"
+            ):
+                counts[state] = count
+        return counts
+
+    def failures(self) -> list[tuple[str, str]]:
+        """The href and last error of every failed task."""
+        with self._transaction() as cursor:
+            return [
+                (href, error)
+                for href, error in cursor.execute(
+                    "SELECT href, error FROM tasks WHERE state = ? ORDER BY id",
+                    (FAILED,),
+                )
+            ]
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class _Transaction:
+    def __init__(self, connection: sqlite3.Connection, lock: threading.Lock):
+        self.connection = connection
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.lock.acquire()
+        try:
+            self.cursor = self.connection.cursor()
+            self.cursor.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.cursor
+
+    def __exit__(self, exc_type: Optional[type], *args: object) -> None:
+        try:
+            if exc_type is None:
+                self.cursor.execute("COMMIT")
+            else:
+                self.cursor.execute("ROLLBACK")
+        finally:
+            self.lock.release()
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def run_worker(
+    queue: WorkQueue,
+    dst: Optional[str] = None,
+    owner: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    poll_interval: Optional[float] = None,
+    **kwargs: Any,
+) -> dict[str, int]:
+    """Claims batches of tasks and creates their items with
+    :func:`stactools.sentinel2.serve.process_line`, acknowledging each result.
+
+    Each lease is renewed for ``lease_seconds`` just before its task is
+    processed. Returns once no task is available, or, if ``poll_interval`` is
+    set, keeps polling for more. Returns the number of tasks done, failed and
+    lost (whose lease expired and was taken by another worker).
+    """
+    from stactools.sentinel2.serve import process_line
+
+    owner = owner or default_worker_id()
+    counts = {"done": 0, "failed": 0, "lost": 0}
+    while True:
+        leases = queue.claim(owner, batch_size, lease_seconds)
+        if not leases:
+            if poll_interval is None:
+                return counts
+            time.sleep(poll_interval)
+            continue
+        for lease in leases:
+            # the batch is leased at once, so each lease is renewed as its turn
+            # comes rather than left to expire behind slow granules
+            renewed = queue.extend(lease, lease_seconds)
+            if renewed is None:
+                counts["lost"] += 1
+                logger.warning(f"Lease on {lease.href} was lost before it started")
+                continue
+            lease = renewed
+            result = process_line(lease.href, dst, **kwargs)
+            if "error" in result:
+                acknowledged = queue.nack(lease, result["error"])
+                key = "failed"
+            else:
+                acknowledged = queue.ack(lease, result)
+                key = "done"
+            counts[key if acknowledged else "lost"] += 1
+            if not acknowledged:
+                logger.warning(f"Lease on {lease.href} expired before it finished")
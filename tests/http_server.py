@@ -0,0 +1,133 @@
+"""A local HTTP stand-in for remote metadata hosts, used by the reader tests.
+
+The stand-in can inject faults: with a ``capacity``, requests beyond that many
+in flight are throttled like an object store would, and ``fault`` can answer
+any request with an error status instead of the file.
+"""
+
+import io
+import os
+import re
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        directory: str,
+        latency: float = 0.0,
+        capacity: Optional[int] = None,
+        throttle_status: int = 503,
+        fault: Optional[Callable[[str], Optional[int]]] = None,
+    ):
+        self.latency = latency
+        self.capacity = capacity
+        self.throttle_status = throttle_status
+        self.fault = fault
+        self.throttled = 0
+        self.faults = 0
+        self.connections = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), partial(StandInHandler, directory=directory))
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class StandInHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StandInServer
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def send_head(self) -> Any:
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(
+                self.server.max_in_flight, self.server.in_flight
+            )
+            throttled = (
+                self.server.capacity is not None
+                and self.server.in_flight > self.server.capacity
+            )
+            if throttled:
+                self.server.throttled += 1
+        try:
+            time.sleep(self.server.latency)
+            status = self.server.fault(self.path) if self.server.fault else None
+            if status is not None:
+                with self.server.lock:
+                    self.server.faults += 1
+                self.send_error(status)
+                return None
+            if throttled:
+                self.send_error(self.server.throttle_status, "Slow Down")
+                return None
+            range_match = re.fullmatch(
+                r"bytes=(\d*)-(\d*)", self.headers.get("Range", "")
+            )
+            path = self.translate_path(self.path)
+            if range_match and os.path.isfile(path):
+                return self.send_range(path, *range_match.groups())
+            return super().send_head()
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def send_range(self, path: str, start: str, end: str) -> io.BytesIO:
+        size = os.path.getsize(path)
+        if not start:
+            first, last = max(size - int(end), 0), size - 1
+        else:
+            first, last = int(start), min(int(end or size - 1), size - 1)
+        with open(path, "rb") as f:
+            f.seek(first)
+            body = f.read(last - first + 1)
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@contextmanager
+def serve_directory(
+    directory: str, latency: float = 0.0, **faults: Any
+) -> Iterator[StandInServer]:
+    """Serves ``directory`` over HTTP on localhost, sleeping ``latency``
+    seconds before answering each request. ``faults`` are passed on to
+    :class:`StandInServer`."""
+    server = StandInServer(directory, latency, **faults)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,114 @@
+import json
+import os
+from pathlib import Path
+
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.accounting import (
+    AccountingReader,
+    BatchIoStats,
+    IoCounts,
+    granule_layout,
+)
+from stactools.sentinel2.bundle import create_bundle
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.reader import HttpReader
+from stactools.sentinel2.serve import process_line
+
+from .http_server import serve_directory
+from .test_reader import DATA_FILES, MANIFEST, SAFE, zip_safe
+
+GRANULE = "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+
+
+def test_accounting_safe() -> None:
+    reader = AccountingReader()
+    stac.create_item(f"{DATA_FILES}/{SAFE}", reader=reader)
+    manifest = reader.stats.hrefs[f"{DATA_FILES}/{MANIFEST}"]
+    assert manifest.requests == 1
+    assert manifest.bytes == os.path.getsize(f"{DATA_FILES}/{MANIFEST}")
+
+    total = reader.stats.total()
+    assert total.requests == 3
+    assert total.bytes == sum(
+        os.path.getsize(href)
+        for href, counts in reader.stats.hrefs.items()
+        if counts.requests
+    )
+    assert total.seconds > 0
+
+
+def test_accounting_matches_http_requests() -> None:
+    with serve_directory(DATA_FILES) as server:
+        with HttpReader() as http_reader:
+            reader = AccountingReader(http_reader)
+            stac.create_item(f"{server.url}/{GRANULE}", reader=reader)
+    total = reader.stats.total()
+    assert total.requests + total.probes == server.requests
+    assert total.probes >= 1
+
+
+def test_accounting_zip_reads_only_metadata(tmp_path: Path) -> None:
+    zip_path = zip_safe(tmp_path)
+    reader = AccountingReader()
+    stac.create_item(str(zip_path), reader=reader)
+    counts = reader.stats.hrefs[str(zip_path)]
+    assert counts.requests == 1
+    assert 0 < counts.bytes < os.path.getsize(zip_path) / 4
+
+
+def test_accounting_bundle(tmp_path: Path) -> None:
+    bundle = create_bundle(f"{DATA_FILES}/{SAFE}", str(tmp_path))
+    reader = AccountingReader()
+    stac.create_item(bundle, reader=reader)
+    total = reader.stats.total()
+    assert (total.requests, total.probes) == (1, 0)
+    assert total.bytes == os.path.getsize(bundle)
+
+
+def test_process_line_accounts_io(tmp_path: Path) -> None:
+    result = process_line(f"{DATA_FILES}/{SAFE}", str(tmp_path), account_io=True)
+    assert result["io"]["requests"] == 3
+    assert "io" not in process_line(f"{DATA_FILES}/{SAFE}", str(tmp_path))
+
+
+def test_batch_io_stats() -> None:
+    stats = BatchIoStats()
+    stats.add("s3://bucket/A.SAFE", IoCounts(requests=3, probes=1, bytes=300))
+    stats.add("s3://bucket/B.SAFE/", IoCounts(requests=3, probes=1, bytes=100))
+    stats.add("s3://bucket/tiles/10/S/DG/2018/12/31/0", IoCounts(requests=3))
+    assert stats.granules == {"safe": 2, "granule": 1}
+    assert stats.total().requests == 9
+    lines = stats.summary()
+    assert len(lines) == 3
+    assert lines[1].startswith("safe: 2 granules, 6 reads (3.0/granule)")
+    assert "400 bytes (200/granule)" in lines[1]
+    assert lines[2].startswith("total: 3 granules, 9 reads")
+    assert granule_layout("a.SAFE.zip") == "zip"
+
+
+def test_create_items_command_io_stats(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text(f"{DATA_FILES}/{SAFE}\n{DATA_FILES}/{GRANULE}\n")
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        ["create-items", str(hrefs), str(tmp_path), "--io-stats"],
+    )
+    assert result.exit_code == 0, result.output
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert all(line["io"]["requests"] > 0 for line in lines)
+    assert "I/O safe: 1 granules, 3 reads" in result.stderr
+    assert "I/O granule: 1 granules" in result.stderr
+    assert "I/O total: 2 granules" in result.stderr
+
+
+def test_create_item_command_io_stats(tmp_path: Path) -> None:
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        ["create-item", f"{DATA_FILES}/{SAFE}", str(tmp_path), "--io-stats"],
+    )
+    assert result.exit_code == 0, result.output
+    assert f"{DATA_FILES}/{MANIFEST}: 1 reads, " in result.stderr
+    assert "Total: 3 reads" in result.stderr
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.aio import AsyncReader, create_item_async
+
+from .http_server import serve_directory
+from .test_reader import DATA_FILES, MANIFEST, SAFE, comparable
+
+GRANULE = "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+NO_PRODUCT_METADATA = "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBP"
+
+
+def test_create_item_async_safe() -> None:
+    expected = stac.create_item(f"{DATA_FILES}/{SAFE}")
+
+    async def create(url: str):
+        async with AsyncReader() as reader:
+            return await create_item_async(f"{url}/{SAFE}", reader=reader)
+
+    with serve_directory(DATA_FILES, latency=0.01) as server:
+        item = asyncio.run(create(server.url))
+    assert comparable(item) == comparable(expected)
+    assert item.assets["safe_manifest"].href == f"{server.url}/{MANIFEST}"
+    assert server.requests == 3
+
+
+@pytest.mark.parametrize("granule", [GRANULE, NO_PRODUCT_METADATA])
+def test_create_item_async_granule_directory(granule: str) -> None:
+    expected = stac.create_item(f"{DATA_FILES}/{granule}")
+
+    with serve_directory(DATA_FILES, latency=0.05) as server:
+        item = asyncio.run(create_item_async(f"{server.url}/{granule}"))
+    assert comparable(item) == comparable(expected)
+    # the files are read concurrently
+    assert server.max_in_flight == 3
+
+
+def test_create_item_async_local() -> None:
+    expected = stac.create_item(f"{DATA_FILES}/{SAFE}")
+    item = asyncio.run(create_item_async(f"{DATA_FILES}/{SAFE}"))
+    assert comparable(item) == comparable(expected)
+
+
+def test_create_items_concurrently() -> None:
+    expected = comparable(stac.create_item(f"{DATA_FILES}/{GRANULE}"))
+
+    async def create(url: str):
+        async with AsyncReader(max_connections_per_host=16) as reader:
+            return await asyncio.gather(
+                *(
+                    create_item_async(f"{url}/{GRANULE}", reader=reader)
+                    for _ in range(40)
+                )
+            )
+
+    with serve_directory(DATA_FILES, latency=0.05) as server:
+        items = asyncio.run(create(server.url))
+    assert all(comparable(item) == expected for item in items)
+    assert 8 < server.max_in_flight <= 16
+
+
+def test_create_item_async_missing_file() -> None:
+    with serve_directory(DATA_FILES) as server:
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(create_item_async(f"{server.url}/missing.SAFE"))
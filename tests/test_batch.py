@@ -0,0 +1,322 @@
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+from shapely.geometry import box
+
+from stactools.sentinel2.batch import (
+    GranuleFilter,
+    Journal,
+    Shard,
+    create_items,
+    deduplicate_hrefs,
+    parse_granule_href,
+    parse_time_bound,
+    read_tile_costs,
+    select_shard,
+    tiles_intersecting,
+)
+from stactools.sentinel2.commands import create_sentinel2_command
+
+from . import test_data
+
+DATA_FILES = test_data.get_path("data-files")
+SAFE_07HFE = (
+    f"{DATA_FILES}/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+)
+SAFE_22HBD = (
+    f"{DATA_FILES}/esa_S2B_MSIL2A_20210122T133229_N0214_R081_T22HBD"
+    "_20210122T155500.SAFE"
+)
+SAFE_01WCP = (
+    f"{DATA_FILES}/S2A_MSIL2A_20230625T234621_N0509_R073_T01WCP_20230626T022157.SAFE"
+)
+SAFE_01WCP_LATER = SAFE_01WCP.replace("022157", "022158")
+GRANULE_34LBP = f"{DATA_FILES}/S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBP"
+
+
+def utc(*args: int) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "href,tile,start,end",
+    [
+        (
+            SAFE_07HFE,
+            "07HFE",
+            utc(2019, 2, 12, 19, 26, 51),
+            utc(2019, 2, 12, 19, 26, 51),
+        ),
+        (GRANULE_34LBP, "34LBP", None, utc(2022, 4, 1, 11, 0, 10)),
+        (
+            "s3://sentinel-s2-l2a/tiles/10/S/DG/2018/12/31/0/",
+            "10SDG",
+            utc(2018, 12, 31),
+            utc(2018, 12, 31, 23, 59, 59, 999999),
+        ),
+        (
+            "s3://sentinel-cogs/sentinel-s2-l2a-cogs/7/H/FE/2019/2/S2A_7HFE_20190212_0_L2A",
+            "07HFE",
+            utc(2019, 2, 12),
+            utc(2019, 2, 12, 23, 59, 59, 999999),
+        ),
+        (
+            "S2A_T60CWS_20240109T203651_L2A",
+            "60CWS",
+            utc(2024, 1, 9, 20, 36, 51),
+            utc(2024, 1, 9, 20, 36, 51),
+        ),
+    ],
+)
+def test_parse_granule_href(href, tile, start, end) -> None:
+    name = parse_granule_href(href)
+    assert name is not None
+    assert (name.tile, name.sensing_start, name.sensing_end) == (tile, start, end)
+
+
+def test_parse_safe_name_details() -> None:
+    name = parse_granule_href(SAFE_07HFE)
+    assert name is not None
+    assert name.platform == "S2A"
+    assert name.product_level == "L2A"
+    assert name.processing_baseline == "02.12"
+    assert name.generated == utc(2020, 10, 7, 16, 8, 57)
+
+
+def test_parse_unknown_href() -> None:
+    assert parse_granule_href("https://example.com/granule") is None
+
+
+def test_parse_time_bound() -> None:
+    assert parse_time_bound("2019-02-12") == utc(2019, 2, 12)
+    assert parse_time_bound("2019-02-12", end=True) == utc(
+        2019, 2, 12, 23, 59, 59, 999999
+    )
+    assert parse_time_bound("2019-02-12T10:00:00Z") == utc(2019, 2, 12, 10)
+
+
+def test_tiles_intersecting() -> None:
+    # a small box inside the overlap of two neighbouring tiles
+    assert set(tiles_intersecting(box(-124.08, 37.5, -124.06, 37.52))) == {
+        "10SDG",
+        "10SCG",
+    }
+
+
+def test_granule_filter() -> None:
+    aoi = box(-140, -32, -139.5, -31.5)
+    granule_filter = GranuleFilter(aoi=aoi)
+    assert "07HFE" in granule_filter.tiles
+    assert granule_filter(SAFE_07HFE)
+    assert not granule_filter(SAFE_22HBD)
+    assert granule_filter("https://example.com/unparseable")
+
+    window = GranuleFilter(start=utc(2019, 2, 13), end=utc(2021, 12, 31))
+    assert not window(SAFE_07HFE)
+    assert window(SAFE_22HBD)
+    # sensed before it was created, so it could still be in the window
+    assert GranuleFilter(end=utc(2019, 1, 1))(GRANULE_34LBP)
+    assert not GranuleFilter(start=utc(2022, 4, 2))(GRANULE_34LBP)
+
+
+def test_granule_filter_keeps_tiles_it_cannot_place() -> None:
+    granule_filter = GranuleFilter(aoi=box(-179.5, -81, -178, -80.3))
+    assert granule_filter(
+        "S2A_MSIL2A_20230105T163809_N0509_R083_T01CDL_20230105T201055.SAFE"
+    )
+    # 01XZV is not a Sentinel-2 tile, so the index cannot say where it is
+    assert granule_filter(
+        "S2A_MSIL2A_20230105T163809_N0509_R083_T01XZV_20230105T201055.SAFE"
+    )
+    assert not granule_filter(SAFE_22HBD)
+
+
+def test_create_items_skips_without_reading(tmp_path: Path) -> None:
+    missing = (
+        "/does/not/exist/S2A_MSIL2A_20190212T192651_N0212_R013_T10SDG"
+        "_20201007T160857.SAFE"
+    )
+    granule_filter = GranuleFilter(aoi=box(-140, -32, -139.5, -31.5))
+    results = list(
+        create_items([SAFE_07HFE, missing, ""], str(tmp_path), granule_filter)
+    )
+    assert len(results) == 2
+    by_href = {result["href"]: result for result in results}
+    assert by_href[SAFE_07HFE]["id"] == "S2A_T07HFE_20190212T192646_L2A"
+    assert by_href[missing] == {"href": missing, "skipped": "filter"}
+
+
+def test_create_items_command(tmp_path: Path) -> None:
+    aoi = tmp_path / "aoi.json"
+    aoi.write_text(
+        json.dumps(
+            {"type": "Feature", "geometry": box(-60, -40, -50, -30).__geo_interface__}
+        )
+    )
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text("\n".join([SAFE_07HFE, SAFE_22HBD, GRANULE_34LBP]) + "\n")
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        [
+            "create-items",
+            str(hrefs),
+            str(tmp_path),
+            "--aoi",
+            str(aoi),
+            "--start",
+            "2021-01-01",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line["href"] for line in lines] == [SAFE_22HBD]
+    assert "1 created, 2 skipped, 0 failed" in result.stderr
+
+
+def test_deduplicate_hrefs() -> None:
+    reprocessed = (
+        "s3://bucket/S2A_MSIL2A_20230625T234621_N0500_R073_T01WCP_20240101T000000.SAFE"
+    )
+    hrefs = [SAFE_01WCP, SAFE_07HFE, SAFE_01WCP_LATER, reprocessed, GRANULE_34LBP]
+    kept, duplicates = deduplicate_hrefs(hrefs)
+    # the highest baseline wins, then the latest generation time
+    assert kept == [SAFE_01WCP_LATER, SAFE_07HFE, GRANULE_34LBP]
+    assert sorted(duplicates) == sorted(
+        [(SAFE_01WCP, SAFE_01WCP_LATER), (reprocessed, SAFE_01WCP_LATER)]
+    )
+    # other tiles, levels and acquisitions are distinct
+    l1c = SAFE_01WCP.replace("MSIL2A", "MSIL1C")
+    assert deduplicate_hrefs([SAFE_01WCP, l1c])[0] == [SAFE_01WCP, l1c]
+
+
+def test_create_items_deduplicates(tmp_path: Path) -> None:
+    results = list(create_items([SAFE_01WCP, SAFE_01WCP_LATER], str(tmp_path)))
+    assert results[0] == {
+        "href": SAFE_01WCP,
+        "skipped": "duplicate",
+        "duplicate_of": SAFE_01WCP_LATER,
+    }
+    assert results[1]["href"] == SAFE_01WCP_LATER
+    assert "error" not in results[1]
+    assert len(results) == 2
+
+    results = list(
+        create_items([SAFE_01WCP, SAFE_01WCP_LATER], str(tmp_path), deduplicate=False)
+    )
+    assert [result["href"] for result in results] == [SAFE_01WCP, SAFE_01WCP_LATER]
+
+
+def test_create_items_command_reports_duplicates(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text(f"{SAFE_01WCP_LATER}\n{SAFE_01WCP}\n")
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        ["create-items", str(hrefs), str(tmp_path)],
+    )
+    assert result.exit_code == 0, result.output
+    assert f"Duplicate {SAFE_01WCP} (keeping {SAFE_01WCP_LATER})" in result.stderr
+    assert "1 created, 1 skipped, 0 failed" in result.stderr
+
+
+def synthetic_hrefs(tiles: list[str], days: int) -> list[str]:
+    return [
+        f"s3://bucket/S2A_MSIL2A_202301{day:02d}T100000_N0509_R001_T{tile}"
+        "_20230201T000000.SAFE"
+        for tile in tiles
+        for day in range(1, days + 1)
+    ]
+
+
+def test_parse_shard() -> None:
+    assert Shard.parse("1/4") == Shard(1, 4)
+    for value in ["4/4", "1/0", "1", "a/b"]:
+        with pytest.raises(ValueError):
+            Shard.parse(value)
+
+
+def test_hash_shards_partition_hrefs() -> None:
+    hrefs = synthetic_hrefs(["10SDG", "10SEG", "01WCP"], 20)
+    # a reprocessing of the first acquisition must land on the same shard
+    reprocessed = hrefs[0].replace("N0509", "N0510")
+    hrefs.append(reprocessed)
+    shards = [list(select_shard(hrefs, Shard(i, 3))) for i in range(3)]
+    assert sorted(href for shard in shards for href in shard) == sorted(hrefs)
+    assert all(shards)
+    assert any(hrefs[0] in shard and reprocessed in shard for shard in shards)
+    assert shards == [list(select_shard(hrefs, Shard(i, 3))) for i in range(3)]
+
+
+def test_cost_balanced_shards() -> None:
+    hrefs = synthetic_hrefs(["01WCP"], 10) + synthetic_hrefs(["10SDG"], 30)
+    costs = {"01WCP": 30.0, "10SDG": 1.0}
+    loads = []
+    for i in range(4):
+        shard = list(select_shard(hrefs, Shard(i, 4), costs))
+        loads.append(sum(30.0 if "01WCP" in href else 1.0 for href in shard))
+    assert sum(loads) == 330.0
+    assert max(loads) - min(loads) <= 30.0
+    # rejected hrefs cost nothing
+    granule_filter = GranuleFilter(start=utc(2023, 1, 6))
+    shards = [
+        list(select_shard(hrefs, Shard(i, 2), costs, granule_filter)) for i in range(2)
+    ]
+    assert sorted(shards[0] + shards[1]) == sorted(hrefs)
+
+
+def test_journal_costs(tmp_path: Path) -> None:
+    path = str(tmp_path / "journal.ndjson")
+    with Journal(path) as journal:
+        journal.record({"href": SAFE_07HFE, "id": "a", "seconds": 2.0})
+        journal.record({"href": SAFE_07HFE, "id": "a", "seconds": 4.0})
+        journal.record({"href": SAFE_22HBD, "error": "boom", "seconds": 9.0})
+        journal.record({"href": SAFE_22HBD, "skipped": "filter"})
+    assert read_tile_costs([path]) == {"07HFE": 3.0}
+
+
+def test_create_items_command_shard(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text("\n".join([SAFE_07HFE, SAFE_22HBD, GRANULE_34LBP]) + "\n")
+    journal = tmp_path / "journal.ndjson"
+    built = []
+    for i in range(2):
+        result = CliRunner().invoke(
+            create_sentinel2_command(Group()),
+            [
+                "create-items",
+                str(hrefs),
+                str(tmp_path),
+                "--shard",
+                f"{i}/2",
+                "--journal",
+                str(journal),
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        built.extend(json.loads(line)["href"] for line in result.stdout.splitlines())
+    assert sorted(built) == sorted([SAFE_07HFE, SAFE_22HBD, GRANULE_34LBP])
+    entries = [json.loads(line) for line in journal.read_text().splitlines()]
+    assert {entry["tile"] for entry in entries} == {"07HFE", "22HBD", "34LBP"}
+    assert all(entry["seconds"] > 0 for entry in entries)
+
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        [
+            "create-items",
+            str(hrefs),
+            str(tmp_path),
+            "--shard",
+            "0/2",
+            "--balance",
+            str(journal),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        ["create-items", str(hrefs), str(tmp_path), "--shard", "2/2"],
+    )
+    assert result.exit_code != 0
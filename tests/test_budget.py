@@ -0,0 +1,133 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.batch import create_items
+from stactools.sentinel2.budget import Quarantine, WorkerPool
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.update import HashIndex
+
+from . import test_data
+
+DATA_FILES = test_data.get_path("data-files")
+SAFE_07HFE = (
+    f"{DATA_FILES}/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+)
+GRANULE_34LBP = f"{DATA_FILES}/S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBP"
+GRANULE_34LBQ = f"{DATA_FILES}/S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+
+
+def slow_modifier(href: str) -> str:
+    if "T07HFE" in href:
+        time.sleep(60)
+    return href
+
+
+def crash_modifier(href: str) -> str:
+    if "T07HFE" in href:
+        os.abort()
+    return href
+
+
+def test_time_budget_quarantines_slow_granules(tmp_path: Path) -> None:
+    start = time.monotonic()
+    with Quarantine(str(tmp_path / "quarantine.ndjson")) as quarantine:
+        results = list(
+            create_items(
+                [SAFE_07HFE, GRANULE_34LBP, GRANULE_34LBQ],
+                str(tmp_path),
+                deduplicate=False,
+                time_budget=2,
+                workers=2,
+                quarantine=quarantine,
+                read_href_modifier=slow_modifier,
+            )
+        )
+    assert time.monotonic() - start < 30
+
+    by_href = {result["href"]: result for result in results}
+    assert len(by_href) == 3
+    assert by_href[SAFE_07HFE]["quarantined"] == "timeout"
+    assert by_href[SAFE_07HFE]["error"].startswith("TimeoutError")
+    assert "path" in by_href[GRANULE_34LBP]
+    assert "path" in by_href[GRANULE_34LBQ]
+
+    lines = (tmp_path / "quarantine.ndjson").read_text().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["href"] == SAFE_07HFE
+    assert entry["reason"] == "timeout"
+    # the stack of the stuck worker shows where the time went
+    assert "slow_modifier" in entry["diagnostics"]
+
+
+def test_crashed_workers_are_replaced(tmp_path: Path) -> None:
+    with WorkerPool(1, str(tmp_path), read_href_modifier=crash_modifier) as pool:
+        pool.submit(SAFE_07HFE)
+        [(result, diagnostics)] = pool.collect()
+        assert result["quarantined"] == "crash"
+        assert diagnostics is not None and "crash_modifier" in diagnostics
+
+        pool.submit(GRANULE_34LBP)
+        [(result, _)] = pool.collect()
+        assert "path" in result
+        assert pool.replaced == 1
+
+
+def test_geometry_failures_are_quarantined(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def fail(*args, **kwargs):
+        raise stac.GeometryError("Area of geometry is 61110.0")
+
+    monkeypatch.setattr(stac, "make_valid_geometry", fail)
+    path = str(tmp_path / "quarantine.ndjson")
+    with Quarantine(path) as quarantine:
+        [result] = create_items([SAFE_07HFE], str(tmp_path), quarantine=quarantine)
+    assert result["quarantined"] == "geometry"
+    entry = json.loads(Path(path).read_text())
+    assert entry["reason"] == "geometry"
+    assert "61110" in entry["diagnostics"]
+
+    # quarantined granules are skipped by later runs
+    with Quarantine(path) as quarantine:
+        assert SAFE_07HFE in quarantine
+        [result] = create_items([SAFE_07HFE], str(tmp_path), quarantine=quarantine)
+    assert result == {"href": SAFE_07HFE, "skipped": "quarantined"}
+
+
+def test_worker_pool_rejects_hash_index(tmp_path: Path) -> None:
+    index = HashIndex(str(tmp_path / "hashes.json"))
+    with pytest.raises(ValueError):
+        WorkerPool(1, str(tmp_path), hash_index=index)
+
+
+def test_create_items_command_with_time_budget(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text("\n".join([SAFE_07HFE, GRANULE_34LBP, GRANULE_34LBQ]) + "\n")
+    quarantine = tmp_path / "quarantine.ndjson"
+    quarantine.write_text(json.dumps({"href": GRANULE_34LBQ}) + "\n")
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        [
+            "create-items",
+            str(hrefs),
+            str(tmp_path),
+            "--time-budget",
+            "60",
+            "--workers",
+            "2",
+            "--quarantine",
+            str(quarantine),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert {line["href"] for line in lines} == {GRANULE_34LBP, SAFE_07HFE}
+    assert "2 created, 1 skipped, 0 failed" in result.stderr
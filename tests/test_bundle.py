@@ -0,0 +1,128 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.bundle import BundleError, BundleReader, create_bundle
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.reader import MetadataReader
+
+from . import test_data
+
+
+class CountingReader(MetadataReader):
+    def __init__(self) -> None:
+        super().__init__()
+        self.opened: list[str] = []
+
+    def open(self, href, read_href_modifier=None):  # type: ignore[no-untyped-def]
+        self.opened.append(href)
+        return super().open(href, read_href_modifier)
+
+
+@pytest.mark.parametrize(
+    "file_name",
+    [
+        "S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE",
+        "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBP",
+        "S2A_OPER_MSI_L1C_TL_SGS__20181231T203637_A018414_T10SDG",
+    ],
+)
+def test_create_item_from_bundle(tmp_path: Path, file_name: str) -> None:
+    granule_href = test_data.get_path(f"data-files/{file_name}")
+    path = create_bundle(granule_href, str(tmp_path))
+    assert path.endswith(".s2meta")
+
+    reader = CountingReader()
+    from_bundle = stac.create_item(path, reader=reader).to_dict()
+    assert reader.opened == [path]
+    from_granule = stac.create_item(granule_href).to_dict()
+    for item in (from_bundle, from_granule):
+        item["properties"].pop("created")
+    assert from_bundle == from_granule
+
+
+def test_bundle_roda_layout(tmp_path: Path) -> None:
+    # a local mirror of a roda granule and its product's metadata
+    roda = "https://roda.sentinel-hub.com/sentinel-s2-l2a"
+    mirror = tmp_path / "roda"
+    granule = "tiles/1/V/CG/2020/9/14/2"
+    product = (
+        "products/2020/9/14/S2B_MSIL2A_20200914T231559_N0500_R087_T01VCG"
+        "_20230315T224658"
+    )
+    shutil.copytree(
+        test_data.get_path(
+            "data-files/S2B_MSIL2A_20200914T231559_N0500_R087_T01VCG_20230315T224658"
+        ),
+        mirror / granule,
+    )
+    (mirror / product).mkdir(parents=True)
+    shutil.copy(
+        test_data.get_path(
+            "data-files/S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+            "/product_metadata.xml"
+        ),
+        mirror / product / "metadata.xml",
+    )
+
+    def to_mirror(href: str) -> str:
+        return href.replace(roda, str(mirror))
+
+    granule_href = f"{roda}/{granule}"
+    path = create_bundle(granule_href, str(tmp_path), read_href_modifier=to_mirror)
+    with BundleReader(path) as reader:
+        assert f"{roda}/{product}/metadata.xml" in reader.index["members"]
+
+    from_bundle = stac.create_item(path).to_dict()
+    from_granule = stac.create_item(
+        granule_href, read_href_modifier=to_mirror
+    ).to_dict()
+    for item in (from_bundle, from_granule):
+        item["properties"].pop("created")
+    assert from_bundle == from_granule
+
+
+def test_bundle_index(tmp_path: Path) -> None:
+    granule_href = test_data.get_path(
+        "data-files/S2A_OPER_MSI_L1C_TL_SGS__20181231T203637_A018414_T10SDG"
+    )
+    with BundleReader(create_bundle(granule_href, str(tmp_path))) as reader:
+        assert reader.source_href == granule_href
+        assert reader.layout == "granule"
+        assert sorted(reader.index["members"]) == ["metadata.xml", "tileInfo.json"]
+        assert reader.index["absent"] == ["product_metadata.xml"]
+        assert not reader.exists(f"{granule_href}/product_metadata.xml")
+        with pytest.raises(FileNotFoundError):
+            reader.read_text(f"{granule_href}/product_metadata.xml")
+        with pytest.raises(FileNotFoundError):
+            reader.read_text("/elsewhere/metadata.xml")
+        assert (
+            reader.read_bytes(f"{granule_href}/tileInfo.json")
+            == Path(granule_href, "tileInfo.json").read_bytes()
+        )
+
+
+def test_not_a_bundle(tmp_path: Path) -> None:
+    path = tmp_path / "granule.s2meta"
+    path.write_bytes(b"not a bundle at all")
+    with pytest.raises(BundleError):
+        BundleReader(str(path))
+
+
+def test_bundle_command(tmp_path: Path) -> None:
+    granule_href = test_data.get_path(
+        "data-files/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+    )
+    command = create_sentinel2_command(Group())
+    result = CliRunner().invoke(command, ["bundle", granule_href, str(tmp_path)])
+    assert result.exit_code == 0, result.output
+    path = result.output.strip()
+    assert path == str(tmp_path / "S2A_T07HFE_20190212T192646_L2A.s2meta")
+
+    result = CliRunner().invoke(command, ["create-item", path, str(tmp_path)])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "S2A_T07HFE_20190212T192646_L2A.json").exists()
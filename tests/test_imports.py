@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+import pytest
+
+# Modules that are expensive to import and are only needed once an item is
+# actually being created.
+DEFERRED_MODULES = ["antimeridian", "pyproj", "lxml"]
+
+# Generous upper bound on the cumulative import time, in microseconds, of this
+# package's own modules on top of stactools.core. This is meant to catch a
+# heavy import creeping back in, not to benchmark the import system.
+IMPORT_BUDGET_US = 150_000
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Runs ``python -X importtime`` for a module in a fresh interpreter and
+    returns the cumulative import time, in microseconds, of every module that
+    was imported."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "module", ["stactools.sentinel2.commands", "stactools.sentinel2.stac"]
+)
+def test_heavy_modules_are_deferred(module: str) -> None:
+    times = import_times(module)
+    assert module in times
+    for deferred in DEFERRED_MODULES:
+        assert deferred not in times, f"{module} eagerly imports {deferred}"
+
+
+def test_commands_do_not_import_stac() -> None:
+    times = import_times("stactools.sentinel2.commands")
+    assert "stactools.sentinel2.stac" not in times
+
+
+def test_import_time_budget() -> None:
+    times = import_times("stactools.sentinel2.commands")
+    own = times["stactools.sentinel2.commands"] - times["stactools.core"]
+    assert own < IMPORT_BUDGET_US, f"import took {own}us of {IMPORT_BUDGET_US}us"
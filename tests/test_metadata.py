@@ -105,3 +105,31 @@ class Sentinel2MetadataTest(unittest.TestCase):
         footprint = shape(product_metadata.geometry)
 
         self.assertTrue(footprint.is_valid)
+
+    def test_indexes_manifest_data_objects(self):
+        manifest_path = test_data.get_path(
+            "data-files/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+        )
+        manifest = SafeManifest(manifest_path)
+
+        inspire = manifest.data_objects["INSPIRE_Metadata"]
+        self.assertEqual(inspire.path, "INSPIRE.xml")
+        self.assertEqual(inspire.href, f"{manifest_path}/INSPIRE.xml")
+        self.assertEqual(inspire.size, 432)
+        self.assertEqual(inspire.checksum_name, "MD5")
+        self.assertEqual(inspire.multihash, "d5103e598adde69b9b2ee7a857456c69ba5b")
+        self.assertIs(manifest.data_objects_by_path["INSPIRE.xml"], inspire)
+
+        product_metadata = ProductMetadata(manifest.product_metadata_href)
+        self.assertEqual(set(manifest.image_paths), set(product_metadata.image_paths))
+
+    def test_sha3_checksums(self):
+        manifest = SafeManifest(
+            test_data.get_path(
+                "data-files/S2A_MSIL1C_20210908T042701_N0301_R133_T46RER_20210908T070248.SAFE"
+            )
+        )
+        for data_object in manifest.data_objects.values():
+            self.assertEqual(data_object.checksum_name, "SHA3-256")
+            self.assertTrue(data_object.multihash.startswith("1620"))
+            self.assertEqual(len(data_object.multihash), 68)
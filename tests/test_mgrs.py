@@ -0,0 +1,101 @@
+import logging
+
+import pytest
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.mgrs import (
+    MgrsTileIndex,
+    MgrsTileIndexError,
+    get_tile_index,
+    tile_code,
+    tile_origin,
+)
+
+from . import test_data
+
+
+def test_lookup() -> None:
+    index = get_tile_index()
+    tile = index["T10SDG"]
+    assert tile.code == "10SDG"
+    assert tile.epsg == 32610
+    assert (tile.utm_zone, tile.latitude_band, tile.grid_square) == (10, "S", "DG")
+    assert tile.proj_bbox == [399960.0, 4090200.0, 509760.0, 4200000.0]
+    assert index.get("7HFE") == index["07HFE"]
+    assert "01WCP" in index
+    assert index.get("01XZV") is None
+    with pytest.raises(KeyError):
+        index["01XZV"]
+    with pytest.raises(ValueError):
+        index.get("not a tile")
+
+
+@pytest.mark.parametrize(
+    "code,utm_zone,band,easting,northing,ulx,uly",
+    [
+        ("10SDG", 10, "S", 400000, 4100000, 399960, 4200000),
+        ("07HFE", 7, "H", 600000, 6400000, 600000, 6500020),
+        ("01WCP", 1, "W", 300000, 7300000, 300000, 7400040),
+        ("60CWS", 60, "C", 500000, 1100000, 499980, 1200040),
+    ],
+)
+def test_tile_arithmetic(code, utm_zone, band, easting, northing, ulx, uly) -> None:
+    assert tile_code(utm_zone, band, easting, northing) == code
+    assert tile_origin(easting, northing, band < "N") == (ulx, uly)
+
+
+def test_point_query() -> None:
+    index = get_tile_index()
+    assert [tile.code for tile in index.tiles_at(-123.3, 37.5)] == ["10SDG"]
+    # tiles on both sides of the antimeridian overlap this point
+    codes = {tile.code for tile in index.tiles_at(179.99, -16)}
+    assert {"01LAC", "60LZH"} <= codes
+
+
+def test_bbox_query() -> None:
+    index = get_tile_index()
+    codes = {
+        tile.code for tile in index.tiles_intersecting([-123.5, 37.2, -123.4, 37.3])
+    }
+    assert "10SDG" in codes
+    assert all(code.startswith("10S") for code in codes)
+    crossing = {
+        tile.code for tile in index.tiles_intersecting([179.9, -16.1, -179.9, -16.0])
+    }
+    assert {"01LAC", "60LZH"} <= crossing
+
+
+def test_projection_check() -> None:
+    tile = get_tile_index()["34LBP"]
+    assert tile.check_projection(32734, tile.proj_bbox) == []
+    partial = [250000.0, 8800000.0, 260000.0, 8810000.0]
+    assert tile.check_projection(32734, partial) == []
+    problems = tile.check_projection(32634, [0.0, 0.0, 1.0, 1.0])
+    assert len(problems) == 2
+
+
+def test_create_item_warns_about_mismatched_tile(caplog) -> None:
+    # this fixture carries the metadata of the neighbouring tile, 34LBP
+    file_name = "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+    with caplog.at_level(logging.WARNING):
+        stac.create_item(test_data.get_path(f"data-files/{file_name}"))
+    assert "not within tile 34LBQ" in caplog.text
+
+
+def test_tiles_south_of_the_utm_grid(caplog) -> None:
+    tile = get_tile_index()["01CDL"]
+    assert tile.epsg == 32701
+    west, south, east, north = tile.bbox
+    assert west > east  # crosses the antimeridian
+    assert -81.5 < south < -81 and -80.5 < north < -80
+    file_name = "S2A_OPER_MSI_L2A_DS_2APS_20230105T201055_S20230105T163809"
+    with caplog.at_level(logging.WARNING):
+        stac.create_item(test_data.get_path(f"data-files/{file_name}"))
+    assert "not a known Sentinel-2 tile" not in caplog.text
+
+
+def test_not_an_index(tmp_path) -> None:
+    path = tmp_path / "tiles.bin"
+    path.write_bytes(b"nothing")
+    with pytest.raises(MgrsTileIndexError):
+        MgrsTileIndex(str(path))
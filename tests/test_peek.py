@@ -0,0 +1,159 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.batch import create_items
+from stactools.sentinel2.bundle import create_bundle
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.peek import Predicate, PredicateError, peek
+
+from . import test_data
+
+DATA_FILES = test_data.get_path("data-files")
+SAFE_07HFE = (
+    f"{DATA_FILES}/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+)
+SAFE_22HBD = (
+    f"{DATA_FILES}/esa_S2B_MSIL2A_20210122T133229_N0214_R081_T22HBD"
+    "_20210122T155500.SAFE"
+)
+GRANULE_L1C = f"{DATA_FILES}/S2A_OPER_MSI_L1C_TL_SGS__20181231T203637_A018414_T10SDG"
+
+
+def test_peek_safe() -> None:
+    record = peek(SAFE_07HFE)
+    assert record.href == SAFE_07HFE
+    assert record.tile == "07HFE"
+    assert record.platform == "sentinel-2a"
+    assert record.processing_baseline == "02.12"
+    assert record.cloud_cover == 51.580326
+    assert record.nodata_percentage == 96.769553
+    assert record.data_coverage == pytest.approx(3.230447)
+    assert record.quality["water_percentage"] >= 0
+
+
+@pytest.mark.parametrize(
+    "granule_href",
+    [
+        SAFE_07HFE,
+        SAFE_22HBD,
+        f"{DATA_FILES}/S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBP",
+        GRANULE_L1C,
+    ],
+)
+def test_peek_matches_item(granule_href: str) -> None:
+    record = peek(granule_href)
+    item = stac.create_item(granule_href)
+    assert record.cloud_cover == item.properties["eo:cloud_cover"]
+    assert item.properties["grid:code"] == f"MGRS-{record.tile}"
+
+
+def test_peek_l1c() -> None:
+    record = peek(GRANULE_L1C)
+    assert record.cloud_cover == 0.0138
+    assert record.nodata_percentage is None
+    assert record.data_coverage is None
+
+
+def test_peek_zip(tmp_path: Path) -> None:
+    archive = shutil.make_archive(
+        str(tmp_path / Path(SAFE_07HFE).stem), "zip", DATA_FILES, Path(SAFE_07HFE).name
+    )
+    assert peek(archive).to_dict() == {**peek(SAFE_07HFE).to_dict(), "href": archive}
+
+
+def test_predicate() -> None:
+    record = peek(SAFE_07HFE)
+    assert Predicate("cloud_cover < 60")(record)
+    assert not Predicate("cloud_cover < 20")(record)
+    assert Predicate("cloud_cover < 20 or data_coverage < 5")(record)
+    assert Predicate("0 < data_coverage <= 5 and tile in ('07HFE', '10SDG')")(record)
+    assert Predicate("not platform == 'sentinel-2b'")(record)
+    assert Predicate("date >= '2019-02-01' and water_percentage > -1")(record)
+
+
+def test_predicate_missing_values() -> None:
+    record = peek(GRANULE_L1C)
+    assert not Predicate("data_coverage > 50")(record)
+    assert not Predicate("data_coverage <= 50")(record)
+    assert Predicate("not data_coverage > 50")(record)
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "cloud_cover <",
+        "cloudiness < 20",
+        "__import__('os').system('true')",
+        "cloud_cover < len(tile)",
+        "cloud_cover is None",
+        "cloud_cover",
+    ],
+)
+def test_invalid_predicate(expression: str) -> None:
+    with pytest.raises(PredicateError):
+        Predicate(expression)
+
+
+def test_create_items_with_predicate(tmp_path: Path) -> None:
+    results = list(
+        create_items(
+            [SAFE_07HFE, SAFE_22HBD],
+            str(tmp_path),
+            predicate=Predicate("cloud_cover < 20"),
+        )
+    )
+    assert results[0] == {"href": SAFE_07HFE, "skipped": "predicate"}
+    assert results[1]["href"] == SAFE_22HBD
+    assert "error" not in results[1]
+
+
+def test_create_items_command_where(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text("\n".join([SAFE_07HFE, SAFE_22HBD, GRANULE_L1C]) + "\n")
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        [
+            "create-items",
+            str(hrefs),
+            str(tmp_path),
+            "--where",
+            "cloud_cover < 20",
+            "--where",
+            "data_coverage > 50",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line["href"] for line in lines] == [SAFE_22HBD]
+    assert "1 created, 2 skipped, 0 failed" in result.stderr
+
+
+def test_create_items_command_where_on_bundles(tmp_path: Path) -> None:
+    bundles = [create_bundle(href, str(tmp_path)) for href in [SAFE_07HFE, GRANULE_L1C]]
+    assert peek(bundles[0]).cloud_cover == peek(SAFE_07HFE).cloud_cover
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text("\n".join(bundles) + "\n")
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        ["create-items", str(hrefs), str(tmp_path), "--where", "cloud_cover < 20"],
+    )
+    assert result.exit_code == 0, result.output
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line["href"] for line in lines] == [bundles[1]]
+    assert "1 created, 1 skipped, 0 failed" in result.stderr
+
+
+def test_create_items_command_bad_where(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text(SAFE_07HFE + "\n")
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        ["create-items", str(hrefs), str(tmp_path), "--where", "clouds < 20"],
+    )
+    assert result.exit_code != 0
@@ -0,0 +1,139 @@
+import json
+import pstats
+from pathlib import Path
+
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2.batch import create_items
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.profiling import BatchProfiler, GranuleProfile, profile_name
+from stactools.sentinel2.serve import process_line
+
+from .test_reader import DATA_FILES, SAFE
+
+GRANULE = "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+SAFE_ID = "S2A_T07HFE_20190212T192646_L2A"
+
+
+def functions(path: str) -> set[str]:
+    return {name for _, _, name in pstats.Stats(path).stats}  # type: ignore[attr-defined]
+
+
+def test_granule_profile(tmp_path: Path) -> None:
+    with GranuleProfile(allocations=5) as profile:
+        blocks = [bytearray(1024) for _ in range(100)]
+    assert 1 <= len(profile.top) <= 5
+    assert "test_profiling.py" in profile.top[0][0]
+    assert profile.peak >= 100 * 1024
+    paths = profile.save(str(tmp_path), "scene")
+    assert paths["pstats"] == str(tmp_path / "scene.pstats")
+    report = Path(paths["allocations"]).read_text()
+    assert report.startswith("Peak traced memory: ")
+    del blocks
+
+    with GranuleProfile() as profile:
+        pass
+    assert "allocations" not in profile.save(str(tmp_path), "empty")
+
+
+def test_process_line_profiles(tmp_path: Path) -> None:
+    result = process_line(
+        f"{DATA_FILES}/{SAFE}", str(tmp_path), profile_dir=str(tmp_path)
+    )
+    assert result["profile"] == {"pstats": str(tmp_path / f"{SAFE_ID}.pstats")}
+    assert "create_item" in functions(result["profile"]["pstats"])
+
+
+def test_profiles_of_failures_are_named_by_href(tmp_path: Path) -> None:
+    result = process_line(
+        f"{tmp_path}/missing.SAFE/", str(tmp_path), profile_dir=str(tmp_path)
+    )
+    assert "error" in result
+    assert result["profile"]["pstats"] == str(tmp_path / "missing.SAFE.pstats")
+    assert profile_name("s3://bucket/a b?.SAFE") == "a_b_.SAFE"
+
+
+def test_batch_profiles_are_merged(tmp_path: Path) -> None:
+    profiles = tmp_path / "profiles"
+    profiler = BatchProfiler(str(profiles), allocations=10, aggregate=True)
+    results = list(
+        create_items(
+            [f"{DATA_FILES}/{SAFE}", f"{DATA_FILES}/{GRANULE}"],
+            str(tmp_path),
+            workers=2,
+            profiler=profiler,
+        )
+    )
+    assert all(
+        set(result["profile"]) == {"pstats", "allocations"} for result in results
+    )
+    assert profiler.granules == 2
+    paths = profiler.close()
+    assert paths["pstats"] == str(profiles / "batch.pstats")
+    assert "create_item" in functions(paths["pstats"])
+    report = Path(paths["allocations"]).read_text()
+    assert "(largest of 2 granules)" in report
+    assert len(report.splitlines()) == 12
+
+
+def test_create_item_command_profile(tmp_path: Path) -> None:
+    profiles = tmp_path / "profiles"
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        [
+            "create-item",
+            f"{DATA_FILES}/{SAFE}",
+            str(tmp_path),
+            "--profile",
+            str(profiles),
+            "--profile-allocations",
+            "10",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert (profiles / f"{SAFE_ID}.pstats").exists()
+    assert (profiles / f"{SAFE_ID}.allocations.txt").exists()
+    assert f"Saved {profiles / SAFE_ID}.pstats" in result.stderr
+
+
+def test_create_item_command_profiles_failures(tmp_path: Path) -> None:
+    profiles = tmp_path / "profiles"
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        [
+            "create-item",
+            f"{tmp_path}/missing.SAFE",
+            str(tmp_path),
+            "--profile",
+            str(profiles),
+        ],
+    )
+    assert result.exit_code != 0
+    assert (profiles / "missing.SAFE.pstats").exists()
+    assert f"Saved {profiles / 'missing.SAFE'}.pstats" in result.stderr
+
+
+def test_create_items_command_profile(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text(f"{DATA_FILES}/{SAFE}\n{DATA_FILES}/{GRANULE}\n")
+    profiles = tmp_path / "profiles"
+    command = create_sentinel2_command(Group())
+    result = CliRunner().invoke(
+        command,
+        ["create-items", str(hrefs), str(tmp_path), "--profile", str(profiles)],
+    )
+    assert result.exit_code == 0, result.output
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert {Path(line["profile"]["pstats"]).stem for line in lines} == {
+        line["id"] for line in lines
+    }
+    assert (profiles / f"{SAFE_ID}.pstats").exists()
+    assert f"Profiled 2 granules in {profiles}" in result.stderr
+    assert not (profiles / "batch.pstats").exists()
+
+    result = CliRunner().invoke(
+        command, ["create-items", str(hrefs), str(tmp_path), "--profile-aggregate"]
+    )
+    assert result.exit_code == 2
+    assert "--profile-aggregate requires --profile" in result.output
@@ -0,0 +1,341 @@
+import os
+import threading
+import time
+import tracemalloc
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.reader import (
+    HttpReader,
+    HttpReaderError,
+    MetadataReader,
+    ZipReaderError,
+    to_vsi_path,
+)
+from stactools.sentinel2.throttle import CircuitOpenError, RetryPolicy
+
+from . import test_data
+from .http_server import serve_directory
+
+DATA_FILES = test_data.get_path("data-files")
+SAFE = "S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+MANIFEST = f"{SAFE}/manifest.safe"
+
+
+def comparable(item):
+    d = item.to_dict(include_self_link=False, transform_hrefs=False)
+    d["properties"] = {k: v for k, v in d["properties"].items() if k != "created"}
+    d.pop("assets")
+    return d
+
+
+def test_create_item_over_pooled_connections() -> None:
+    expected = stac.create_item(f"{DATA_FILES}/{SAFE}")
+    with serve_directory(DATA_FILES, latency=0.01) as server:
+        with HttpReader() as reader:
+            first = stac.create_item(f"{server.url}/{SAFE}", reader=reader)
+            second = stac.create_item(f"{server.url}/{SAFE}", reader=reader)
+    assert comparable(first) == comparable(expected)
+    assert comparable(second) == comparable(expected)
+    assert first.assets["safe_manifest"].href == f"{server.url}/{MANIFEST}"
+    assert server.requests == 6
+    assert server.connections == 1
+    assert reader.connections_opened == 1
+
+
+def test_per_host_concurrency_limit() -> None:
+    with serve_directory(DATA_FILES, latency=0.05) as server:
+        with HttpReader(max_connections_per_host=2) as reader:
+            with ThreadPoolExecutor(8) as pool:
+                texts = list(
+                    pool.map(
+                        lambda _: reader.read_text(f"{server.url}/{MANIFEST}"),
+                        range(16),
+                    )
+                )
+    assert len(set(texts)) == 1
+    assert server.requests == 16
+    assert server.max_in_flight == 2
+    assert reader.connections_opened == 2
+
+
+QUICK_RETRY = RetryPolicy(retries=3, base_delay=0.01, max_delay=0.05)
+
+
+def fail_first(times: int, status: int):
+    """Returns a stand-in fault that fails the first requests for each path."""
+    counts: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def fault(path: str):
+        with lock:
+            counts[path] = counts.get(path, 0) + 1
+            return status if counts[path] <= times else None
+
+    return fault
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_transient_errors_are_retried(status: int) -> None:
+    expected = stac.create_item(f"{DATA_FILES}/{SAFE}")
+    fault = fail_first(2, status)
+    with serve_directory(DATA_FILES, fault=fault) as server:
+        with HttpReader(retry=QUICK_RETRY) as reader:
+            item = stac.create_item(f"{server.url}/{SAFE}", reader=reader)
+    assert comparable(item) == comparable(expected)
+    assert server.faults == 6
+    assert reader.retries == 6
+
+
+def test_retries_are_limited() -> None:
+    with serve_directory(DATA_FILES, fault=lambda path: 503) as server:
+        with HttpReader(retry=QUICK_RETRY) as reader:
+            with pytest.raises(HttpReaderError, match="503"):
+                reader.read_text(f"{server.url}/{MANIFEST}")
+    assert server.requests == 4
+
+
+def test_client_errors_are_not_retried() -> None:
+    with serve_directory(DATA_FILES, fault=lambda path: 400) as server:
+        with HttpReader(retry=QUICK_RETRY) as reader:
+            with pytest.raises(HttpReaderError, match="400"):
+                reader.read_text(f"{server.url}/{MANIFEST}")
+    assert server.requests == 1
+
+
+def test_circuit_breaker_stops_requests_to_failing_host() -> None:
+    broken = True
+    with serve_directory(DATA_FILES, fault=lambda _: 500 if broken else None) as server:
+        with HttpReader(
+            retry=RetryPolicy(retries=0), failure_threshold=3, reset_timeout=0.2
+        ) as reader:
+            for _ in range(3):
+                with pytest.raises(HttpReaderError):
+                    reader.read_text(f"{server.url}/{MANIFEST}")
+            with pytest.raises(CircuitOpenError):
+                reader.read_text(f"{server.url}/{MANIFEST}")
+            assert server.requests == 3
+
+            broken = False
+            time.sleep(0.2)
+            assert reader.read_text(f"{server.url}/{MANIFEST}")
+            assert reader.read_text(f"{server.url}/{MANIFEST}")
+    assert server.requests == 5
+
+
+def read_concurrently(server, reader: HttpReader, count: int) -> int:
+    def read(_: int) -> bool:
+        try:
+            reader.read_bytes(f"{server.url}/{MANIFEST}")
+            return True
+        except (HttpReaderError, CircuitOpenError):
+            return False
+
+    with ThreadPoolExecutor(32) as pool:
+        return sum(pool.map(read, range(count)))
+
+
+def test_adaptive_concurrency_backs_off_when_throttled() -> None:
+    with serve_directory(DATA_FILES, latency=0.01, capacity=6) as fixed_server:
+        with HttpReader(32, retry=QUICK_RETRY) as reader:
+            assert read_concurrently(fixed_server, reader, 400) < 400
+
+    with serve_directory(DATA_FILES, latency=0.01, capacity=6) as server:
+        with HttpReader(32, adaptive=True, retry=QUICK_RETRY) as reader:
+            succeeded = read_concurrently(server, reader, 400)
+            limit = reader.concurrency(server.url)
+    assert succeeded == 400
+    assert limit < 32
+    assert reader.throttled == server.throttled
+    assert server.throttled / server.requests < 0.25
+    assert fixed_server.throttled / fixed_server.requests > 0.5
+
+
+def test_adaptive_concurrency_grows_without_throttling() -> None:
+    with serve_directory(DATA_FILES, latency=0.01) as server:
+        with HttpReader(16, adaptive=True) as reader:
+            assert reader.concurrency(server.url) == 4
+            assert read_concurrently(server, reader, 400) == 400
+            assert reader.concurrency(server.url) > 4
+    assert server.throttled == 0
+
+
+def test_read_href_modifier_is_applied() -> None:
+    with serve_directory(DATA_FILES) as server:
+        with HttpReader() as reader:
+            text = reader.read_text(
+                f"{server.url}/{MANIFEST}?sas=token",
+                lambda href: href.replace("?sas=token", ""),
+            )
+    assert "dataObjectSection" in text
+
+
+def test_missing_file() -> None:
+    with serve_directory(DATA_FILES) as server:
+        with HttpReader() as reader:
+            with pytest.raises(FileNotFoundError):
+                reader.read_text(f"{server.url}/{SAFE}/missing.xml")
+            # the reader is still usable after an error response
+            assert reader.read_text(f"{server.url}/{MANIFEST}")
+
+
+def test_open_streams_http_bodies(tmp_path: Path) -> None:
+    (tmp_path / "large.bin").write_bytes(os.urandom(32 << 20))
+    (tmp_path / "small.xml").write_bytes(b"<a/>")
+    with serve_directory(str(tmp_path)) as server:
+        with HttpReader(max_connections_per_host=1) as reader:
+            tracemalloc.start()
+            with reader.open(f"{server.url}/large.bin") as f:
+                assert len(f.read(1 << 20)) == 1 << 20
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assert peak < 8 << 20
+
+            # a partly read body closes its connection, a fully read one
+            # returns it to the pool, and either frees its place under the limit
+            with reader.open(f"{server.url}/small.xml") as f:
+                assert f.read() == b"<a/>"
+            assert reader.read_bytes(f"{server.url}/small.xml") == b"<a/>"
+            assert reader.connections_opened == 2
+
+            with pytest.raises(FileNotFoundError):
+                reader.open(f"{server.url}/missing.xml")
+
+
+def test_local_hrefs() -> None:
+    with HttpReader() as reader:
+        assert "dataObjectSection" in reader.read_text(f"{DATA_FILES}/{MANIFEST}")
+    assert reader.connections_opened == 0
+
+
+GRANULE = "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+NO_PRODUCT_METADATA = f"{GRANULE}-no-tileDataGeometry-no-product-metadata"
+
+
+def test_remote_product_metadata_discovery() -> None:
+    with serve_directory(DATA_FILES, latency=0.1) as server:
+        with HttpReader() as reader:
+            item = stac.create_item(f"{server.url}/{GRANULE}", reader=reader)
+    assert item.assets["product_metadata"].href == (
+        f"{server.url}/{GRANULE}/product_metadata.xml"
+    )
+    # the probe and the metadata.xml and tileInfo.json reads overlap
+    assert server.max_in_flight == 3
+
+
+def test_remote_product_metadata_missing() -> None:
+    with serve_directory(DATA_FILES) as server:
+        with HttpReader() as reader:
+            with pytest.raises(ValueError, match="does not contain geometry"):
+                stac.create_item(f"{server.url}/{NO_PRODUCT_METADATA}", reader=reader)
+
+
+def test_exists_is_cached() -> None:
+    with serve_directory(DATA_FILES) as server:
+        with HttpReader() as reader:
+            href = f"{server.url}/{GRANULE}/product_metadata.xml"
+            assert reader.exists(href)
+            assert reader.exists(href)
+            assert not reader.exists(f"{server.url}/{GRANULE}/missing.xml")
+    assert server.requests == 2
+
+
+def test_exists_with_default_reader() -> None:
+    pytest.importorskip("aiohttp")
+    with serve_directory(DATA_FILES) as server:
+        item = stac.create_item(f"{server.url}/{GRANULE}")
+    assert "product_metadata" in item.assets
+
+
+def test_exists_treats_backend_errors_as_absent(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fsspec = pytest.importorskip("fsspec")
+
+    class NoCredentials:
+        def exists(self, path: str) -> bool:
+            raise PermissionError("no credentials")
+
+    def url_to_fs(href: str) -> tuple[NoCredentials, str]:
+        return NoCredentials(), href
+
+    monkeypatch.setattr(fsspec.core, "url_to_fs", url_to_fs)
+    assert not MetadataReader().exists("s3://bucket/granule/product_metadata.xml")
+
+
+def zip_safe(tmp_path: Path) -> Path:
+    zip_path = tmp_path / f"{SAFE}.zip"
+    root = Path(DATA_FILES) / SAFE
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in sorted(root.rglob("*")):
+            archive.write(path, f"{SAFE}/{path.relative_to(root)}")
+        # stands in for the image data, which should never be read
+        archive.writestr(f"{SAFE}/GRANULE/IMG_DATA/B01.jp2", os.urandom(1 << 20))
+    return zip_path
+
+
+def test_create_item_from_zip(tmp_path: Path) -> None:
+    zip_path = zip_safe(tmp_path)
+    expected = stac.create_item(f"{DATA_FILES}/{SAFE}")
+    item = stac.create_item(str(zip_path))
+    assert comparable(item) == comparable(expected)
+    vsi_safe = f"/vsizip{zip_path}/{SAFE}"
+    assert item.assets["safe_manifest"].href == f"{vsi_safe}/manifest.safe"
+    for key, asset in item.assets.items():
+        assert asset.href == expected.assets[key].href.replace(
+            f"{DATA_FILES}/{SAFE}", vsi_safe
+        )
+
+
+def test_create_item_from_remote_zip(tmp_path: Path) -> None:
+    pytest.importorskip("aiohttp")
+    zip_safe(tmp_path)
+    with serve_directory(str(tmp_path)) as server:
+        item = stac.create_item(f"{server.url}/{SAFE}.zip")
+    # only the central directory and the metadata members are fetched
+    assert server.bytes_sent < 512 * 1024
+    assert item.assets["safe_manifest"].href == (
+        f"/vsizip//vsicurl/{server.url}/{SAFE}.zip/{SAFE}/manifest.safe"
+    )
+
+
+def test_create_item_from_remote_zip_with_http_reader(tmp_path: Path) -> None:
+    content = zip_safe(tmp_path).read_bytes()
+    with serve_directory(str(tmp_path)) as server:
+        with HttpReader() as reader:
+            item = stac.create_item(f"{server.url}/{SAFE}.zip", reader=reader)
+            with reader.open_seekable(f"{server.url}/{SAFE}.zip") as f:
+                assert f.seek(-10, os.SEEK_END) == len(content) - 10
+                assert f.read() == content[-10:]
+                f.seek(1000)
+                assert f.read(100_000) == content[1000:101_000]
+            with pytest.raises(FileNotFoundError):
+                reader.open_seekable(f"{server.url}/missing.zip")
+    assert server.bytes_sent < 512 * 1024
+    assert reader.connections_opened == 1
+    assert item.id == stac.create_item(f"{DATA_FILES}/{SAFE}").id
+
+
+def test_zip_without_manifest(tmp_path: Path) -> None:
+    zip_path = tmp_path / "empty.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("README", "nothing to see")
+    with pytest.raises(ZipReaderError, match="manifest.safe"):
+        stac.create_item(str(zip_path))
+
+
+@pytest.mark.parametrize(
+    "href,vsi_path",
+    [
+        ("s3://bucket/key.zip", "/vsis3/bucket/key.zip"),
+        ("https://host/key.zip", "/vsicurl/https://host/key.zip"),
+        ("gs://bucket/key.zip", "/vsigs/bucket/key.zip"),
+        ("/data/key.zip", "/data/key.zip"),
+    ],
+)
+def test_to_vsi_path(href: str, vsi_path: str) -> None:
+    assert to_vsi_path(href) == vsi_path
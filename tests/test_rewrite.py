@@ -0,0 +1,108 @@
+import json
+from pathlib import Path
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.rewrite import (
+    PrefixRule,
+    RewriteError,
+    regex_rule,
+    rewrite_file,
+    rewrite_files,
+    rewrite_item,
+)
+
+from . import test_data
+
+SAFE_07HFE = test_data.get_path(
+    "data-files/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+)
+PREFIX = "s3://old-bucket/granules/"
+
+
+@pytest.fixture(scope="module")
+def item() -> dict:
+    item = stac.create_item(SAFE_07HFE, asset_href_prefix=PREFIX)
+    return json.loads(json.dumps(item.to_dict()))
+
+
+def test_rewrite_item(item: dict) -> None:
+    item = json.loads(json.dumps(item))
+    count = len(item["assets"])
+    rules = [PrefixRule(PREFIX, "s3://new-bucket/"), regex_rule(r"^/", "file:///")]
+    assert rewrite_item(item, rules) == count
+    hrefs = [asset["href"] for asset in item["assets"].values()]
+    assert all(href.startswith(("s3://new-bucket/", "file:///")) for href in hrefs)
+    assert item["assets"]["visual"]["href"].startswith("s3://new-bucket/GRANULE/")
+    assert rewrite_item(item, rules) == 0
+
+
+def test_regex_rule() -> None:
+    rule = regex_rule(r"^s3://([^/]+)/", r"https://\1.s3.amazonaws.com/")
+    assert (
+        rule.apply("s3://bucket/a/b.jp2") == "https://bucket.s3.amazonaws.com/a/b.jp2"
+    )
+    assert rule.apply("https://example.com/a") is None
+    with pytest.raises(RewriteError):
+        regex_rule("(", "")
+
+
+def test_rewrite_files(tmp_path: Path, item: dict) -> None:
+    (tmp_path / "items").mkdir()
+    item_path = tmp_path / "items" / "item.json"
+    item_path.write_text(json.dumps(item))
+    other = {"type": "Feature", "id": "other", "assets": {"a": {"href": "/x"}}}
+    ndjson_path = tmp_path / "items.ndjson"
+    ndjson_path.write_text(f"{json.dumps(item)}\n{json.dumps(other)}\n\n")
+    untouched = ndjson_path.read_text().splitlines()[1]
+
+    rules = [PrefixRule(PREFIX, "gs://new/")]
+    stats = rewrite_files([str(tmp_path)], rules, dry_run=True)
+    assert (stats.files, stats.files_changed, stats.items, stats.items_changed) == (
+        2,
+        2,
+        3,
+        2,
+    )
+    assert json.loads(item_path.read_text()) == item
+
+    stats = rewrite_files([str(tmp_path)], rules, max_workers=2)
+    assert stats.items_changed == 2
+    assert not stats.errors
+    saved = json.loads(item_path.read_text())
+    assert saved["assets"]["visual"]["href"].startswith("gs://new/")
+    lines = ndjson_path.read_text().splitlines()
+    assert json.loads(lines[0])["assets"]["visual"]["href"].startswith("gs://new/")
+    assert lines[1] == untouched
+    assert list(tmp_path.glob("**/*.tmp")) == []
+
+    assert rewrite_files([str(tmp_path)], rules).files_changed == 0
+
+
+def test_rewrite_file_reports_errors(tmp_path: Path) -> None:
+    path = tmp_path / "broken.json"
+    path.write_text("{")
+    stats = rewrite_file(str(path), [PrefixRule("a", "b")])
+    assert len(stats.errors) == 1
+    assert path.read_text() == "{"
+
+
+def test_rewrite_hrefs_command(tmp_path: Path, item: dict) -> None:
+    ndjson = json.dumps(item) + "\n"
+    command = create_sentinel2_command(Group())
+    result = CliRunner().invoke(
+        command,
+        ["rewrite-hrefs", "-", "--prefix", PREFIX, "https://example.com/"],
+        input=ndjson,
+    )
+    assert result.exit_code == 0, result.output
+    rewritten = json.loads(result.stdout)
+    assert rewritten["assets"]["visual"]["href"].startswith("https://example.com/")
+    assert "1 of 1 items changed" in result.stderr
+
+    result = CliRunner().invoke(command, ["rewrite-hrefs", str(tmp_path)])
+    assert result.exit_code != 0
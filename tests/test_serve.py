@@ -0,0 +1,119 @@
+import io
+import json
+import socket
+import threading
+from pathlib import Path
+from typing import Any
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import serve as serve_module
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.serve import SocketServer, serve
+
+from . import test_data
+
+SAFE = test_data.get_path(
+    "data-files/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+)
+GRANULE = test_data.get_path(
+    "data-files/S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+)
+
+
+def test_serve_writes_one_line_per_input(tmp_path: Path) -> None:
+    lines = [
+        SAFE,
+        "",
+        json.dumps({"href": GRANULE, "asset_href_prefix": "s3://bucket/prefix/"}),
+        "does-not-exist.SAFE",
+    ]
+    output = io.StringIO()
+    count = serve(io.StringIO("\n".join(lines) + "\n"), output, str(tmp_path))
+    assert count == 3
+
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r["href"] for r in results] == [SAFE, GRANULE, "does-not-exist.SAFE"]
+    assert results[0]["id"] == "S2A_T07HFE_20190212T192646_L2A"
+    assert Path(results[0]["path"]).exists()
+    assert results[1]["id"] == "S2A_T34LBQ_20220401T090142_L2A"
+    item = json.loads(Path(results[1]["path"]).read_text())
+    assert item["assets"]["blue"]["href"].startswith("s3://bucket/prefix/")
+    assert "error" in results[2]
+
+
+def test_serve_inline_items() -> None:
+    output = io.StringIO()
+    serve(io.StringIO(SAFE + "\n"), output)
+    result = json.loads(output.getvalue())
+    assert result["item"]["id"] == result["id"]
+
+
+def test_serve_rejects_unknown_job_keys() -> None:
+    output = io.StringIO()
+    serve(io.StringIO(json.dumps({"href": SAFE, "colour": "blue"})), output)
+    assert "colour" in json.loads(output.getvalue())["error"]
+
+
+def test_job_lines_are_parsed_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    parsed = []
+    parse_job = serve_module.parse_job
+
+    def counting_parse_job(line: str) -> dict[str, Any]:
+        parsed.append(line)
+        return parse_job(line)
+
+    monkeypatch.setattr(serve_module, "parse_job", counting_parse_job)
+    line = json.dumps({"href": SAFE, "dst": str(tmp_path)})
+    result = serve_module.process_line(line, trace_sample=1)
+    assert result["id"] == "S2A_T07HFE_20190212T192646_L2A"
+    assert result["trace"][-1]["args"] == {"href": SAFE}
+    assert parsed == [line]
+    assert "JSONDecodeError" in serve_module.process_line("{not json")["error"]
+
+
+def test_serve_command(tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(
+        create_sentinel2_command(Group()),
+        ["serve", "--dst", str(tmp_path)],
+        input=f"{SAFE}\n{GRANULE}\n",
+    )
+    assert result.exit_code == 0, result.output
+    assert len(result.output.splitlines()) == 2
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_socket_server(tmp_path: Path) -> None:
+    path = str(tmp_path / "sentinel2.sock")
+    with SocketServer(path) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(path)
+                client.sendall(f"{SAFE}\n".encode())
+                client.shutdown(socket.SHUT_WR)
+                response = client.makefile("r").read()
+        finally:
+            server.shutdown()
+            thread.join()
+    assert json.loads(response)["id"] == "S2A_T07HFE_20190212T192646_L2A"
+
+
+def test_socket_server_replaces_only_sockets(tmp_path: Path) -> None:
+    path = tmp_path / "sentinel2.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(str(path))
+    with SocketServer(str(path)):
+        pass
+    assert not path.exists()
+
+    path.write_text("not a socket")
+    with pytest.raises(FileExistsError):
+        SocketServer(str(path))
+    assert path.read_text() == "not a socket"
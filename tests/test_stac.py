@@ -1,7 +1,11 @@
+import dataclasses
+
+import antimeridian
 import pytest
 import shapely.geometry
 
 from stactools.sentinel2 import stac
+from stactools.sentinel2.safe_manifest import SafeManifest
 
 from . import test_data
 
@@ -161,3 +165,134 @@ def test_fallback_geometry_raises(file_name, allow_fallback_geometry):
     with pytest.raises(ValueError) as e:
         stac.create_item(path, allow_fallback_geometry=allow_fallback_geometry)
     assert "Metadata does not contain geometry" in str(e)
+
+
+def test_footprint_cache() -> None:
+    stac.FOOTPRINT_CACHE.clear()
+    file_name = "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+    path = test_data.get_path(f"data-files/{file_name}")
+    first = stac.create_item(path)
+    second = stac.create_item(path)
+    assert (stac.FOOTPRINT_CACHE.misses, stac.FOOTPRINT_CACHE.hits) == (1, 1)
+    assert first.geometry == second.geometry
+    assert first.bbox == second.bbox
+
+
+def test_footprint_cache_eviction() -> None:
+    cache = stac.FootprintCache(maxsize=2)
+    geometries = [
+        {"type": "Point", "coordinates": [i, 0]} for i in range(3)
+    ]  # only the key matters here
+    keys = [cache.key("34LBQ", 32734, geometry) for geometry in geometries]
+    for key in keys:
+        cache.put(key, shapely.geometry.box(0, 0, 1, 1))
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is not None
+    assert (
+        cache.key("34LBQ", 32734, {"coordinates": (0, 0), "type": "Point"}) == (keys[0])
+    )
+
+
+@pytest.mark.parametrize(
+    ("file_name", "fast"),
+    [
+        ("S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE", True),
+        ("S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ", True),
+        ("S2A_MSIL2A_20230625T234621_N0509_R073_T01WCP_20230626T022157.SAFE", False),
+        ("S2B_MSIL2A_20220413T150759_N0400_R025_T33XWJ_20220414T082126.SAFE", False),
+    ],
+)
+def test_ordinary_footprint_fast_path(file_name: str, fast: bool) -> None:
+    path = test_data.get_path(f"data-files/{file_name}")
+    if file_name.endswith(".SAFE"):
+        metadata = stac.metadata_from_safe_manifest(path, None)
+    else:
+        metadata = stac.metadata_from_granule_metadata(
+            path, None, stac.DEFAULT_TOLERANCE, True
+        )
+    utm_zone = int(stac.MGRS_PATTERN.search(file_name).group(1))
+    assert stac.is_far_from_antimeridian(metadata.geometry, utm_zone) == fast
+    # the fast path must give exactly what the full antimeridian handling gives
+    assert (
+        stac._make_valid_geometry(metadata.geometry, utm_zone).wkb
+        == stac._make_valid_geometry(metadata.geometry).wkb
+    )
+
+
+def test_fix_ordinary_polygon_reorients_clockwise() -> None:
+    clockwise = {
+        "type": "Polygon",
+        "coordinates": [[[10, 40], [10, 41], [11, 41], [11, 40], [10, 40]]],
+    }
+    assert stac.is_far_from_antimeridian(clockwise, 32)
+    assert (
+        stac.fix_ordinary_polygon(clockwise).wkb
+        == shapely.geometry.shape(antimeridian.fix_shape(clockwise)).wkb
+    )
+
+
+ITER_ITEMS_FILE_NAMES = [
+    "S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE",
+    "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBP",
+    "does-not-exist.SAFE",
+    "S2A_OPER_MSI_L1C_TL_SGS__20181231T203637_A018414_T10SDG",
+]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_iter_items(ordered: bool) -> None:
+    hrefs = [test_data.get_path(f"data-files/{name}") for name in ITER_ITEMS_FILE_NAMES]
+    results = list(stac.iter_items(hrefs, max_workers=2, ordered=ordered))
+    if ordered:
+        assert [href for href, _ in results] == hrefs
+    else:
+        assert sorted(href for href, _ in results) == sorted(hrefs)
+    by_href = dict(results)
+    assert isinstance(by_href[hrefs[2]], FileNotFoundError)
+    item = by_href[hrefs[0]]
+    assert isinstance(item, stac.pystac.Item)
+    assert item.id == stac.create_item(hrefs[0]).id
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_iter_items_is_bounded(ordered: bool) -> None:
+    consumed = 0
+
+    def hrefs():
+        nonlocal consumed
+        for i in range(1000):
+            consumed += 1
+            yield f"/does/not/exist/{i}.SAFE"
+
+    results = stac.iter_items(hrefs(), max_workers=2, prefetch=4, ordered=ordered)
+    next(results)
+    assert consumed <= 5
+    results.close()
+    assert consumed <= 5
+
+
+def test_file_info_follows_asset_hrefs(monkeypatch: pytest.MonkeyPatch) -> None:
+    safe = test_data.get_path(
+        "data-files/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+    )
+    read_metadata = stac.metadata_from_safe_manifest
+
+    def with_shadowed_image(*args, **kwargs):
+        metadata = read_metadata(*args, **kwargs)
+        # a second path for the first image's asset key, absent from the manifest
+        first = metadata.image_paths[0]
+        shadow = first.replace("IMG_DATA/", "IMG_DATA/shadow/")
+        return dataclasses.replace(
+            metadata, image_paths=[shadow, *metadata.image_paths]
+        )
+
+    monkeypatch.setattr(stac, "metadata_from_safe_manifest", with_shadowed_image)
+    item = stac.create_item(safe)
+    manifest = SafeManifest(safe)
+    checked = 0
+    for asset in item.assets.values():
+        data_object = manifest.data_object_for_href(asset.href)
+        if data_object is not None and "/IMG_DATA/" in asset.href:
+            assert asset.extra_fields["file:size"] == data_object.size
+            checked += 1
+    assert checked == len(manifest.image_paths)
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from stactools.sentinel2.throttle import (
+    AdaptiveLimit,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+)
+
+
+def test_adaptive_limit_increases_additively() -> None:
+    limit = AdaptiveLimit(16, initial=4, latency_tolerance=None)
+    for _ in range(5):
+        limit.acquire()
+        limit.release(0.01)
+    assert limit.limit == 5
+    for _ in range(1000):
+        limit.acquire()
+        limit.release(0.01)
+    assert limit.limit == 16
+
+
+def test_adaptive_limit_decreases_once_per_round_trip() -> None:
+    limit = AdaptiveLimit(16, initial=16, latency_tolerance=None)
+    for _ in range(8):
+        limit.acquire()
+    for _ in range(8):
+        limit.release(0.5, throttled=True)
+    assert limit.limit == 8
+    assert limit.decreases == 1
+
+
+def test_adaptive_limit_stays_within_bounds() -> None:
+    limit = AdaptiveLimit(16, minimum=2, initial=4, latency_tolerance=None)
+    for _ in range(10):
+        limit.acquire()
+        limit._last_decrease = 0.0
+        limit.release(0.0, throttled=True)
+    assert limit.limit == 2
+    with pytest.raises(ValueError):
+        AdaptiveLimit(4, minimum=8)
+
+
+def test_adaptive_limit_backs_off_on_rising_latency() -> None:
+    limit = AdaptiveLimit(16, initial=8)
+    for _ in range(50):
+        limit.acquire()
+        limit.release(0.01)
+    grown = limit.limit
+    for _ in range(3):
+        limit.acquire()
+        limit.release(0.2)
+    assert limit.limit < grown
+    assert limit.decreases == 1
+
+
+def test_circuit_breaker() -> None:
+    breaker = CircuitBreaker("http://host", failure_threshold=3, reset_timeout=0.1)
+    for _ in range(2):
+        breaker.check()
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(3):
+        breaker.check()
+        breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    time.sleep(0.1)
+    breaker.check()
+    # only one trial request is let through
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    time.sleep(0.1)
+    breaker.check()
+    breaker.record_success()
+    assert not breaker.is_open
+    breaker.check()
+
+
+def test_retry_delays() -> None:
+    policy = RetryPolicy(retries=5, base_delay=0.1, max_delay=1.0)
+    for attempt in range(5):
+        assert 0 <= policy.delay(attempt) <= min(1.0, 0.1 * 2**attempt)
+    assert policy.delay(0, "0.5") == 0.5
+    assert policy.delay(0, "120") == 1.0
+    assert policy.delay(0, "Wed, 21 Oct 2015 07:28:00 GMT") <= 0.1
@@ -0,0 +1,167 @@
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import batch
+from stactools.sentinel2.batch import create_items
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.serve import process_line
+from stactools.sentinel2.trace import TraceWriter, record, sampled, span
+
+from .test_reader import DATA_FILES, SAFE, zip_safe
+
+GRANULE = "S2A_OPER_MSI_L2A_TL_VGS1_20220401T110010_A035382_T34LBQ"
+
+
+def names(events: list[dict]) -> list[str]:
+    return [event["name"] for event in events]
+
+
+def test_span_outside_a_trace_records_nothing() -> None:
+    with span("parse"):
+        pass
+    with record("a") as events:
+        with span("parse", href="a"):
+            pass
+    with span("geometry"):
+        pass
+    assert names(events) == ["parse", "granule"]
+    parse, granule = events
+    assert parse["args"] == {"href": "a"}
+    assert granule["ts"] <= parse["ts"]
+    assert parse["ts"] + parse["dur"] <= granule["ts"] + granule["dur"]
+
+
+def test_sampling_is_stable() -> None:
+    hrefs = [f"s3://bucket/{i}.SAFE" for i in range(2000)]
+    chosen = [href for href in hrefs if sampled(href, 0.1)]
+    assert 100 < len(chosen) < 300
+    assert chosen == [href for href in hrefs if sampled(href, 0.1)]
+    assert all(sampled(href, 1) for href in hrefs)
+    assert not any(sampled(href, 0) for href in hrefs)
+
+
+def test_process_line_traces_stages(tmp_path: Path) -> None:
+    result = process_line(f"{DATA_FILES}/{SAFE}", str(tmp_path), trace_sample=1)
+    events = result["trace"]
+    stages = names(events)
+    assert stages[-1] == "granule"
+    for stage in ["fetch", "parse", "geometry", "assets", "write"]:
+        assert stage in stages
+    fetches = [event for event in events if event["name"] == "fetch"]
+    assert all(event["args"]["href"].startswith(DATA_FILES) for event in fetches)
+    assert "trace" not in process_line(f"{DATA_FILES}/{SAFE}", str(tmp_path))
+
+
+def test_json_job_lines_are_traced_by_href(tmp_path: Path) -> None:
+    href = f"{DATA_FILES}/{SAFE}"
+    line = json.dumps({"href": href, "dst": str(tmp_path)})
+    for rate in [0.1, 0.5, 0.9]:
+        result = process_line(line, trace_sample=rate)
+        assert ("trace" in result) == sampled(href, rate)
+        if "trace" in result:
+            assert result["trace"][-1]["args"] == {"href": href}
+
+
+def test_zip_reads_are_traced(tmp_path: Path) -> None:
+    zip_path = str(zip_safe(tmp_path))
+    result = process_line(zip_path, str(tmp_path), trace_sample=1)
+    fetches = [event for event in result["trace"] if event["name"] == "fetch"]
+    assert {event["args"]["op"] for event in fetches} == {"open", "read"}
+    assert all(event["args"]["href"] == zip_path for event in fetches)
+
+
+def test_create_items_traces_workers(tmp_path: Path) -> None:
+    path = tmp_path / "trace.json"
+    with TraceWriter(str(path), sample_rate=1) as trace:
+        results = list(
+            create_items(
+                [f"{DATA_FILES}/{SAFE}", f"{DATA_FILES}/{GRANULE}"],
+                str(tmp_path),
+                workers=2,
+                trace=trace,
+            )
+        )
+    assert all("trace" not in result for result in results)
+    assert trace.granules == 2
+
+    events = json.loads(path.read_text())["traceEvents"]
+    granules = [event for event in events if event["name"] == "granule"]
+    assert {event["args"]["href"] for event in granules} == {
+        f"{DATA_FILES}/{SAFE}",
+        f"{DATA_FILES}/{GRANULE}",
+    }
+    processes = [event for event in events if event["ph"] == "M"]
+    assert {event["pid"] for event in processes} == {event["pid"] for event in granules}
+    assert all(event["args"]["name"].startswith("worker") for event in processes)
+
+
+def test_create_items_command_trace(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text(f"{DATA_FILES}/{SAFE}\n{DATA_FILES}/{GRANULE}\n")
+    path = tmp_path / "trace.json"
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        [
+            "create-items",
+            str(hrefs),
+            str(tmp_path),
+            "--trace",
+            str(path),
+            "--trace-sample",
+            "1",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert f"Traced 2 granules to {path}" in result.stderr
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert all("trace" not in line for line in lines)
+    events = json.loads(path.read_text())["traceEvents"]
+    assert names(events).count("granule") == 2
+    assert events[0]["args"]["name"].startswith("main")
+
+
+def test_trace_is_closed_when_the_run_fails(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def fail(*args: Any, **kwargs: Any) -> Iterator[dict[str, Any]]:
+        yield {"href": f"{DATA_FILES}/{SAFE}", "error": "ValueError: bad"}
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(batch, "create_items", fail)
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text(f"{DATA_FILES}/{SAFE}\n")
+    path = tmp_path / "trace.json"
+    journal = tmp_path / "journal.jsonl"
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        [
+            "create-items",
+            str(hrefs),
+            str(tmp_path),
+            "--trace",
+            str(path),
+            "--journal",
+            str(journal),
+        ],
+    )
+    assert isinstance(result.exception, RuntimeError)
+    assert f"Traced 0 granules to {path}" in result.stderr
+    assert json.loads(path.read_text())["traceEvents"] == []
+    assert json.loads(journal.read_text())["status"] == "failed"
+
+
+def test_trace_sample_requires_trace(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text(f"{DATA_FILES}/{SAFE}\n")
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        ["create-items", str(hrefs), str(tmp_path), "--trace-sample", "0.5"],
+    )
+    assert result.exit_code == 2
+    assert "--trace-sample requires --trace" in result.output
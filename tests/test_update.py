@@ -0,0 +1,125 @@
+import json
+from pathlib import Path
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.update import (
+    HashIndex,
+    HashIndexError,
+    canonical_hash,
+    save_item,
+)
+
+from . import test_data
+
+SAFE_07HFE = test_data.get_path(
+    "data-files/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+)
+
+
+def test_canonical_hash_ignores_volatile_fields() -> None:
+    item = stac.create_item(SAFE_07HFE).to_dict()
+    digest = canonical_hash(item)
+    reordered = dict(reversed(list(item.items())))
+    reordered["properties"] = {**item["properties"], "created": "2000-01-01T00:00:00Z"}
+    reordered["links"] = item["links"] + [{"rel": "self", "href": "/elsewhere.json"}]
+    assert canonical_hash(reordered) == digest
+    changed = {**item, "properties": {**item["properties"], "eo:cloud_cover": 0}}
+    assert canonical_hash(changed) != digest
+
+
+def test_save_item_skips_unchanged(tmp_path: Path) -> None:
+    item_path = str(tmp_path / "item.json")
+    assert save_item(stac.create_item(SAFE_07HFE), item_path)
+    created = json.loads(Path(item_path).read_text())["properties"]["created"]
+    mtime = Path(item_path).stat().st_mtime_ns
+
+    item = stac.create_item(SAFE_07HFE)
+    item.properties["created"] = "2100-01-01T00:00:00Z"
+    assert not save_item(item, item_path)
+    assert Path(item_path).stat().st_mtime_ns == mtime
+
+    item.properties["eo:cloud_cover"] = 0
+    assert save_item(item, item_path, keep_created=True)
+    saved = json.loads(Path(item_path).read_text())
+    assert saved["properties"]["eo:cloud_cover"] == 0
+    assert saved["properties"]["created"] == created
+
+
+def test_save_item_with_hash_index(tmp_path: Path) -> None:
+    index_path = str(tmp_path / "hashes.json")
+    item_path = str(tmp_path / "item.json")
+    index = HashIndex(index_path)
+    assert save_item(stac.create_item(SAFE_07HFE), item_path, hash_index=index)
+    index.save()
+
+    # the index is trusted over the saved file
+    Path(item_path).write_text("{}")
+    index = HashIndex(index_path)
+    assert len(index) == 1
+    assert not save_item(stac.create_item(SAFE_07HFE), item_path, hash_index=index)
+
+    # but not for items that have been deleted since
+    Path(item_path).unlink()
+    assert save_item(stac.create_item(SAFE_07HFE), item_path, hash_index=index)
+    assert json.loads(Path(item_path).read_text())["id"]
+
+
+def test_bad_hash_index(tmp_path: Path) -> None:
+    path = tmp_path / "hashes.json"
+    path.write_text("[1, 2")
+    with pytest.raises(HashIndexError):
+        HashIndex(str(path))
+
+
+def test_create_items_command_update(tmp_path: Path) -> None:
+    hrefs = tmp_path / "hrefs.txt"
+    hrefs.write_text(SAFE_07HFE + "\n")
+    dst = tmp_path / "items"
+    dst.mkdir()
+    args = [
+        "create-items",
+        str(hrefs),
+        str(dst),
+        "--update",
+        "--hash-index",
+        str(tmp_path / "hashes.json"),
+    ]
+    command = create_sentinel2_command(Group())
+    result = CliRunner().invoke(command, args)
+    assert result.exit_code == 0, result.output
+    assert "1 created, 0 unchanged, 0 skipped, 0 failed" in result.stderr
+
+    result = CliRunner().invoke(command, args)
+    assert result.exit_code == 0, result.output
+    assert result.stdout == ""
+    assert "0 created, 1 unchanged, 0 skipped, 0 failed" in result.stderr
+
+
+def test_create_item_command_update(tmp_path: Path) -> None:
+    command = create_sentinel2_command(Group())
+    args = ["create-item", SAFE_07HFE, str(tmp_path), "--update", "--keep-created"]
+    assert CliRunner().invoke(command, args).exit_code == 0
+    result = CliRunner().invoke(command, args)
+    assert result.exit_code == 0, result.output
+    assert "is unchanged" in result.stderr
+
+
+@pytest.mark.parametrize("command", ["create-item", "create-items", "serve"])
+def test_keep_created_requires_update(tmp_path: Path, command: str) -> None:
+    args = {
+        "create-item": [SAFE_07HFE, str(tmp_path)],
+        "create-items": ["-", str(tmp_path)],
+        "serve": [],
+    }[command]
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()),
+        [command, *args, "--keep-created"],
+        input=SAFE_07HFE + "\n",
+    )
+    assert result.exit_code == 2
+    assert "--keep-created requires --update" in result.output
@@ -0,0 +1,119 @@
+import hashlib
+import zipfile
+from pathlib import Path
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import stac
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.verify import VerificationError, verify_safe
+
+SAFE = "S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+
+DATA_OBJECT = """
+    <dataObject ID="{id}">
+      <byteStream mimeType="application/octet-stream" size="{size}">
+        <fileLocation locatorType="URL" href="./{path}"/>
+        <checksum checksumName="{name}">{checksum}</checksum>
+      </byteStream>
+    </dataObject>"""
+
+
+def make_safe(root: Path, corrupt: bool = False, missing: bool = False) -> Path:
+    """Writes a small SAFE product whose manifest lists an MD5 and a SHA3-256
+    checksum, optionally corrupting or removing one of the files."""
+    safe = root / SAFE
+    files = {
+        "INSPIRE.xml": ("MD5", b"<inspire/>"),
+        "GRANULE/IMG_DATA/B01.jp2": ("SHA3-256", bytes(range(256)) * 64),
+        "GRANULE/QI_DATA/empty.xml": ("MD5", b""),
+    }
+    data_objects = []
+    for index, (path, (name, content)) in enumerate(files.items()):
+        hash = hashlib.md5 if name == "MD5" else hashlib.sha3_256
+        data_objects.append(
+            DATA_OBJECT.format(
+                id=f"object{index}",
+                size=len(content),
+                path=path,
+                name=name,
+                checksum=hash(content).hexdigest().upper(),
+            )
+        )
+        (safe / path).parent.mkdir(parents=True, exist_ok=True)
+        (safe / path).write_bytes(content)
+    (safe / "manifest.safe").write_text(
+        '<xfdu:XFDU xmlns:xfdu="urn:ccsds:schema:xfdu:1"><dataObjectSection>'
+        + "".join(data_objects)
+        + "</dataObjectSection></xfdu:XFDU>"
+    )
+    if corrupt:
+        (safe / "INSPIRE.xml").write_bytes(b"<inspire />")
+    if missing:
+        (safe / "GRANULE/IMG_DATA/B01.jp2").unlink()
+    return safe
+
+
+def zip_directory(directory: Path) -> Path:
+    zip_path = directory.parent / f"{directory.name}.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in sorted(directory.rglob("*")):
+            archive.write(path, f"{directory.name}/{path.relative_to(directory)}")
+    return zip_path
+
+
+def test_verify_intact_safe(tmp_path: Path) -> None:
+    result = verify_safe(str(make_safe(tmp_path)), max_workers=2)
+    assert result.ok
+    assert sorted(result.verified) == [
+        "GRANULE/IMG_DATA/B01.jp2",
+        "GRANULE/QI_DATA/empty.xml",
+        "INSPIRE.xml",
+    ]
+    result.raise_for_errors()
+
+
+def test_verify_file_url(tmp_path: Path) -> None:
+    result = verify_safe(make_safe(tmp_path).as_uri())
+    assert result.ok
+    assert len(result.verified) == 3
+
+
+def test_verify_damaged_safe(tmp_path: Path) -> None:
+    safe = make_safe(tmp_path, corrupt=True, missing=True)
+    result = verify_safe(str(safe))
+    assert not result.ok
+    assert result.mismatched == ["INSPIRE.xml"]
+    assert result.missing == ["GRANULE/IMG_DATA/B01.jp2"]
+    with pytest.raises(VerificationError, match="1 mismatched and 1 missing"):
+        result.raise_for_errors()
+
+
+def test_verify_zipped_safe(tmp_path: Path) -> None:
+    assert verify_safe(str(zip_directory(make_safe(tmp_path)))).ok
+    damaged = make_safe(tmp_path / "damaged", corrupt=True)
+    result = verify_safe(str(zip_directory(damaged)))
+    assert result.mismatched == ["INSPIRE.xml"]
+
+
+def test_create_item_verify(tmp_path: Path) -> None:
+    safe = make_safe(tmp_path, corrupt=True)
+    with pytest.raises(VerificationError):
+        stac.create_item(str(safe), verify=True)
+
+
+def test_create_item_verify_needs_safe() -> None:
+    with pytest.raises(ValueError, match="only SAFE products"):
+        stac.create_item("s3://sentinel-s2-l2a/tiles/10/S/DG/2018/12/31/0", verify=True)
+
+
+def test_verify_command(tmp_path: Path) -> None:
+    safe = make_safe(tmp_path, corrupt=True)
+    result = CliRunner().invoke(
+        create_sentinel2_command(Group()), ["verify", str(safe)]
+    )
+    assert result.exit_code == 1
+    assert "MISMATCH INSPIRE.xml" in result.output
+    assert "2 verified, 1 mismatched, 0 missing" in result.output
@@ -0,0 +1,145 @@
+import multiprocessing
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from click import Group
+from click.testing import CliRunner
+
+from stactools.sentinel2 import serve
+from stactools.sentinel2.commands import create_sentinel2_command
+from stactools.sentinel2.workqueue import SqliteQueue, WorkQueue, run_worker
+
+from . import test_data
+
+SAFE_07HFE = test_data.get_path(
+    "data-files/S2A_MSIL2A_20190212T192651_N0212_R013_T07HFE_20201007T160857.SAFE"
+)
+
+
+def test_work_queues_implement_the_interface() -> None:
+    class Incomplete(WorkQueue):
+        def put(self, hrefs: Iterable[str]) -> int:
+            return 0
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore[abstract]
+
+
+def test_claim_and_ack(tmp_path: Path) -> None:
+    with SqliteQueue(str(tmp_path / "queue.db")) as queue:
+        assert queue.put(["a", "b", "c", "", "a"]) == 3
+        assert queue.put(["c", "d"]) == 1
+
+        leases = queue.claim("worker-1", batch_size=2)
+        assert [lease.href for lease in leases] == ["a", "b"]
+        assert [lease.href for lease in queue.claim("worker-2")] == ["c", "d"]
+        assert queue.claim("worker-3") == []
+
+        assert queue.ack(leases[0], {"id": "item-a"})
+        assert not queue.ack(leases[0])
+        assert queue.counts() == {"queued": 0, "leased": 3, "done": 1, "failed": 0}
+
+
+def test_expired_leases_are_requeued(tmp_path: Path) -> None:
+    with SqliteQueue(str(tmp_path / "queue.db"), max_attempts=2) as queue:
+        queue.put(["a"])
+        (stale,) = queue.claim("worker-1", lease_seconds=-1)
+        (lease,) = queue.claim("worker-2")
+        assert lease.href == "a"
+        assert lease.attempts == 2
+        # the first worker's lease is gone
+        assert not queue.ack(stale)
+        assert queue.extend(stale, 60) is None
+        extended = queue.extend(lease, 3600)
+        assert extended is not None and extended.expires > lease.expires
+        assert queue.ack(extended)
+
+
+def test_retries_until_out_of_attempts(tmp_path: Path) -> None:
+    with SqliteQueue(
+        str(tmp_path / "queue.db"), max_attempts=2, retry_delay=0
+    ) as queue:
+        queue.put(["a"])
+        (lease,) = queue.claim("worker")
+        assert queue.nack(lease, "boom")
+        (lease,) = queue.claim("worker")
+        assert queue.nack(lease, "boom again")
+        assert queue.claim("worker") == []
+        assert queue.counts()["failed"] == 1
+        assert queue.failures() == [("a", "boom again")]
+
+
+def test_retry_delay(tmp_path: Path) -> None:
+    with SqliteQueue(str(tmp_path / "queue.db"), retry_delay=60) as queue:
+        queue.put(["a"])
+        (lease,) = queue.claim("worker")
+        queue.nack(lease, "boom")
+        assert queue.claim("worker") == []
+
+
+def _claim_all(path: str, owner: str) -> list[str]:
+    claimed = []
+    with SqliteQueue(path) as queue:
+        while leases := queue.claim(owner, batch_size=3):
+            for lease in leases:
+                claimed.append(lease.href)
+                queue.ack(lease)
+            time.sleep(0.001)
+    return claimed
+
+
+def test_concurrent_workers_claim_disjoint_tasks(tmp_path: Path) -> None:
+    path = str(tmp_path / "queue.db")
+    hrefs = [f"href-{i}" for i in range(200)]
+    with SqliteQueue(path) as queue:
+        queue.put(hrefs)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(4) as pool:
+        results = pool.starmap(_claim_all, [(path, f"worker-{i}") for i in range(4)])
+    claimed = [href for result in results for href in result]
+    assert sorted(claimed) == sorted(hrefs)
+
+
+def test_run_worker(tmp_path: Path) -> None:
+    with SqliteQueue(str(tmp_path / "queue.db"), max_attempts=1) as queue:
+        queue.put([SAFE_07HFE, "/does/not/exist.SAFE"])
+        counts = run_worker(queue, str(tmp_path), owner="worker", batch_size=1)
+        assert counts == {"done": 1, "failed": 1, "lost": 0}
+        assert queue.counts() == {"queued": 0, "leased": 0, "done": 1, "failed": 1}
+    assert (tmp_path / "S2A_T07HFE_20190212T192646_L2A.json").exists()
+
+
+def test_run_worker_renews_leases(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def slow(href: str, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        time.sleep(0.2)
+        return {"href": href, "id": href}
+
+    monkeypatch.setattr(serve, "process_line", slow)
+    with SqliteQueue(str(tmp_path / "queue.db"), max_attempts=1) as queue:
+        queue.put(["a", "b", "c"])
+        # the last task starts after the batch's original lease has run out
+        counts = run_worker(queue, batch_size=3, lease_seconds=0.3)
+        assert counts == {"done": 3, "failed": 0, "lost": 0}
+        assert queue.counts() == {"queued": 0, "leased": 0, "done": 3, "failed": 0}
+
+
+def test_queue_commands(tmp_path: Path) -> None:
+    command = create_sentinel2_command(Group())
+    queue_path = str(tmp_path / "queue.db")
+    result = CliRunner().invoke(
+        command, ["queue", "put", queue_path, "-"], input=f"{SAFE_07HFE}\n"
+    )
+    assert result.exit_code == 0, result.output
+    assert "1 hrefs added" in result.output
+
+    result = CliRunner().invoke(command, ["queue", "work", queue_path, str(tmp_path)])
+    assert result.exit_code == 0, result.output
+    assert "1 done, 0 failed, 0 lost" in result.stderr
+
+    result = CliRunner().invoke(command, ["queue", "status", queue_path])
+    assert result.output.strip() == "0 queued, 0 leased, 1 done, 0 failed"